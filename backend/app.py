@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response, Response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
@@ -19,19 +19,21 @@ from utils.nessie import (
     get_all_customers
 )
 from utils.ai_calculator import calculate_levels_with_ai, ai_chat_assistant
-from utils.statement_parser import (
-    parse_and_extract_transactions,
-    categorize_transactions_with_ai,
-)
+from utils.leaderboard_cache import leaderboard_cache, MAX_PAGE_SIZE as LEADERBOARD_MAX_PAGE_SIZE
+from utils.user_cache import user_summaries
+from utils.statement_worker import StatementWorkerPool
+from utils.statement_parser import EXPENSE_CATEGORIES
+from utils.merchant_memo import merchant_memo, merchant_key
 from data.mock_statement_v4 import (
     get_mock_spending_analysis,
-    get_mock_suggestion,
     get_mock_quests_from_spending,
-    get_mock_transactions_for_upload,
 )
 from models.bank_statement import BankStatement
+from models.cash_flow import DEFAULT_MONTHLY_INCOME, DEFAULT_MONTHLY_EXPENSES
+from models.statement_job import StatementJob
 from models.nudge import Nudge
-from models.post import Post
+from models.post import Post, encode_cursor
+from models.timeline import Timeline
 from werkzeug.utils import secure_filename
 import uuid
 
@@ -55,6 +57,13 @@ veto_request_model = VetoRequestModel(db)
 bank_statement_model = BankStatement(db)
 nudge_model = Nudge(db)
 post_model = Post(db)
+timeline_model = Timeline(db)
+statement_job_model = StatementJob(db)
+
+# Background statement processing, started when the server runs (see __main__ below) rather
+# than on import, so scripts importing this module don't claim jobs. Set STATEMENT_WORKERS=0
+# to run scripts/run_statement_worker.py instead.
+statement_workers = StatementWorkerPool(db)
 
 
 def _serialize_user_for_json(user):
@@ -212,16 +221,14 @@ def get_game_stats():
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        # Streak from streak calculator (daily_flow); fallback to stored current_streak
+        # Streak state maintained by daily_flow (stored on the user doc); fallback to current_streak
         try:
-            streak = daily_flow_model.calculate_streak(request.user_id)
+            streak = daily_flow_model.calculate_streak(request.user_id, user=user)
         except Exception:
             streak = user.get('current_streak', 0)
 
         # Rank by XP: 1 + number of users with strictly more game_points
-        my_points = user.get('game_points', 0)
-        above = user_model.collection.count_documents({"game_points": {"$gt": my_points}})
-        rank = above + 1
+        rank = user_model.get_rank(request.user_id, user.get('game_points', 0))
 
         placements = user.get('pop_city_placements')
         if not isinstance(placements, dict):
@@ -300,7 +307,7 @@ def pop_city_place():
         user_model.update_game_stats(request.user_id, points=POP_CITY_POINTS, currency=-POP_CITY_COST)
         user = user_model.find_by_id(request.user_id)
         try:
-            streak = daily_flow_model.calculate_streak(request.user_id)
+            streak = daily_flow_model.calculate_streak(request.user_id, user=user)
         except Exception:
             streak = user.get('current_streak', 0)
         placements_after = user.get('pop_city_placements')
@@ -339,10 +346,29 @@ def pop_city_place():
 @app.route('/api/gamification/streak-calendar', methods=['GET'])
 @jwt_required
 def get_streak_calendar():
-    """Get which days in a month had positive net (achieved). Query: year, month (default: current)."""
+    """
+    Which days had positive net (achieved), as a per-month bitmap (bit d-1 = day d).
+    Query: year, month (default: current) for one month, or from=YYYY-MM&to=YYYY-MM
+    for up to 24 months in one call (e.g. a year view).
+    """
     try:
         from datetime import datetime as dt
-        from calendar import monthrange
+        from models.daily_flow import days_from_bitmap
+        if request.args.get('from'):
+            try:
+                start = dt.strptime(request.args['from'], "%Y-%m")
+                end = dt.strptime(request.args.get('to') or request.args['from'], "%Y-%m")
+                months = daily_flow_model.get_calendar(
+                    request.user_id, start.year, start.month, end.year, end.month
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify({
+                "from": start.strftime("%Y-%m"),
+                "to": end.strftime("%Y-%m"),
+                "months": months,
+            }), 200
+
         year = request.args.get('year', type=int)
         month = request.args.get('month', type=int)
         now = dt.utcnow()
@@ -350,45 +376,72 @@ def get_streak_calendar():
             year = now.year
         if not month:
             month = now.month
-        start = dt(year, month, 1)
-        last_day = monthrange(year, month)[1]
-        end = dt(year, month, last_day)
-        entries = daily_flow_model.get_user_entries(request.user_id, start_date=start, end_date=end)
-        days_achieved = []
-        for e in entries:
-            net = e.get("net")
-            if net is None:
-                inc = float(e.get("income") or 0)
-                exp = float(e.get("expenses") if e.get("expenses") is not None else e.get("expense") or 0)
-                net = inc - exp
-            if net >= 0 and e.get("date"):
-                d = e["date"]
-                if hasattr(d, "day"):
-                    days_achieved.append(d.day)
-                else:
-                    days_achieved.append(int(str(d)[8:10]))
-        return jsonify({"year": year, "month": month, "days": sorted(set(days_achieved))}), 200
+        try:
+            bitmap = daily_flow_model.get_calendar(request.user_id, year, month)[0]["bitmap"]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"year": year, "month": month, "days": days_from_bitmap(bitmap), "bitmap": bitmap}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _leaderboard_rows(offset, limit):
+    rankings = []
+    for i, user in enumerate(user_model.get_leaderboard(limit=limit, offset=offset)):
+        rankings.append({
+            "rank": user.get('rank', offset + i + 1),
+            "user_id": str(user['_id']),
+            "username": user.get('username', ''),
+            "name": user.get('name', ''),
+            "points": user.get('game_points', 0),
+            "streak": user.get('current_streak', 0)
+        })
+    return rankings
+
+
 @app.route('/api/gamification/leaderboard', methods=['GET'])
+@jwt_required
 def get_leaderboard():
-    """Get leaderboard rankings by XP (game_points)."""
+    """Get leaderboard rankings by XP (game_points).
+    Query: view=top|page|around, limit (max 100), page (1-based, view=page), radius (view=around).
+    Responses carry ETag/Last-Modified; send If-None-Match / If-Modified-Since to get a 304."""
     try:
-        limit = int(request.args.get('limit', 100))
-        leaderboard = user_model.get_leaderboard(limit=limit)
-        rankings = []
-        for i, user in enumerate(leaderboard):
-            rankings.append({
-                "rank": i + 1,
-                "user_id": str(user['_id']),
-                "username": user.get('username', ''),
-                "name": user.get('name', ''),
-                "points": user.get('game_points', 0),
-                "streak": user.get('current_streak', 0)
-            })
-        return jsonify({"leaderboard": rankings}), 200
+        view = request.args.get('view', 'top')
+        limit = max(1, min(request.args.get('limit', 100, type=int), LEADERBOARD_MAX_PAGE_SIZE))
+        page_number = None
+        my_rank = None
+        if view == 'page':
+            page_number = max(1, request.args.get('page', 1, type=int))
+            offset = (page_number - 1) * limit
+        elif view == 'around':
+            radius = max(0, min(request.args.get('radius', 5, type=int), (LEADERBOARD_MAX_PAGE_SIZE - 1) // 2))
+            user = user_model.find_by_id(request.user_id)
+            if not user:
+                return jsonify({"error": "User not found"}), 404
+            my_rank = user_model.get_rank(request.user_id, user.get('game_points', 0))
+            # Center on the user's place, not their rank: with ties many users share one rank
+            offset = max(0, user_model.get_rank_position(request.user_id, user.get('game_points', 0)) - radius)
+            limit = 2 * radius + 1
+        elif view == 'top':
+            offset = 0
+        else:
+            return jsonify({"error": "view must be 'top', 'page' or 'around'"}), 400
+
+        page = leaderboard_cache.get(offset, limit, _leaderboard_rows)
+        body = {"leaderboard": page["rows"], "view": view, "total": user_model.count_ranked()}
+        if page_number is not None:
+            body["page"] = page_number
+            body["pageSize"] = limit
+        if my_rank is not None:
+            body["myRank"] = my_rank
+
+        resp = make_response(jsonify(body), 200)
+        resp.set_etag(page["etag"] + (f"-{my_rank}" if my_rank is not None else ""))
+        resp.last_modified = page["last_modified"]
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
+        resp.vary.add("Authorization")
+        return resp.make_conditional(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -398,19 +451,10 @@ def get_leaderboard():
 def get_friends_leaderboard():
     """Get current user + friends ranked by XP."""
     try:
-        from bson import ObjectId
-        user = user_model.find_by_id(request.user_id)
-        if not user:
+        friend_ids = user_model.get_friend_ids(request.user_id)
+        if friend_ids is None:
             return jsonify({"leaderboard": []}), 200
-        friend_ids = list(user.get("friends") or [])
-        current_oid = ObjectId(request.user_id) if isinstance(request.user_id, str) else request.user_id
-        ids_to_fetch = [current_oid] + [
-            fid if isinstance(fid, ObjectId) else ObjectId(fid) for fid in friend_ids
-        ]
-        users = list(user_model.collection.find(
-            {"_id": {"$in": ids_to_fetch}},
-            {"username": 1, "name": 1, "game_points": 1, "current_streak": 1}
-        ))
+        users = list(user_summaries.get_many([request.user_id] + friend_ids).values())
         users.sort(key=lambda u: u.get('game_points', 0), reverse=True)
         rankings = []
         for i, u in enumerate(users):
@@ -453,21 +497,10 @@ def create_goal():
             target_date=target_date
         )
 
-        # Calculate levels with AI (use bank statement income/expenses when available)
+        # Calculate levels with AI (use trailing monthly income/expenses from bank statements when available)
         goal = goal_model.get_goal_by_id(goal_id)
         user = user_model.find_by_id(request.user_id)
-        monthly_income = 3000
-        avg_expenses = 2200
-        try:
-            txns = bank_statement_model.get_user_transactions(request.user_id, limit=500)
-            if txns:
-                income = sum(float(t.get('amount') or 0) for t in txns if float(t.get('amount') or 0) > 0)
-                expenses = sum(abs(float(t.get('amount') or 0)) for t in txns if float(t.get('amount') or 0) < 0)
-                if income > 0 or expenses > 0:
-                    monthly_income = max(1, round(income, 2)) if income > 0 else 3000
-                    avg_expenses = round(expenses, 2) if expenses > 0 else 2200
-        except Exception:
-            pass
+        monthly_income, avg_expenses = bank_statement_model.cash_flow.goal_inputs(request.user_id)
 
         ai_result = calculate_levels_with_ai(
             {
@@ -480,7 +513,7 @@ def create_goal():
                 'monthly_income': monthly_income,
                 'avg_expenses': avg_expenses,
                 'current_streak': user.get('current_streak', 0),
-                'from_bank_statement': monthly_income != 3000 or avg_expenses != 2200,
+                'from_bank_statement': monthly_income != DEFAULT_MONTHLY_INCOME or avg_expenses != DEFAULT_MONTHLY_EXPENSES,
             }
         )
 
@@ -713,17 +746,28 @@ def complete_quest(user_quest_id):
 # VETO REQUESTS (cross-user: Anna creates, Suhani sees)
 # ============================================================================
 
-def _format_veto_request(doc):
+def _format_veto_requests(docs):
+    """Format veto requests with requester display fields from the user summary cache (one batch)."""
+    summaries = user_summaries.get_many(d.get("user_id") for d in docs if d)
+    return [_format_veto_request(d, summaries) for d in docs]
+
+
+def _format_veto_request(doc, summaries=None):
     if not doc:
         return None
+    if summaries is None:
+        return _format_veto_requests([doc])[0]
     votes = doc.get("votes") or []
+    # Live name/username when the requester still exists; the copy stored on the request otherwise
+    requester = summaries.get(doc.get("user_id")) or doc
+    name = requester.get("name") or requester.get("username", "")
     return {
         "id": str(doc["_id"]),
         "requesterId": str(doc.get("user_id", "")),
         "user": {
-            "name": doc.get("name") or doc.get("username", ""),
-            "username": doc.get("username", ""),
-            "avatar": (doc.get("name") or doc.get("username") or "?")[0].upper(),
+            "name": name,
+            "username": requester.get("username", ""),
+            "avatar": (name or "?")[0].upper(),
         },
         "item": doc.get("item", ""),
         "amount": doc.get("amount", 0),
@@ -739,7 +783,7 @@ def list_veto_requests():
     """Pending requests + current user's own approved/rejected (so requester sees outcome)."""
     try:
         docs = veto_request_model.get_visible_for_user(request.user_id)
-        return jsonify({"vetoRequests": [_format_veto_request(d) for d in docs]}), 200
+        return jsonify({"vetoRequests": _format_veto_requests(docs)}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -891,10 +935,44 @@ def ai_chat():
 # BANK STATEMENTS (upload PDF, parse, categorize, spending analysis)
 # ============================================================================
 
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def _save_upload_by_hash(file):
+    """
+    Stream an upload to disk while hashing it; store it as uploads/<sha256>.pdf.
+    A file that was uploaded before is not stored twice. Returns (path, sha256, size).
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(app.config['UPLOAD_FOLDER'], f".{uuid.uuid4().hex}.part")
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        sha256 = digest.hexdigest()
+        path = os.path.join(app.config['UPLOAD_FOLDER'], f"{sha256}.pdf")
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        return path, sha256, size
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 @app.route('/api/bank-statements/upload', methods=['POST'])
 @jwt_required
 def upload_bank_statement():
-    """Upload a bank statement PDF; parse and store transactions."""
+    """Upload a bank statement PDF and queue it for parsing. Poll /status for progress."""
     try:
         if 'file' not in request.files:
             return jsonify({"error": "No file part"}), 400
@@ -905,75 +983,53 @@ def upload_bank_statement():
             return jsonify({"error": "Only PDF files are allowed"}), 400
 
         filename = secure_filename(file.filename) or "statement.pdf"
-        unique = str(uuid.uuid4())[:8]
-        save_name = f"{request.user_id}_{unique}_{filename}"
-        path = os.path.join(app.config['UPLOAD_FOLDER'], save_name)
-        file.save(path)
-
-        use_mock = False
-        try:
-            transactions = parse_and_extract_transactions(path)
-            transactions = categorize_transactions_with_ai(transactions)
-        except ImportError:
-            use_mock = True
-            transactions = get_mock_transactions_for_upload()
-        except Exception:
-            use_mock = True
-            transactions = get_mock_transactions_for_upload()
+        path, sha256, size = _save_upload_by_hash(file)
 
         statement_id = bank_statement_model.create(
             request.user_id,
             filename=filename,
-            file_size_bytes=os.path.getsize(path),
-        )
-        bank_statement_model.insert_transactions(
-            request.user_id,
-            statement_id,
-            [{"date": t.get("date"), "description": t.get("description", ""), "amount": t.get("amount", 0), "category": t.get("category", "other")} for t in transactions]
+            file_size_bytes=size,
+            status="queued",
+            sha256=sha256,
         )
-
-        # Recalculate daily amount and levels for active goals using new transaction data
-        try:
-            txns = bank_statement_model.get_user_transactions(request.user_id, limit=500)
-            monthly_income = 3000
-            avg_expenses = 2200
-            if txns:
-                income = sum(float(t.get("amount") or 0) for t in txns if float(t.get("amount") or 0) > 0)
-                expenses = sum(abs(float(t.get("amount") or 0)) for t in txns if float(t.get("amount") or 0) < 0)
-                if income > 0 or expenses > 0:
-                    monthly_income = max(1, round(income, 2)) if income > 0 else 3000
-                    avg_expenses = round(expenses, 2) if expenses > 0 else 2200
-            user = user_model.find_by_id(request.user_id)
-            active_goals = goal_model.get_user_goals(request.user_id, status="active")
-            for goal in active_goals:
-                ai_result = calculate_levels_with_ai(
-                    {
-                        "target_amount": goal["target_amount"],
-                        "current_amount": goal.get("current_amount", 0),
-                        "category": goal.get("goal_category", "other"),
-                        "target_date": goal.get("target_date"),
-                    },
-                    {
-                        "monthly_income": monthly_income,
-                        "avg_expenses": avg_expenses,
-                        "current_streak": user.get("current_streak", 0),
-                        "from_bank_statement": True,
-                    },
-                )
-                goal_model.set_level_system(
-                    goal["_id"],
-                    ai_result["total_levels"],
-                    ai_result["level_thresholds"],
-                    ai_result["daily_target"],
-                )
-        except Exception:
-            pass
+        statement_job_model.enqueue(request.user_id, statement_id, path, sha256=sha256)
+        statement_workers.notify()
 
         return jsonify({
-            "message": "Statement uploaded and processed" + (" (using sample data)" if use_mock else ""),
+            "message": "Statement uploaded; processing in the background",
             "statementId": str(statement_id),
-            "transactionCount": len(transactions),
-        }), 201
+            "status": "queued",
+        }), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/bank-statements/<statement_id>/status', methods=['GET'])
+@jwt_required
+def bank_statement_status(statement_id):
+    """Processing status and progress (0-100) of an uploaded statement."""
+    try:
+        doc = bank_statement_model.get_by_id(statement_id)
+        if not doc or str(doc.get("user_id")) != request.user_id:
+            return jsonify({"error": "Statement not found"}), 404
+        job = statement_job_model.get_for_statement(statement_id) or {}
+        result = job.get("result") or {}
+        status = doc.get("status", "processed")
+        if job.get("status") == "failed" and status in ("queued", "processing"):
+            status = "failed"  # the job gave up; don't leave the client polling
+        return jsonify({
+            "statementId": statement_id,
+            "status": status,
+            "stage": job.get("stage", "done"),
+            "progress": job.get("progress", 100),
+            "attempts": job.get("attempts", 0),
+            "error": job.get("error"),
+            "transactionCount": doc.get("transaction_count", 0),
+            "duplicateCount": doc.get("duplicate_count", 0),
+            "usedSampleData": bool(result.get("used_mock")),
+            "cacheHit": bool(result.get("cache_hit")),
+            "partial": bool(result.get("partial")),
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1005,19 +1061,67 @@ def delete_bank_statement(statement_id):
         doc = bank_statement_model.get_by_id(statement_id)
         if not doc or str(doc.get("user_id")) != request.user_id:
             return jsonify({"error": "Statement not found"}), 404
+        statement_job_model.cancel(statement_id)
         deleted = bank_statement_model.delete_statement(statement_id, request.user_id)
         return jsonify({"message": "Statement deleted", "transactionsRemoved": deleted}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/bank-statements/transactions/<transaction_id>', methods=['PATCH'])
+@jwt_required
+def correct_transaction_category(transaction_id):
+    """Correct a transaction's category. Body: { category }. Also teaches the shared merchant memo."""
+    try:
+        data = request.get_json(silent=True) or {}
+        category = str(data.get('category') or '').lower()
+        if category not in EXPENSE_CATEGORIES:
+            return jsonify({"error": f"category must be one of: {', '.join(EXPENSE_CATEGORIES)}"}), 400
+        txn = bank_statement_model.update_transaction_category(transaction_id, request.user_id, category)
+        if not txn:
+            return jsonify({"error": "Transaction not found"}), 404
+        merchant_memo.correct(txn["user_id"], merchant_key(txn.get("description")), category)
+        return jsonify({"message": "Category updated", "transactionId": transaction_id, "category": category}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/bank-statements/categorization-stats', methods=['GET'])
+@jwt_required
+def categorization_stats():
+    """Merchant category memo hit rates for this process (LRU, MongoDB, misses sent to Gemini)."""
+    return jsonify(merchant_memo.stats()), 200
+
+
 @app.route('/api/bank-statements/spending-analysis', methods=['GET'])
 @jwt_required
 def spending_analysis():
-    """Get spending by category and suggested daily savings. Shows financial breakdown only after user has uploaded at least one PDF (then uses hardcoded v4 data so it appears the PDF was read)."""
+    """
+    Spending by category and a suggested daily savings amount, from the monthly
+    spending rollups. Query: days=30|90|365 (default 90; the window ends at the latest
+    month with spending) or from=YYYY-MM&to=YYYY-MM. Windows are whole months.
+    """
     try:
-        statements = bank_statement_model.get_user_statements(request.user_id, limit=1)
-        has_uploaded_statement = len(statements) > 0
+        from datetime import datetime as dt
+        from models.spending_rollup import add_months, month_start
+        from utils.statement_parser import suggest_daily_from_spending
+        rollups = bank_statement_model.rollups
+        if request.args.get('from'):
+            try:
+                start = dt.strptime(request.args['from'], "%Y-%m")
+                end = dt.strptime(request.args.get('to') or request.args['from'], "%Y-%m")
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if end < start:
+                return jsonify({"error": "to must not be before from"}), 400
+        else:
+            days = request.args.get('days', 90, type=int)
+            if days not in (30, 90, 365):
+                return jsonify({"error": "days must be 30, 90 or 365"}), 400
+            end = month_start(min(dt.utcnow(), rollups.latest_month(request.user_id) or dt.utcnow()))
+            start = add_months(end, 1 - round(days / 30.4))
+        by_category = rollups.get_by_category(request.user_id, start, end)
+        has_uploaded_statement = len(bank_statement_model.get_user_statements(request.user_id, limit=1)) > 0
 
         goals = goal_model.get_user_goals(request.user_id, status="active")
         goal = goals[0] if goals else None
@@ -1025,28 +1129,152 @@ def spending_analysis():
         current_amount = float(goal.get("current_amount", 0) or 0) if goal else 0
         target_date = goal.get("target_date") if goal else None
         goal_name = goal.get("goal_name", "") if goal else ""
+        spending_by_category = {c: v["total"] for c, v in by_category.items()}
 
-        if has_uploaded_statement:
-            mock = get_mock_spending_analysis()
-            spending_by_category = mock["spendingByCategory"]
-            transaction_count = mock["transactionCount"]
-            suggestion = get_mock_suggestion(target_amount, current_amount, target_date, goal_name)
-            return jsonify({
-                "spendingByCategory": spending_by_category,
-                "suggestion": suggestion,
-                "goalName": goal_name,
-                "transactionCount": transaction_count,
-                "hasStatementData": True,
-            }), 200
-        else:
-            suggestion = get_mock_suggestion(target_amount, current_amount, target_date, goal_name)
-            return jsonify({
-                "spendingByCategory": {},
-                "suggestion": suggestion,
-                "goalName": goal_name,
-                "transactionCount": 0,
-                "hasStatementData": False,
-            }), 200
+        return jsonify({
+            "spendingByCategory": spending_by_category,
+            "categories": by_category,
+            "suggestion": suggest_daily_from_spending(spending_by_category, target_amount, target_date, current_amount),
+            "goalName": goal_name,
+            "transactionCount": sum(v["count"] for v in by_category.values()),
+            "window": {
+                "from": start.strftime("%Y-%m"),
+                "to": end.strftime("%Y-%m"),
+                "months": (end.year - start.year) * 12 + end.month - start.month + 1,
+            },
+            "hasStatementData": has_uploaded_statement,
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+SERIES_BUCKETS = ("day", "week", "month")
+SERIES_MAX_DAY_BUCKETS = 400
+
+
+@app.route('/api/bank-statements/series', methods=['GET'])
+@jwt_required
+def spending_series():
+    """
+    Income/expenses per day, week or month for charts.
+    Query: bucket=day|week|month (default month), from/to=YYYY-MM-DD (inclusive;
+    default the year up to today), category (optional). Cached per user and query
+    until the user's transactions change.
+    """
+    try:
+        from datetime import datetime as dt, timedelta
+        from utils.series_cache import series_cache
+        bucket = request.args.get('bucket', 'month')
+        if bucket not in SERIES_BUCKETS:
+            return jsonify({"error": f"bucket must be one of: {', '.join(SERIES_BUCKETS)}"}), 400
+        category = request.args.get('category') or None
+        if category and category not in EXPENSE_CATEGORIES:
+            return jsonify({"error": f"category must be one of: {', '.join(EXPENSE_CATEGORIES)}"}), 400
+        try:
+            end = dt.strptime(request.args['to'], "%Y-%m-%d") if request.args.get('to') else \
+                dt.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            start = dt.strptime(request.args['from'], "%Y-%m-%d") if request.args.get('from') else \
+                end - timedelta(days=364)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if end < start:
+            return jsonify({"error": "to must not be before from"}), 400
+        if bucket == "day" and (end - start).days >= SERIES_MAX_DAY_BUCKETS:
+            return jsonify({"error": f"day buckets are limited to {SERIES_MAX_DAY_BUCKETS} days"}), 400
+
+        series, cached = series_cache.get(
+            request.user_id, bucket, start, end, category,
+            lambda: bank_statement_model.get_spending_series(
+                request.user_id, bucket, start, end + timedelta(days=1), category
+            )
+        )
+        return jsonify({
+            "bucket": bucket,
+            "from": start.strftime("%Y-%m-%d"),
+            "to": end.strftime("%Y-%m-%d"),
+            "category": category,
+            "series": series,
+            "cached": cached,
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = ["date", "description", "amount", "category", "statement_id"]
+EXPORT_CHUNK_ROWS = 500
+
+
+def _export_row(t):
+    date = t.get("date")
+    return {
+        "date": date.strftime("%Y-%m-%d") if hasattr(date, "strftime") else None,
+        "description": t.get("description", ""),
+        "amount": t.get("amount", 0),
+        "category": t.get("category", "other"),
+        "statement_id": str(t["statement_id"]) if t.get("statement_id") else None,
+    }
+
+
+def _export_csv(rows):
+    import csv
+    import io
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for i, t in enumerate(rows, start=1):
+        row = _export_row(t)
+        if row["description"][:1] in ("=", "+", "-", "@"):
+            row["description"] = "'" + row["description"]  # keep spreadsheets from running it as a formula
+        writer.writerow([row[c] if row[c] is not None else "" for c in EXPORT_COLUMNS])
+        if i % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(rows):
+    import json
+    chunk = []
+    for t in rows:
+        chunk.append(json.dumps(_export_row(t)) + "\n")
+        if len(chunk) == EXPORT_CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+@app.route('/api/bank-statements/export', methods=['GET'])
+@jwt_required
+def export_transactions():
+    """
+    Download the user's transactions. Query: format=csv|ndjson (default csv),
+    from/to=YYYY-MM-DD (inclusive), category. Rows are streamed from the cursor as
+    they are read, so exports of any size use constant memory.
+    """
+    try:
+        from datetime import datetime as dt, timedelta
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        category = request.args.get('category') or None
+        if category and category not in EXPENSE_CATEGORIES:
+            return jsonify({"error": f"category must be one of: {', '.join(EXPENSE_CATEGORIES)}"}), 400
+        try:
+            start = dt.strptime(request.args['from'], "%Y-%m-%d") if request.args.get('from') else None
+            end = dt.strptime(request.args['to'], "%Y-%m-%d") + timedelta(days=1) if request.args.get('to') else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        rows = bank_statement_model.iter_transactions(request.user_id, start, end, category)
+        body = _export_csv(rows) if export_format == "csv" else _export_ndjson(rows)
+        return Response(
+            stream_with_context(body),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename=transactions.{export_format}"},
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1082,20 +1310,8 @@ def update_goal(goal_id):
         # Recalculate levels with AI if amount or date changed
         if needs_recalc:
             user = user_model.find_by_id(request.user_id)
-            monthly_income = 3000
-            avg_expenses = 2200
-
-            # Get financial data from bank statements
-            try:
-                txns = bank_statement_model.get_user_transactions(request.user_id, limit=500)
-                if txns:
-                    income = sum(float(t.get('amount') or 0) for t in txns if float(t.get('amount') or 0) > 0)
-                    expenses = sum(abs(float(t.get('amount') or 0)) for t in txns if float(t.get('amount') or 0) < 0)
-                    if income > 0 or expenses > 0:
-                        monthly_income = max(1, round(income, 2)) if income > 0 else 3000
-                        avg_expenses = round(expenses, 2) if expenses > 0 else 2200
-            except Exception:
-                pass
+            # Trailing monthly income/expenses from bank statements
+            monthly_income, avg_expenses = bank_statement_model.cash_flow.goal_inputs(request.user_id)
 
             # Recalculate with AI
             ai_result = calculate_levels_with_ai(
@@ -1109,7 +1325,7 @@ def update_goal(goal_id):
                     'monthly_income': monthly_income,
                     'avg_expenses': avg_expenses,
                     'current_streak': user.get('current_streak', 0),
-                    'from_bank_statement': monthly_income != 3000 or avg_expenses != 2200,
+                    'from_bank_statement': monthly_income != DEFAULT_MONTHLY_INCOME or avg_expenses != DEFAULT_MONTHLY_EXPENSES,
                 }
             )
 
@@ -1329,11 +1545,11 @@ def create_quest_from_suggestion():
 def get_friends():
     """Get current user's friend list with names/usernames."""
     try:
-        user = user_model.find_by_id(request.user_id)
-        friend_ids = user.get("friends") or []
+        friend_ids = user_model.get_friend_ids(request.user_id) or []
+        summaries = user_summaries.get_many(friend_ids)
         friends = []
         for fid in friend_ids:
-            u = user_model.find_by_id(fid)
+            u = summaries.get(fid)
             if u:
                 friends.append({
                     "id": str(u["_id"]),
@@ -1361,6 +1577,8 @@ def add_friend():
         if str(friend_id) == request.user_id:
             return jsonify({"error": "You cannot add yourself"}), 400
         user_model.add_friend(request.user_id, friend_id)
+        if not friend.get("fanout_on_read"):
+            timeline_model.backfill(request.user_id, friend_id)
         return jsonify({
             "message": f"Added {friend.get('name') or friend.get('username')} as friend",
             "friend": {"id": str(friend_id), "username": friend.get("username", ""), "name": friend.get("name", "")},
@@ -1382,18 +1600,17 @@ def send_nudge():
         if not to_user_id:
             return jsonify({"error": "toUserId is required"}), 400
 
-        user = user_model.find_by_id(request.user_id)
-        friend_ids = user.get("friends") or []
+        friend_ids = user_model.get_friend_ids(request.user_id) or []
         from bson import ObjectId
         to_oid = ObjectId(to_user_id)
-        if to_oid not in friend_ids and str(to_oid) not in [str(x) for x in friend_ids]:
+        if to_oid not in friend_ids:
             return jsonify({"error": "User is not in your friend list"}), 400
 
         if nudge_model.has_nudged(request.user_id, to_user_id):
             return jsonify({"error": "You can only nudge each friend once."}), 400
 
         nudge_id = nudge_model.create(request.user_id, to_user_id, goal_id, goal_name)
-        to_user = user_model.find_by_id(to_user_id)
+        to_user = user_summaries.get(to_oid) or {}
         return jsonify({
             "message": f"Sent nudge to {to_user.get('name') or to_user.get('username') or 'friend'}!",
             "nudgeId": str(nudge_id),
@@ -1419,9 +1636,10 @@ def get_my_nudges():
     """Get nudges sent to the current user (for notification: 'X nudged you to keep pushing for your goals!')."""
     try:
         docs = nudge_model.get_for_user(request.user_id, limit=30)
+        senders = user_summaries.get_many(d["from_user_id"] for d in docs)
         nudges = []
         for d in docs:
-            from_user = user_model.find_by_id(d["from_user_id"])
+            from_user = senders.get(d["from_user_id"])
             nudges.append({
                 "id": str(d["_id"]),
                 "fromUserId": str(d["from_user_id"]),
@@ -1450,96 +1668,114 @@ def mark_nudge_read(nudge_id):
 # FEED & POSTS
 # ============================================================================
 
-def _format_post(post, current_user_id=None):
-    """Format post for JSON response with user details and formatted comments"""
-    if not post:
-        return None
-
-    from bson import ObjectId
-    from datetime import datetime
-
-    # Get user details
-    user = user_model.find_by_id(post.get("user_id"))
-    user_data = {
-        "id": str(post.get("user_id")),
+def _post_user_summary(user_id, user):
+    return {
+        "id": str(user_id),
         "username": user.get("username", "unknown") if user else "unknown",
         "name": user.get("name", "") if user else "",
-        "avatar": (user.get("name", "?")[0].upper() if user and user.get("name") else "👤")
+        "avatar": (user.get("avatar") if user and user.get("avatar") else "👤")
     }
 
-    # Format timestamp
-    def _format_timestamp(dt):
-        if isinstance(dt, datetime):
-            now = datetime.utcnow()
-            diff = now - dt
-            if diff.days > 0:
-                return f"{diff.days}d ago"
-            elif diff.seconds // 3600 > 0:
-                return f"{diff.seconds // 3600}h ago"
-            elif diff.seconds // 60 > 0:
-                return f"{diff.seconds // 60}m ago"
-            else:
-                return "Just now"
-        return "Recently"
 
-    created_at = post.get("created_at")
-    timestamp = _format_timestamp(created_at)
+def _relative_time(dt):
+    from datetime import datetime
+    if isinstance(dt, datetime):
+        now = datetime.utcnow()
+        diff = now - dt
+        if diff.days > 0:
+            return f"{diff.days}d ago"
+        elif diff.seconds // 3600 > 0:
+            return f"{diff.seconds // 3600}h ago"
+        elif diff.seconds // 60 > 0:
+            return f"{diff.seconds // 60}m ago"
+        else:
+            return "Just now"
+    return "Recently"
+
 
-    # Check if current user liked this post
-    likes = post.get("likes", [])
-    liked_by_current_user = False
+def _format_comment(comment, users_by_id):
+    from datetime import datetime
+    comment_user_id = comment.get("user_id")
+    created_at = comment.get("created_at")
+    return {
+        "id": str(comment["_id"]) if comment.get("_id") else None,
+        "user": _post_user_summary(comment_user_id, users_by_id.get(comment_user_id)),
+        "text": comment.get("text", ""),
+        "timestamp": _relative_time(created_at),
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else None
+    }
+
+
+def _format_posts(posts, current_user_id=None):
+    """Format a page of posts: authors/commenters via the user summary cache (one $in for misses)
+    and one lookup for the viewer's likes."""
+    user_ids = set()
+    for post in posts:
+        user_ids.add(post.get("user_id"))
+        for comment in post.get("recent_comments", []):
+            user_ids.add(comment.get("user_id"))
+    users_by_id = user_summaries.get_many(user_ids)
+    liked_ids = set()
     if current_user_id:
-        current_oid = ObjectId(current_user_id) if isinstance(current_user_id, str) else current_user_id
-        liked_by_current_user = current_oid in likes
+        liked_ids = post_model.liked_post_ids(current_user_id, [p["_id"] for p in posts])
+    return [_format_post(p, current_user_id, users_by_id, liked_ids) for p in posts]
 
-    # Format comments with user details
-    comments_list = []
-    for comment in post.get("comments", []):
-        comment_user_id = comment.get("user_id")
-        comment_user = user_model.find_by_id(comment_user_id)
 
-        comments_list.append({
-            "user": {
-                "id": str(comment_user_id),
-                "username": comment_user.get("username", "unknown") if comment_user else "unknown",
-                "name": comment_user.get("name", "") if comment_user else "",
-                "avatar": (comment_user.get("name", "?")[0].upper() if comment_user and comment_user.get("name") else "👤")
-            },
-            "text": comment.get("text", ""),
-            "timestamp": _format_timestamp(comment.get("created_at")),
-            "created_at": comment.get("created_at").isoformat() if isinstance(comment.get("created_at"), datetime) else None
-        })
+def _format_post(post, current_user_id=None, users_by_id=None, liked_ids=None):
+    """Format post for JSON response with user details and its newest comments.
+    users_by_id / liked_ids come from _format_posts; when omitted they are fetched for this post only."""
+    if not post:
+        return None
+    if users_by_id is None:
+        return _format_posts([post], current_user_id)[0]
+
+    from datetime import datetime
 
+    created_at = post.get("created_at")
     return {
         "id": str(post["_id"]),
-        "user": user_data,
+        "user": _post_user_summary(post.get("user_id"), users_by_id.get(post.get("user_id"))),
         "content": post.get("content", ""),
         "type": post.get("type", "update"),
         "visibility": post.get("visibility", "public"),
-        "likes": len(likes),
-        "liked": liked_by_current_user,
-        "comments": len(post.get("comments", [])),
-        "commentsList": comments_list,
-        "timestamp": timestamp,
+        "likes": post.get("like_count", 0),
+        "liked": post["_id"] in (liked_ids or ()),
+        "comments": post.get("comment_count", 0),
+        "commentsList": [_format_comment(c, users_by_id) for c in post.get("recent_comments", [])],
+        "timestamp": _relative_time(created_at),
         "created_at": created_at.isoformat() if isinstance(created_at, datetime) else None,
         "metadata": post.get("metadata", {})
     }
 
 
+def _next_cursor(posts, limit):
+    """Cursor for the page after this one, or None when this page is the last."""
+    if posts and len(posts) >= limit:
+        return encode_cursor(posts[-1])
+    return None
+
+
 @app.route('/api/feed', methods=['GET'])
 @jwt_required
 def get_feed():
-    """Get posts for the user's feed."""
+    """Get posts for the user's feed. Query: type, limit, before (cursor from nextCursor); skip is deprecated."""
     try:
         feed_type = request.args.get('type', 'all')  # all, friends, own
         limit = int(request.args.get('limit', 50))
         skip = int(request.args.get('skip', 0))
+        before = request.args.get('before')
 
-        posts = post_model.get_feed(request.user_id, limit=limit, skip=skip, feed_type=feed_type)
+        if feed_type == "friends":
+            posts = timeline_model.get_feed(request.user_id, limit=limit, before=before)
+        else:
+            posts = post_model.get_feed(request.user_id, limit=limit, skip=skip, feed_type=feed_type, before=before)
 
         return jsonify({
-            "posts": [_format_post(p, request.user_id) for p in posts]
+            "posts": _format_posts(posts, request.user_id),
+            "nextCursor": _next_cursor(posts, limit),
         }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1571,6 +1807,7 @@ def create_post():
         )
 
         post = post_model.get_post_by_id(post_id)
+        timeline_model.fan_out(post)
 
         return jsonify({
             "message": "Post created successfully",
@@ -1634,6 +1871,7 @@ def delete_post(post_id):
         deleted = post_model.delete_post(post_id, request.user_id)
         if not deleted:
             return jsonify({"error": "Post not found or unauthorized"}), 404
+        timeline_model.retract(request.user_id, post_id)
 
         return jsonify({"message": "Post deleted successfully"}), 200
     except Exception as e:
@@ -1681,10 +1919,34 @@ def add_comment(post_id):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/posts/<post_id>/comments', methods=['GET'])
+@jwt_required
+def get_comments(post_id):
+    """Page through a post's comments, newest first. Query: limit (max 100), before (cursor from nextCursor)."""
+    try:
+        if not post_model.get_post_by_id(post_id):
+            return jsonify({"error": "Post not found"}), 404
+
+        limit = min(int(request.args.get('limit', 20)), 100)
+        before = request.args.get('before')
+
+        comments = post_model.get_comments(post_id, limit=limit, before=before)
+        users_by_id = user_summaries.get_many(c.get("user_id") for c in comments)
+
+        return jsonify({
+            "comments": [_format_comment(c, users_by_id) for c in comments],
+            "nextCursor": _next_cursor(comments, limit),
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/users/<username>/posts', methods=['GET'])
 @jwt_required
 def get_user_posts(username):
-    """Get all posts by a specific user."""
+    """Get all posts by a specific user. Query: limit, before (cursor from nextCursor); skip is deprecated."""
     try:
         user = user_model.find_by_username(username)
         if not user:
@@ -1692,17 +1954,21 @@ def get_user_posts(username):
 
         limit = int(request.args.get('limit', 50))
         skip = int(request.args.get('skip', 0))
+        before = request.args.get('before')
 
-        posts = post_model.get_user_posts(user["_id"], limit=limit, skip=skip)
+        posts = post_model.get_user_posts(user["_id"], limit=limit, skip=skip, before=before)
 
         return jsonify({
-            "posts": [_format_post(p, request.user_id) for p in posts],
+            "posts": _format_posts(posts, request.user_id),
+            "nextCursor": _next_cursor(posts, limit),
             "user": {
                 "id": str(user["_id"]),
                 "username": user.get("username"),
                 "name": user.get("name", "")
             }
         }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1725,4 +1991,8 @@ def health_check():
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
+    # With debug=True this also runs in the reloader's watcher process; only the
+    # child that serves requests (WERKZEUG_RUN_MAIN set) starts the workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        statement_workers.start()
     app.run(debug=True, host='0.0.0.0', port=port)
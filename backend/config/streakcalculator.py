@@ -36,8 +36,19 @@ def to_float(v):
         return 0.0
 
 
+# Net per stored date, summed server-side; same fallbacks as DailyFlow._net_for_entry
+NET_BY_DATE_PIPELINE = [
+    {"$project": {"_id": 0, "date": 1, "net": {"$ifNull": ["$net", {"$subtract": [
+        {"$ifNull": ["$income", 0]},
+        {"$ifNull": ["$expenses", {"$ifNull": ["$expense", 0]}]},
+    ]}]}}},
+    {"$group": {"_id": "$date", "net": {"$sum": "$net"}}},
+    {"$project": {"_id": 0, "date": "$_id", "net": 1}},
+]
+
+
 def compute_streaks(docs):
-    # Group net by date
+    # Group net by date (docs carry either a precomputed net or income/expense)
     nets = {}
     for doc in docs:
         date_val = doc.get("date")
@@ -45,9 +56,11 @@ def compute_streaks(docs):
         if day is None:
             # skip entries without parsable date
             continue
-        income = to_float(doc.get("income", 0))
-        expense = to_float(doc.get("expense", 0))
-        nets[day] = nets.get(day, 0.0) + (income - expense)
+        if "net" in doc:
+            net = to_float(doc["net"])
+        else:
+            net = to_float(doc.get("income", 0)) - to_float(doc.get("expense", 0))
+        nets[day] = nets.get(day, 0.0) + net
 
     if not nets:
         return 0, 0
@@ -96,7 +109,8 @@ def main():
     if user_doc:
         query = {"user_id": user_doc["_id"]}
 
-    docs = list(daily.find(query, {"date": 1, "income": 1, "expense": 1}))
+    # One {date, net} row per stored date instead of every full document
+    docs = daily.aggregate([{"$match": query}] + NET_BY_DATE_PIPELINE)
 
     streak = compute_streaks(docs)
     print(f"Current consecutive positive-day streak (ending at latest entry): {streak}")
@@ -4,6 +4,8 @@ Use this for spending analysis, charts, goal suggestion, and quests so values ar
 """
 from datetime import datetime
 
+from utils.categorizer import KeywordCategorizer
+
 # 1. Statement metadata
 STATEMENT_METADATA = {
     "statement_period": "2026-03-01 to 2026-03-31",
@@ -127,13 +129,21 @@ CATEGORY_TO_SLUG = {
 }
 
 
+_merchant_categorizer = KeywordCategorizer(CATEGORY_MAPPING, default=None)
+
+
 def _merchant_to_category(merchant):
     """Return category slug for a merchant from CATEGORY_MAPPING."""
-    for cat_name, merchants in CATEGORY_MAPPING.items():
-        for m in merchants:
-            if m.lower() in (merchant or "").lower() or (merchant or "").lower() in m.lower():
-                return CATEGORY_TO_SLUG.get(cat_name, "other")
-    return "other"
+    cat_name = _merchant_categorizer.categorize(merchant)
+    # Also accept a merchant that is part of a mapping entry (e.g. "Uber" for "Uber Trip")
+    name = (merchant or "").lower()
+    for candidate, merchants in CATEGORY_MAPPING.items():
+        if candidate == cat_name:
+            break
+        if any(name in m.lower() for m in merchants):
+            cat_name = candidate
+            break
+    return CATEGORY_TO_SLUG.get(cat_name, "other")
 
 
 def get_mock_transactions_for_upload():
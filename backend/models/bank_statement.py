@@ -1,27 +1,72 @@
 """Bank statements and parsed transactions for spending analysis."""
+import hashlib
+import re
 from datetime import datetime
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models.cash_flow import CashFlowSummary
+from models.spending_rollup import SpendingRollup, add_months, month_start
+from utils.series_cache import series_cache
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def transaction_fingerprints(transactions):
+    """
+    Per-user identity of each transaction: date, amount in cents, normalized description
+    and an ordinal among identical rows of the same statement, so two equal coffees on one
+    day stay two rows while the same rows in an overlapping statement match.
+    """
+    seen = {}
+    out = []
+    for t in transactions:
+        date = t.get("date")
+        day = date.strftime("%Y-%m-%d") if hasattr(date, "strftime") else str(date or "")
+        cents = int(round(float(t.get("amount", 0)) * 100))
+        description = _NON_ALNUM.sub(" ", (t.get("description") or "").lower()).strip()[:80]
+        key = f"{day}|{cents}|{description}"
+        ordinal = seen.get(key, 0)
+        seen[key] = ordinal + 1
+        out.append(hashlib.sha1(f"{key}|{ordinal}".encode()).hexdigest())
+    return out
 
 
 class BankStatement:
     def __init__(self, db):
         self.collection = db.bank_statements
         self.transactions = db.transactions
+        self.rollups = SpendingRollup(db)
+        self.cash_flow = CashFlowSummary(db)
+        series_cache.attach(db.transaction_versions)
         self._create_indexes()
 
     def _create_indexes(self):
         self.collection.create_index("user_id")
         self.transactions.create_index([("user_id", 1), ("date", -1)])
+        # Covers iter_transactions' (date, _id) sort so exports stream without an in-memory sort
+        self.transactions.create_index([("user_id", 1), ("date", 1), ("_id", 1)])
         self.transactions.create_index([("user_id", 1), ("category", 1)])
+        self.transactions.create_index("statement_id")
+        self.transactions.create_index("statement_ids")
+        # Rows from before fingerprints existed have none (see scripts/migrate_transaction_fingerprints.py)
+        self.transactions.create_index(
+            [("user_id", 1), ("fingerprint", 1)],
+            unique=True,
+            partialFilterExpression={"fingerprint": {"$exists": True}}
+        )
 
-    def create(self, user_id, filename, file_size_bytes, parsed_at=None):
+    def create(self, user_id, filename, file_size_bytes, parsed_at=None, status="processed", sha256=None):
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         doc = {
             "user_id": user_id,
             "filename": filename,
             "file_size_bytes": file_size_bytes,
+            "sha256": sha256,
             "parsed_at": parsed_at or datetime.utcnow(),
+            "status": status,
             "transaction_count": 0,
             "created_at": datetime.utcnow(),
         }
@@ -38,57 +83,222 @@ class BankStatement:
             user_id = ObjectId(user_id)
         return list(self.collection.find({"user_id": user_id}).sort("created_at", -1).limit(limit))
 
-    def update_transaction_count(self, statement_id, count):
+    def update_transaction_count(self, statement_id, count, duplicate_count=0):
         if isinstance(statement_id, str):
             statement_id = ObjectId(statement_id)
         return self.collection.update_one(
             {"_id": statement_id},
-            {"$set": {"transaction_count": count, "updated_at": datetime.utcnow()}}
+            {"$set": {"transaction_count": count, "duplicate_count": duplicate_count, "updated_at": datetime.utcnow()}}
         )
 
+    def set_status(self, statement_id, status):
+        """queued -> processing -> processed | failed (set by the statement workers)."""
+        if isinstance(statement_id, str):
+            statement_id = ObjectId(statement_id)
+        update = {"status": status, "updated_at": datetime.utcnow()}
+        if status == "processed":
+            update["parsed_at"] = update["updated_at"]
+        return self.collection.update_one({"_id": statement_id}, {"$set": update})
+
+    def set_extraction(self, statement_id, report):
+        """Record which extraction path was taken and per-strategy timings/scores."""
+        if isinstance(statement_id, str):
+            statement_id = ObjectId(statement_id)
+        return self.collection.update_one({"_id": statement_id}, {"$set": {"extraction": report}})
+
+    def get_extraction_stats(self, days=None):
+        """[{_id: path, count, avg_ms, max_ms}] over processed statements, most used path first."""
+        from datetime import timedelta
+        match = {"extraction.path": {"$ne": None}}
+        if days:
+            match["created_at"] = {"$gte": datetime.utcnow() - timedelta(days=days)}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": "$extraction.path",
+                "count": {"$sum": 1},
+                "avg_ms": {"$avg": "$extraction.total_ms"},
+                "max_ms": {"$max": "$extraction.total_ms"},
+            }},
+            {"$sort": {"count": -1}},
+        ]
+        return list(self.collection.aggregate(pipeline))
+
     def insert_transactions(self, user_id, statement_id, transactions_list):
+        """
+        Upsert a statement's transactions on their fingerprint; rows the user already has
+        (from an overlapping statement) are linked to this statement, not inserted again.
+        Returns (inserted, duplicates) and records both on the statement.
+        """
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         if isinstance(statement_id, str):
             statement_id = ObjectId(statement_id)
-        docs = []
-        for t in transactions_list:
-            docs.append({
-                "user_id": user_id,
-                "statement_id": statement_id,
-                "date": t.get("date"),
-                "description": t.get("description", ""),
-                "amount": float(t.get("amount", 0)),
-                "category": t.get("category", "other"),
-                "created_at": datetime.utcnow(),
-            })
-        if docs:
-            self.transactions.insert_many(docs)
-        self.update_transaction_count(statement_id, len(docs))
-        return len(docs)
+        now = datetime.utcnow()
+        docs = [{
+            "statement_id": statement_id,
+            "date": t.get("date"),
+            "description": t.get("description", ""),
+            "amount": float(t.get("amount", 0)),
+            "category": t.get("category", "other"),
+            "created_at": now,
+        } for t in transactions_list]
+        ops = [
+            UpdateOne(
+                {"user_id": user_id, "fingerprint": fingerprint},
+                {"$setOnInsert": doc, "$addToSet": {"statement_ids": statement_id}},
+                upsert=True
+            )
+            for doc, fingerprint in zip(docs, transaction_fingerprints(transactions_list))
+        ]
+        upserted = []
+        if ops:
+            try:
+                upserted = list(self.transactions.bulk_write(ops, ordered=False).upserted_ids)
+            except BulkWriteError as e:
+                # Two statements upserting the same new row at once: the loser is a duplicate
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+                upserted = [u["index"] for u in e.details.get("upserted", [])]
+        inserted_docs = [docs[i] for i in upserted]
+        self.rollups.add(user_id, inserted_docs)
+        self.cash_flow.add(user_id, inserted_docs)
+        if upserted:
+            series_cache.bump(user_id)
+        inserted = len(upserted)
+        duplicates = len(ops) - inserted
+        self.update_transaction_count(statement_id, inserted, duplicates)
+        return inserted, duplicates
+
+    def _release_transactions(self, statement_id, user_id=None):
+        """
+        Unlink a statement from its transactions and delete the ones no other statement
+        has; rows shared with another statement move to it. Returns the deleted count.
+        """
+        match = {"statement_ids": statement_id}
+        if user_id is not None:
+            match["user_id"] = user_id
+        linked = {"$or": [match, {"statement_id": statement_id}]}
+        first = self.transactions.find_one(linked, {"user_id": 1, "date": 1}, sort=[("date", 1)])
+        last = self.transactions.find_one(linked, {"date": 1}, sort=[("date", -1)])
+        self.transactions.update_many(match, {"$pull": {"statement_ids": statement_id}})
+        orphaned = {"statement_ids": {"$size": 0}, "statement_id": statement_id}
+        legacy = {"statement_ids": {"$exists": False}, "statement_id": statement_id}
+        if user_id is not None:
+            orphaned["user_id"] = legacy["user_id"] = user_id
+        deleted = self.transactions.delete_many({"$or": [orphaned, legacy]}).deleted_count
+        self.transactions.update_many(
+            {"statement_id": statement_id},
+            [{"$set": {"statement_id": {"$arrayElemAt": ["$statement_ids", 0]}}}]
+        )
+        if deleted:
+            series_cache.bump(first["user_id"])
+            if isinstance(first.get("date"), datetime) and isinstance(last.get("date"), datetime):
+                self.rollups.refresh(first["user_id"], first["date"], last["date"])
+                self.cash_flow.refresh(first["user_id"], first["date"], last["date"])
+        return deleted
+
+    def replace_transactions(self, user_id, statement_id, transactions_list):
+        """Insert a statement's transactions, dropping any left by an earlier attempt first."""
+        if isinstance(statement_id, str):
+            statement_id = ObjectId(statement_id)
+        self._release_transactions(statement_id)
+        return self.insert_transactions(user_id, statement_id, transactions_list)
 
     def get_user_transactions(self, user_id, limit=500):
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         return list(self.transactions.find({"user_id": user_id}).sort("date", -1).limit(limit))
 
-    def get_spending_by_category(self, user_id, days=None):
+    def iter_transactions(self, user_id, start=None, end=None, category=None, batch_size=500):
+        """
+        Yield the user's transactions oldest first (date in [start, end), optional
+        category) from a cursor fetching batch_size at a time, so any number of rows can
+        be exported in constant memory.
+        """
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
-        from datetime import timedelta
-        match = {"user_id": user_id, "amount": {"$lt": 0}}
+        query = {"user_id": user_id}
+        if start or end:
+            query["date"] = {}
+            if start:
+                query["date"]["$gte"] = start
+            if end:
+                query["date"]["$lt"] = end
+        if category:
+            query["category"] = category
+        projection = {"date": 1, "description": 1, "amount": 1, "category": 1, "statement_id": 1}
+        cursor = self.transactions.find(query, projection).sort([("date", 1), ("_id", 1)]).batch_size(batch_size)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def update_transaction_category(self, transaction_id, user_id, category):
+        """Set one of the user's transactions to a category; returns the updated transaction or None."""
+        from pymongo import ReturnDocument
+        if isinstance(transaction_id, str):
+            transaction_id = ObjectId(transaction_id)
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        txn = self.transactions.find_one_and_update(
+            {"_id": transaction_id, "user_id": user_id},
+            {"$set": {"category": category, "category_source": "user", "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if txn:
+            series_cache.bump(user_id)
+        if txn and isinstance(txn.get("date"), datetime) and float(txn.get("amount") or 0) < 0:
+            self.rollups.refresh(user_id, txn["date"])
+        return txn
+
+    def get_spending_by_category(self, user_id, days=None):
+        """[{_id: category, total}] of expenses (negative totals), from the monthly rollups."""
+        now = datetime.utcnow()
         if days:
-            since = datetime.utcnow() - timedelta(days=days)
-            match["date"] = {"$gte": since}
+            from datetime import timedelta
+            start = now - timedelta(days=days)
+        else:
+            start = add_months(month_start(now), -1200)
+        by_category = self.rollups.get_by_category(user_id, start, now)
+        return sorted(
+            ({"_id": category, "total": -c["total"]} for category, c in by_category.items()),
+            key=lambda r: r["total"]
+        )
+
+    def get_spending_series(self, user_id, bucket, start, end, category=None):
+        """
+        [{period, income, expenses, net, count}] per day / week (Monday) / month in
+        [start, end), oldest first; periods without transactions are omitted.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        match = {"user_id": user_id, "date": {"$gte": start, "$lt": end}}
+        if category:
+            match["category"] = category
         pipeline = [
             {"$match": match},
-            {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
-            {"$sort": {"total": 1}},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$date", "unit": bucket, "startOfWeek": "monday"}},
+                "income": {"$sum": {"$cond": [{"$gt": ["$amount", 0]}, "$amount", 0]}},
+                "expenses": {"$sum": {"$cond": [{"$lt": ["$amount", 0]}, {"$abs": "$amount"}, 0]}},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        return [
+            {
+                "period": g["_id"].strftime("%Y-%m-%d"),
+                "income": round(g["income"], 2),
+                "expenses": round(g["expenses"], 2),
+                "net": round(g["income"] - g["expenses"], 2),
+                "count": g["count"],
+            }
+            for g in self.transactions.aggregate(pipeline)
         ]
-        return list(self.transactions.aggregate(pipeline))
 
     def delete_statement(self, statement_id, user_id):
-        """Delete a statement and all its transactions. Returns deleted count."""
+        """Delete a statement and the transactions no other statement shares. Returns deleted count."""
         if isinstance(statement_id, str):
             statement_id = ObjectId(statement_id)
         if isinstance(user_id, str):
@@ -96,6 +306,6 @@ class BankStatement:
         doc = self.collection.find_one({"_id": statement_id, "user_id": user_id})
         if not doc:
             return 0
-        result = self.transactions.delete_many({"statement_id": statement_id, "user_id": user_id})
+        deleted = self._release_transactions(statement_id, user_id)
         self.collection.delete_one({"_id": statement_id})
-        return result.deleted_count
+        return deleted
@@ -0,0 +1,153 @@
+"""
+Cash-flow summary – one document per user with income and expenses per month.
+
+Goal level calculations read the monthly averages from it in one point lookup
+instead of summing the user's transactions. The averages cover the WINDOW_MONTHS
+months ending at the user's latest complete month with transactions, so a month
+still in progress does not pull them down and a user whose statements are older
+still gets their own figures; only a user whose sole data is the current month
+uses that partial month. New transactions are added incrementally ($inc);
+deleted statements recompute their months from transactions. Summaries from
+before SUMMARY_VERSION (which dropped months by wall clock) are rebuilt on first
+read, as are users with transactions but no summary.
+"""
+
+from datetime import datetime
+from bson import ObjectId
+
+from models.spending_rollup import add_months, month_start
+
+WINDOW_MONTHS = 3
+SUMMARY_VERSION = 2
+DEFAULT_MONTHLY_INCOME = 3000
+DEFAULT_MONTHLY_EXPENSES = 2200
+
+
+def month_key(dt):
+    return dt.strftime("%Y-%m")
+
+
+def window_months(keys, now=None):
+    """
+    The month keys to average: the WINDOW_MONTHS months ending at the latest complete
+    month in keys (before now's month), or the current month if it is the only one.
+    """
+    current = month_key(now or datetime.utcnow())
+    complete = sorted(k for k in keys if k < current)
+    if not complete:
+        return [k for k in keys if k == current]
+    last = datetime.strptime(complete[-1], "%Y-%m")
+    cutoff = month_key(add_months(last, 1 - WINDOW_MONTHS))
+    return [k for k in complete if k >= cutoff]
+
+
+class CashFlowSummary:
+    def __init__(self, db):
+        self.collection = db.cash_flow_summaries
+        self.transactions = db.transactions
+
+    def add(self, user_id, transactions):
+        """Add newly inserted transactions to their months."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        inc = {}
+        for t in transactions:
+            amount = float(t.get("amount") or 0)
+            date = t.get("date")
+            if not amount or not isinstance(date, datetime):
+                continue
+            field = "income" if amount > 0 else "expenses"
+            key = f"months.{month_key(date)}"
+            inc[f"{key}.{field}"] = round(inc.get(f"{key}.{field}", 0) + abs(amount), 2)
+            inc[f"{key}.count"] = inc.get(f"{key}.count", 0) + 1
+        if not inc:
+            return
+        self.collection.update_one(
+            {"_id": user_id},
+            {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    def refresh(self, user_id, start_month=None, end_month=None):
+        """
+        Recompute months start_month..end_month from transactions; with neither, rebuild
+        the whole summary.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        match = {"user_id": user_id, "amount": {"$ne": 0}}
+        if start_month or end_month:
+            start = month_start(start_month or end_month)
+            end = add_months(month_start(end_month or start_month), 1)
+            match["date"] = {"$gte": start, "$lt": end}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"year": {"$year": "$date"}, "month": {"$month": "$date"}},
+                "income": {"$sum": {"$cond": [{"$gt": ["$amount", 0]}, "$amount", 0]}},
+                "expenses": {"$sum": {"$cond": [{"$lt": ["$amount", 0]}, {"$abs": "$amount"}, 0]}},
+                "count": {"$sum": 1},
+            }},
+        ]
+        found = {
+            month_key(datetime(g["_id"]["year"], g["_id"]["month"], 1)): {
+                "income": round(g["income"], 2), "expenses": round(g["expenses"], 2), "count": g["count"]
+            }
+            for g in self.transactions.aggregate(pipeline)
+            if g["_id"]["year"] is not None
+        }
+        update = {"$set": {"updated_at": datetime.utcnow()}}
+        if "date" not in match:
+            update["$set"].update({"months": found, "version": SUMMARY_VERSION})
+        else:
+            month = start
+            while month < end:
+                key = month_key(month)
+                if key in found:
+                    update["$set"][f"months.{key}"] = found[key]
+                else:
+                    update.setdefault("$unset", {})[f"months.{key}"] = ""
+                month = add_months(month, 1)
+        self.collection.update_one({"_id": user_id}, update, upsert=True)
+
+    def get(self, user_id, now=None):
+        """
+        {"monthly_income", "monthly_expenses", "months", "through"}: averages over the
+        window's months that have transactions (see window_months), or None if there are none.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        doc = self.collection.find_one({"_id": user_id})
+        if doc is None or doc.get("version") != SUMMARY_VERSION:
+            if not self.transactions.find_one({"user_id": user_id}, {"_id": 1}):
+                return None
+            self.refresh(user_id)
+            doc = self.collection.find_one({"_id": user_id})
+        by_month = {k: m for k, m in (doc or {}).get("months", {}).items() if m.get("count")}
+        keys = window_months(by_month, now)
+        if not keys:
+            return None
+        months = [by_month[k] for k in keys]
+        return {
+            "monthly_income": round(sum(m.get("income", 0) for m in months) / len(months), 2),
+            "monthly_expenses": round(sum(m.get("expenses", 0) for m in months) / len(months), 2),
+            "months": len(months),
+            "through": keys[-1],
+        }
+
+    def goal_inputs(self, user_id):
+        """
+        (monthly_income, avg_expenses) for goal level calculations: the user's averages,
+        or DEFAULT_MONTHLY_INCOME / DEFAULT_MONTHLY_EXPENSES where there is no data (or
+        the summary cannot be read).
+        """
+        monthly_income, avg_expenses = DEFAULT_MONTHLY_INCOME, DEFAULT_MONTHLY_EXPENSES
+        try:
+            cash_flow = self.get(user_id)
+        except Exception:
+            cash_flow = None
+        if cash_flow:
+            if cash_flow["monthly_income"] > 0:
+                monthly_income = max(1, cash_flow["monthly_income"])
+            avg_expenses = cash_flow["monthly_expenses"] or DEFAULT_MONTHLY_EXPENSES
+        return monthly_income, avg_expenses
@@ -1,10 +1,35 @@
 """
 Daily flow model – income and expenses per day per user.
 Used for streak calculation: if (income - expenses) < 0, streak resets.
+
+Streak state is kept on the user document (users.streak_state) and updated
+incrementally by add_entry, so reading a streak is O(1):
+    current     – entries in the trailing run with net >= 0
+    start_date  – first entry of that run (None when current == 0)
+    last_date   – most recent entry
+    break_date  – most recent entry with net < 0 (None if there is none)
+    longest     – longest run seen
+Back-dated entries and edits before break_date cannot change the current run;
+other edits touch only the entries after the nearest break. Edits that can join or
+split an earlier run (before break_date, or a new break inside the current run)
+recount longest with one projected scan of the user's history. reconcile_streaks()
+recomputes everything from history to repair drift (e.g. rows written directly by
+config/insertdb_flow.py).
 """
 
 from datetime import datetime, date
 from bson import ObjectId
+from pymongo import UpdateOne
+
+from utils.user_cache import user_summaries
+
+MAX_CALENDAR_MONTHS = 24
+
+# Aggregation equivalent of DailyFlow._net_for_entry
+NET_EXPRESSION = {"$ifNull": ["$net", {"$subtract": [
+    {"$ifNull": ["$income", 0]},
+    {"$ifNull": ["$expenses", {"$ifNull": ["$expense", 0]}]},
+]}]}
 
 
 def parse_date(d):
@@ -18,9 +43,34 @@ def parse_date(d):
     return d
 
 
+def month_index(year, month):
+    """Months since year 0, so month ranges can be iterated as integers."""
+    return year * 12 + month - 1
+
+
+def days_from_bitmap(bitmap):
+    """Days of the month (1-based) whose bit is set."""
+    return [d + 1 for d in range(31) if bitmap >> d & 1]
+
+
+def compute_streak_state(entries):
+    """Streak state from (date, net) pairs sorted by date ascending."""
+    state = {"current": 0, "start_date": None, "last_date": None, "break_date": None, "longest": 0}
+    for dt, net in entries:
+        if net >= 0:
+            state["current"] += 1
+            state["start_date"] = state["start_date"] or dt
+            state["longest"] = max(state["longest"], state["current"])
+        else:
+            state.update(current=0, start_date=None, break_date=dt)
+        state["last_date"] = dt
+    return state
+
+
 class DailyFlow:
     def __init__(self, db):
         self.collection = db.daily_flow
+        self.users = db.users
         self._create_indexes()
 
     def _create_indexes(self):
@@ -39,11 +89,115 @@ class DailyFlow:
             "net": float(income) - float(expenses),
             "updated_at": datetime.utcnow(),
         }
-        self.collection.update_one(
+        result = self.collection.update_one(
             {"user_id": user_id, "date": dt},
             {"$set": doc},
             upsert=True
         )
+        self._apply_entry(user_id, dt, doc["net"], inserted=result.upserted_id is not None)
+
+    def _apply_entry(self, user_id, dt, net, inserted):
+        """Advance the stored streak state for one written entry."""
+        state = self._stored_state(user_id)
+        if state is None:
+            self.rebuild_streak(user_id)  # first write since streak state was introduced
+            return
+        last, brk = state["last_date"], state["break_date"]
+
+        if last is None or dt > last:
+            # Common case: today's entry appended after everything else
+            if net >= 0:
+                state["current"] += 1
+                state["start_date"] = state["start_date"] or dt
+            else:
+                state.update(current=0, start_date=None, break_date=dt)
+            state["last_date"] = dt
+        elif brk is not None and dt < brk:
+            # A negative entry after dt still bounds the current run, but an earlier run
+            # may have been joined, extended or split
+            state["longest"] = self._longest_run(user_id)
+        elif brk is not None and dt == brk:
+            if net < 0:
+                return
+            # The entry that broke the run is now positive: runs before it join the current one
+            state = self._scan_trailing_run(user_id, state)
+        elif net >= 0:
+            if inserted:
+                state["current"] += 1
+                state["start_date"] = min(state["start_date"] or dt, dt)
+            # else: an entry in the run was edited and is still positive
+        else:
+            # New break inside the run: only entries after dt still count
+            later = {"user_id": user_id, "date": {"$gt": dt, "$lte": last}}
+            state["current"] = self.collection.count_documents(later)
+            first = self.collection.find_one(later, {"date": 1}, sort=[("date", 1)])
+            state.update(start_date=first["date"] if first else None, break_date=dt)
+            state["longest"] = self._longest_run(user_id)  # the split run may have been the longest
+        self._save_streak_state(user_id, state)
+
+    def _longest_run(self, user_id):
+        """Longest run of entries with net >= 0 in the user's history."""
+        longest = run = 0
+        cursor = self.collection.find(
+            {"user_id": user_id},
+            {"date": 1, "net": 1, "income": 1, "expenses": 1, "expense": 1, "_id": 0}
+        ).sort("date", 1).batch_size(500)
+        for e in cursor:
+            run = run + 1 if self._net_for_entry(e) >= 0 else 0
+            longest = max(longest, run)
+        cursor.close()
+        return longest
+
+    def _scan_trailing_run(self, user_id, state):
+        """Recount the trailing run newest-first, stopping at the first negative entry."""
+        state.update(current=0, start_date=None, break_date=None)
+        cursor = self.collection.find(
+            {"user_id": user_id},
+            {"date": 1, "net": 1, "income": 1, "expenses": 1, "expense": 1}
+        ).sort("date", -1).batch_size(100)
+        for e in cursor:
+            if self._net_for_entry(e) < 0:
+                state["break_date"] = e["date"]
+                break
+            state["current"] += 1
+            state["start_date"] = e["date"]
+        cursor.close()
+        return state
+
+    def _save_streak_state(self, user_id, state):
+        state["longest"] = max(state.get("longest") or 0, state["current"])
+        self.users.update_one(
+            {"_id": user_id},
+            {"$set": {
+                "streak_state": state,
+                "current_streak": state["current"],
+                "longest_streak": state["longest"],
+            }}
+        )
+        user_summaries.invalidate(user_id)
+
+    def _stored_state(self, user_id, user=None):
+        if user is None:
+            user = self.users.find_one({"_id": user_id}, {"streak_state": 1})
+        return (user or {}).get("streak_state")
+
+    def get_streak_state(self, user_id, user=None):
+        """Stored streak state (one point lookup, none if the user doc is passed in); built on first use."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        state = self._stored_state(user_id, user)
+        if state is None:
+            state = self.rebuild_streak(user_id)
+        return state
+
+    def rebuild_streak(self, user_id):
+        """Recompute and store one user's streak state from their full history."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        entries = [(e["date"], self._net_for_entry(e)) for e in self.get_user_entries(user_id)]
+        state = compute_streak_state(entries)
+        self._save_streak_state(user_id, state)
+        return state
 
     def get_user_entries(self, user_id, start_date=None, end_date=None):
         """Get daily flow entries for a user, optionally filtered by date range."""
@@ -56,6 +210,35 @@ class DailyFlow:
             query.setdefault("date", {})["$lte"] = parse_date(end_date)
         return list(self.collection.find(query).sort("date", 1))
 
+    def get_calendar(self, user_id, start_year, start_month, end_year=None, end_month=None):
+        """
+        Achieved days (net >= 0) for each month in an inclusive range, as
+        [{"year", "month", "bitmap"}] where bit d-1 of bitmap is day d.
+        One aggregation; only the dates of achieved days come back from the server.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        end_year, end_month = end_year or start_year, end_month or start_month
+        if not (1 <= start_month <= 12 and 1 <= end_month <= 12):
+            raise ValueError("Month must be between 1 and 12")
+        first = month_index(start_year, start_month)
+        last = month_index(end_year, end_month)
+        if last < first or last - first >= MAX_CALENDAR_MONTHS:
+            raise ValueError(f"Month range must cover 1 to {MAX_CALENDAR_MONTHS} months")
+        start = datetime(first // 12, first % 12 + 1, 1)
+        end = datetime((last + 1) // 12, (last + 1) % 12 + 1, 1)
+        bitmaps = {m: 0 for m in range(first, last + 1)}
+        pipeline = [
+            {"$match": {"user_id": user_id, "date": {"$gte": start, "$lt": end}}},
+            {"$project": {"_id": 0, "date": 1, "net": NET_EXPRESSION}},
+            {"$match": {"net": {"$gte": 0}}},
+            {"$project": {"date": 1}},
+        ]
+        for e in self.collection.aggregate(pipeline):
+            d = e["date"]
+            bitmaps[month_index(d.year, d.month)] |= 1 << (d.day - 1)
+        return [{"year": m // 12, "month": m % 12 + 1, "bitmap": bitmap} for m, bitmap in bitmaps.items()]
+
     def _net_for_entry(self, e):
         """Net for one entry; supports 'net', 'expenses', or 'expense' (insertdb_flow)."""
         if e.get("net") is not None:
@@ -64,25 +247,51 @@ class DailyFlow:
         exp = float(e.get("expenses") if e.get("expenses") is not None else e.get("expense") or 0)
         return inc - exp
 
-    def calculate_streak(self, user_id, as_of_date=None):
+    def calculate_streak(self, user_id, as_of_date=None, user=None):
         """
-        Calculate current streak from daily flow data.
-        Streak = consecutive days (ending at most recent) where (income - expenses) >= 0.
+        Current streak: consecutive entries (ending at most recent) where (income - expenses) >= 0.
         If (income - expenses) < 0 on a day, streak resets.
+        Reads the incrementally maintained state (pass the user doc to skip the lookup);
+        with as_of_date the streak is recomputed from history up to that date.
         Works with both 'expense' (insertdb_flow) and 'expenses'/'net' (DailyFlow) schemas.
         """
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
-        entries = self.get_user_entries(user_id)
-        if not entries:
-            return 0
-        entries.sort(key=lambda e: e["date"])
-        as_of = parse_date(as_of_date) if as_of_date else entries[-1]["date"]
-        entries = [e for e in entries if e["date"] <= as_of]
-        streak = 0
-        for e in reversed(entries):
-            if self._net_for_entry(e) >= 0:
-                streak += 1
-            else:
-                break
-        return streak
+        if as_of_date:
+            entries = self.get_user_entries(user_id, end_date=as_of_date)
+            return compute_streak_state([(e["date"], self._net_for_entry(e)) for e in entries])["current"]
+        return self.get_streak_state(user_id, user=user)["current"]
+
+    def reconcile_streaks(self, user_ids=None):
+        """
+        Recompute streak state for every user (or the given ones) from daily_flow in one
+        aggregation and rewrite the users whose stored state drifted.
+        Returns {"users": checked, "drifted": rewritten}.
+        """
+        match = {}
+        if user_ids is not None:
+            match["user_id"] = {"$in": [ObjectId(u) if isinstance(u, str) else u for u in user_ids]}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"user_id": 1, "date": 1}},
+            {"$group": {"_id": "$user_id", "entries": {"$push": {"date": "$date", "net": NET_EXPRESSION}}}},
+        ]
+        user_query = {"_id": match["user_id"]} if match else {}
+        stored = {u["_id"]: u.get("streak_state") for u in self.users.find(user_query, {"streak_state": 1})}
+        checked = 0
+        ops = []
+        for group in self.collection.aggregate(pipeline, allowDiskUse=True):
+            if group["_id"] not in stored:
+                continue  # entries left behind by a deleted user
+            checked += 1
+            state = compute_streak_state([(e["date"], e["net"]) for e in group["entries"]])
+            if stored[group["_id"]] != state:
+                ops.append(UpdateOne({"_id": group["_id"]}, {"$set": {
+                    "streak_state": state,
+                    "current_streak": state["current"],
+                    "longest_streak": state["longest"],
+                }}))
+        if ops:
+            self.users.bulk_write(ops, ordered=False)
+            user_summaries.clear()
+        return {"users": checked, "drifted": len(ops)}
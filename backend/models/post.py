@@ -1,9 +1,55 @@
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(post):
+    """Opaque keyset cursor for the (created_at, _id) position of a post."""
+    created_at = post["created_at"]
+    millis = (created_at - EPOCH) // timedelta(milliseconds=1)
+    raw = f"{millis}:{post['_id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (created_at, _id) from an encode_cursor value. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        millis, post_id = raw.split(":", 1)
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(post_id)
+    except (ValueError, TypeError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def before_cursor_query(cursor):
+    """Filter for posts strictly older than the cursor in (created_at, _id) order."""
+    created_at, post_id = decode_cursor(cursor)
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": post_id}},
+    ]}
+
+
+# Newest first; _id breaks ties between posts created in the same millisecond
+FEED_SORT = [("created_at", -1), ("_id", -1)]
+
+# Newest comments kept embedded on the post for feed rendering; the rest are paged from post_comments
+RECENT_COMMENTS = 3
+
+# Legacy embedded arrays (pre post_likes/post_comments) are never shipped with a page of posts
+LIST_PROJECTION = {"likes": 0, "comments": 0}
+
 
 class Post:
     def __init__(self, db):
         self.collection = db.posts
+        self.likes = db.post_likes
+        self.comments = db.post_comments
         self._create_indexes()
 
     def _create_indexes(self):
@@ -11,6 +57,13 @@ class Post:
         self.collection.create_index("user_id")
         self.collection.create_index([("created_at", -1)])
         self.collection.create_index([("type", 1), ("created_at", -1)])
+        # Keyset pagination: (created_at, _id) for the global feed, prefixed by author for timelines
+        self.collection.create_index(FEED_SORT)
+        self.collection.create_index([("user_id", 1)] + FEED_SORT)
+        # One like per (user, post); also serves "which of these posts did I like" per page
+        self.likes.create_index([("user_id", 1), ("post_id", 1)], unique=True)
+        self.likes.create_index("post_id")
+        self.comments.create_index([("post_id", 1)] + FEED_SORT)
 
     def create_post(self, user_id, content, post_type="update", visibility="public", metadata=None):
         """
@@ -32,23 +85,26 @@ class Post:
             "type": post_type,
             "visibility": visibility,
             "metadata": metadata or {},
-            "likes": [],  # Array of user_ids who liked
-            "comments": [],  # Array of comment objects
+            "like_count": 0,  # Likes live in post_likes
+            "comment_count": 0,  # Comments live in post_comments
+            "recent_comments": [],  # Newest RECENT_COMMENTS comments, oldest first
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
         result = self.collection.insert_one(post)
         return result.inserted_id
 
-    def get_feed(self, user_id, limit=50, skip=0, feed_type="all"):
+    def get_feed(self, user_id, limit=50, skip=0, feed_type="all", before=None):
         """
         Get posts for user's feed
 
         Args:
             user_id: Current user viewing the feed
             limit: Number of posts to return
-            skip: Number of posts to skip (pagination)
-            feed_type: "all" (public + friends), "friends", "own"
+            skip: Deprecated offset pagination; ignored when before is given
+            feed_type: "all" (public + friends), "own"; the "friends" feed is
+                served from the materialized timeline (models/timeline.py)
+            before: Cursor from encode_cursor; returns posts older than it
         """
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
@@ -58,26 +114,27 @@ class Post:
         if feed_type == "own":
             # Only user's own posts
             query["user_id"] = user_id
-        elif feed_type == "friends":
-            # Posts from friends only (requires friends list)
-            # For now, just public posts
-            query["visibility"] = {"$in": ["public", "friends-only"]}
         else:
             # All public posts
             query["visibility"] = {"$in": ["public", "friends-only"]}
 
-        posts = list(self.collection.find(query)
-                     .sort("created_at", -1)
-                     .skip(skip)
-                     .limit(limit))
+        return self._page(query, limit, skip, before)
 
-        return posts
+    def _page(self, query, limit, skip=0, before=None):
+        """One page in FEED_SORT order: keyset when a cursor is given, else (deprecated) skip."""
+        if before:
+            query = {**query, **before_cursor_query(before)}
+            skip = 0
+        cursor = self.collection.find(query, LIST_PROJECTION).sort(FEED_SORT)
+        if skip:
+            cursor = cursor.skip(skip)
+        return list(cursor.limit(limit))
 
     def get_post_by_id(self, post_id):
         """Get a specific post"""
         if isinstance(post_id, str):
             post_id = ObjectId(post_id)
-        return self.collection.find_one({"_id": post_id})
+        return self.collection.find_one({"_id": post_id}, LIST_PROJECTION)
 
     def update_post(self, post_id, update_data):
         """Update post content"""
@@ -91,7 +148,7 @@ class Post:
         )
 
     def delete_post(self, post_id, user_id):
-        """Delete a post (only by owner)"""
+        """Delete a post (only by owner) along with its likes and comments"""
         if isinstance(post_id, str):
             post_id = ObjectId(post_id)
         if isinstance(user_id, str):
@@ -101,7 +158,11 @@ class Post:
             "_id": post_id,
             "user_id": user_id
         })
-        return result.deleted_count > 0
+        if result.deleted_count == 0:
+            return False
+        self.likes.delete_many({"post_id": post_id})
+        self.comments.delete_many({"post_id": post_id})
+        return True
 
     def like_post(self, post_id, user_id):
         """Like a post (toggle: if already liked, unlike)"""
@@ -110,33 +171,36 @@ class Post:
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
 
-        post = self.get_post_by_id(post_id)
-        if not post:
+        if not self.collection.find_one({"_id": post_id}, {"_id": 1}):
             return None
 
-        likes = post.get("likes", [])
-
-        # Toggle like
-        if user_id in likes:
-            # Unlike
-            result = self.collection.update_one(
-                {"_id": post_id},
-                {
-                    "$pull": {"likes": user_id},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            return {"liked": False, "like_count": len(likes) - 1}
-        else:
-            # Like
-            result = self.collection.update_one(
-                {"_id": post_id},
-                {
-                    "$addToSet": {"likes": user_id},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            return {"liked": True, "like_count": len(likes) + 1}
+        # The unique (user_id, post_id) index decides the toggle atomically
+        try:
+            self.likes.insert_one({"post_id": post_id, "user_id": user_id, "created_at": datetime.utcnow()})
+            liked, delta = True, 1
+        except DuplicateKeyError:
+            removed = self.likes.delete_one({"post_id": post_id, "user_id": user_id}).deleted_count
+            liked, delta = False, -removed
+
+        post = self.collection.find_one_and_update(
+            {"_id": post_id},
+            {
+                "$inc": {"like_count": delta},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            projection={"like_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return {"liked": liked, "like_count": max(0, (post or {}).get("like_count", 0))}
+
+    def liked_post_ids(self, user_id, post_ids):
+        """Subset of post_ids the user has liked (one indexed query per page)"""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        if not post_ids:
+            return set()
+        docs = self.likes.find({"user_id": user_id, "post_id": {"$in": list(post_ids)}}, {"post_id": 1, "_id": 0})
+        return {d["post_id"] for d in docs}
 
     def add_comment(self, post_id, user_id, comment_text):
         """Add a comment to a post"""
@@ -146,28 +210,39 @@ class Post:
             user_id = ObjectId(user_id)
 
         comment = {
+            "post_id": post_id,
             "user_id": user_id,
             "text": comment_text,
             "created_at": datetime.utcnow()
         }
+        self.comments.insert_one(comment)
+        embedded = {k: comment[k] for k in ("_id", "user_id", "text", "created_at")}
 
         result = self.collection.update_one(
             {"_id": post_id},
             {
-                "$push": {"comments": comment},
+                "$inc": {"comment_count": 1},
+                "$push": {"recent_comments": {"$each": [embedded], "$slice": -RECENT_COMMENTS}},
                 "$set": {"updated_at": datetime.utcnow()}
             }
         )
-        return result.modified_count > 0
+        if result.matched_count == 0:
+            self.comments.delete_one({"_id": comment["_id"]})
+            return False
+        return True
+
+    def get_comments(self, post_id, limit=20, before=None):
+        """Page through a post's comments, newest first (before = keyset cursor)"""
+        if isinstance(post_id, str):
+            post_id = ObjectId(post_id)
+        query = {"post_id": post_id}
+        if before:
+            query.update(before_cursor_query(before))
+        return list(self.comments.find(query).sort(FEED_SORT).limit(limit))
 
-    def get_user_posts(self, user_id, limit=50, skip=0):
-        """Get all posts by a specific user"""
+    def get_user_posts(self, user_id, limit=50, skip=0, before=None):
+        """Get all posts by a specific user (before = keyset cursor; skip is deprecated)"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
 
-        posts = list(self.collection.find({"user_id": user_id})
-                     .sort("created_at", -1)
-                     .skip(skip)
-                     .limit(limit))
-
-        return posts
+        return self._page({"user_id": user_id}, limit, skip, before)
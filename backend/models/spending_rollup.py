@@ -0,0 +1,139 @@
+"""
+Monthly spending rollups – expense totals per (user, month, category).
+
+Each document holds sum, count, min and max of the expense amounts (as positive
+dollars) of one user's transactions in one calendar month and category, so spending
+for any window is read from a handful of rollups instead of every transaction.
+New transactions are added incrementally ($inc / $min / $max upserts); deletes and
+category corrections recompute the affected months from transactions, since min
+and max cannot be decremented. Users with transactions but no rollups (stored
+before rollups existed) are rebuilt on first read.
+"""
+
+from datetime import datetime
+from bson import ObjectId
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+
+def month_start(dt):
+    return datetime(dt.year, dt.month, 1)
+
+
+def add_months(dt, months):
+    index = dt.year * 12 + dt.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+class SpendingRollup:
+    def __init__(self, db):
+        self.collection = db.spending_rollups
+        self.transactions = db.transactions
+        self._create_indexes()
+
+    def _create_indexes(self):
+        self.collection.create_index([("user_id", 1), ("month", 1), ("category", 1)], unique=True)
+
+    def add(self, user_id, transactions):
+        """Fold newly inserted transactions into their months' rollups."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        groups = {}
+        for t in transactions:
+            amount = float(t.get("amount") or 0)
+            date = t.get("date")
+            if amount >= 0 or not isinstance(date, datetime):
+                continue
+            key = (month_start(date), t.get("category") or "other")
+            g = groups.setdefault(key, {"sum": 0.0, "count": 0, "min": -amount, "max": -amount})
+            g["sum"] += -amount
+            g["count"] += 1
+            g["min"] = min(g["min"], -amount)
+            g["max"] = max(g["max"], -amount)
+        if not groups:
+            return 0
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "month": month, "category": category},
+                {
+                    "$inc": {"sum": g["sum"], "count": g["count"]},
+                    "$min": {"min": g["min"]},
+                    "$max": {"max": g["max"]},
+                    "$set": {"updated_at": now},
+                },
+                upsert=True
+            )
+            for (month, category), g in groups.items()
+        ], ordered=False)
+        return len(groups)
+
+    def refresh(self, user_id, start_month, end_month=None):
+        """Recompute the user's rollups for months start_month..end_month from transactions."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        start = month_start(start_month)
+        end = add_months(month_start(end_month or start_month), 1)
+        pipeline = [
+            {"$match": {"user_id": user_id, "date": {"$gte": start, "$lt": end}, "amount": {"$lt": 0}}},
+            {"$group": {
+                "_id": {"year": {"$year": "$date"}, "month": {"$month": "$date"}, "category": {"$ifNull": ["$category", "other"]}},
+                "sum": {"$sum": {"$abs": "$amount"}},
+                "count": {"$sum": 1},
+                "min": {"$min": {"$abs": "$amount"}},
+                "max": {"$max": {"$abs": "$amount"}},
+            }},
+        ]
+        now = datetime.utcnow()
+        ops = [DeleteMany({"user_id": user_id, "month": {"$gte": start, "$lt": end}})]
+        for g in self.transactions.aggregate(pipeline, allowDiskUse=True):
+            key = {"user_id": user_id, "month": datetime(g["_id"]["year"], g["_id"]["month"], 1), "category": g["_id"]["category"]}
+            ops.append(ReplaceOne(
+                key,
+                dict(key, sum=g["sum"], count=g["count"], min=g["min"], max=g["max"], updated_at=now),
+                upsert=True
+            ))
+        self.collection.bulk_write(ops, ordered=True)
+        return len(ops) - 1
+
+    def rebuild(self, user_id):
+        """Recompute all of the user's rollups (first read, or repair)."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        dated = {"user_id": user_id, "date": {"$type": "date"}, "amount": {"$lt": 0}}
+        first = self.transactions.find_one(dated, {"date": 1}, sort=[("user_id", 1), ("date", 1)])
+        last = self.transactions.find_one(dated, {"date": 1}, sort=[("user_id", 1), ("date", -1)])
+        if not first:
+            self.collection.delete_many({"user_id": user_id})
+            return 0
+        return self.refresh(user_id, first["date"], last["date"])
+
+    def latest_month(self, user_id):
+        """First day of the user's most recent month with spending, or None."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        doc = self.collection.find_one({"user_id": user_id}, {"month": 1}, sort=[("user_id", 1), ("month", -1)])
+        return doc["month"] if doc else None
+
+    def get_by_category(self, user_id, start_month, end_month):
+        """
+        {category: {"total", "count", "min", "max"}} over months start_month..end_month
+        (inclusive), largest total first.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        match = {"user_id": user_id, "month": {"$gte": month_start(start_month), "$lte": month_start(end_month)}}
+        docs = list(self.collection.find(match, {"category": 1, "sum": 1, "count": 1, "min": 1, "max": 1}))
+        if not docs and not self.collection.find_one({"user_id": user_id}, {"_id": 1}) \
+                and self.transactions.find_one({"user_id": user_id}, {"_id": 1}):
+            self.rebuild(user_id)
+            docs = list(self.collection.find(match, {"category": 1, "sum": 1, "count": 1, "min": 1, "max": 1}))
+        out = {}
+        for d in docs:
+            c = out.setdefault(d["category"], {"total": 0.0, "count": 0, "min": d["min"], "max": d["max"]})
+            c["total"] += d["sum"]
+            c["count"] += d["count"]
+            c["min"] = min(c["min"], d["min"])
+            c["max"] = max(c["max"], d["max"])
+        for c in out.values():
+            c["total"] = round(c["total"], 2)
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]["total"]))
@@ -0,0 +1,50 @@
+"""
+Parsed-results cache for bank statement PDFs, keyed by content hash.
+
+Uploads are stored once per SHA-256 (uploads/<sha256>.pdf) and the extracted,
+categorized transactions are cached under "<sha256>:<parser version>", so a
+re-upload of the same file reuses them without parsing or calling Gemini.
+Bumping statement_parser.PARSER_VERSION invalidates every entry. Entries not used
+for CACHE_TTL_DAYS are removed by a TTL index.
+"""
+from datetime import datetime
+
+CACHE_TTL_DAYS = 180
+
+
+def cache_key(sha256, parser_version):
+    return f"{sha256}:{parser_version}"
+
+
+class StatementCache:
+    def __init__(self, db):
+        self.collection = db.statement_cache
+        self._create_indexes()
+
+    def _create_indexes(self):
+        self.collection.create_index("last_used_at", expireAfterSeconds=CACHE_TTL_DAYS * 86400)
+
+    def get(self, sha256, parser_version):
+        """Cached {"transactions", "extraction"} for this file and parser, or None."""
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {"_id": cache_key(sha256, parser_version)},
+            {"$inc": {"hits": 1}, "$set": {"last_used_at": now}},
+            {"transactions": 1, "extraction": 1}
+        )
+
+    def put(self, sha256, parser_version, transactions, extraction=None):
+        now = datetime.utcnow()
+        self.collection.replace_one(
+            {"_id": cache_key(sha256, parser_version)},
+            {
+                "sha256": sha256,
+                "parser_version": parser_version,
+                "transactions": transactions,
+                "extraction": extraction,
+                "hits": 0,
+                "created_at": now,
+                "last_used_at": now,
+            },
+            upsert=True
+        )
@@ -0,0 +1,208 @@
+"""
+Statement processing queue, stored in MongoDB (no external broker).
+
+One statement_jobs document per uploaded statement. Workers claim queued jobs with
+an atomic find_one_and_update and hold a lease (locked_until) that progress updates
+extend; jobs whose lease expires (worker crashed) are put back in the queue. Failed
+attempts are retried with exponential backoff up to max_attempts; a job that fails
+for good (including an expired lease on its last attempt) also marks its
+bank_statements entry failed, so clients polling the statement stop. statement_job_slots
+holds a running-job counter per user so no user has more than JOBS_PER_USER
+statements processing at once.
+"""
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 10
+LEASE_SECONDS = 300
+JOBS_PER_USER = int(os.getenv("STATEMENT_JOBS_PER_USER", 1))
+CLAIM_SCAN = 20  # queued jobs looked at per claim before giving up (users at their limit are skipped)
+
+
+class StatementJob:
+    def __init__(self, db, jobs_per_user=JOBS_PER_USER):
+        self.collection = db.statement_jobs
+        self.slots = db.statement_job_slots
+        self.statements = db.bank_statements
+        self.jobs_per_user = jobs_per_user
+        self._create_indexes()
+
+    def _create_indexes(self):
+        self.collection.create_index([("status", 1), ("available_at", 1)])
+        self.collection.create_index([("status", 1), ("locked_until", 1)])
+        self.collection.create_index("statement_id", unique=True)
+
+    def enqueue(self, user_id, statement_id, path, sha256=None, max_attempts=MAX_ATTEMPTS):
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        if isinstance(statement_id, str):
+            statement_id = ObjectId(statement_id)
+        now = datetime.utcnow()
+        doc = {
+            "user_id": user_id,
+            "statement_id": statement_id,
+            "path": path,
+            "sha256": sha256,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "error": None,
+            "result": None,
+            "available_at": now,
+            "locked_by": None,
+            "locked_until": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        result = self.collection.insert_one(doc)
+        return result.inserted_id
+
+    def get_for_statement(self, statement_id):
+        if isinstance(statement_id, str):
+            statement_id = ObjectId(statement_id)
+        return self.collection.find_one({"statement_id": statement_id})
+
+    def cancel(self, statement_id):
+        """Drop a job that has not started yet (statement deleted while queued)."""
+        if isinstance(statement_id, str):
+            statement_id = ObjectId(statement_id)
+        return self.collection.delete_one({"statement_id": statement_id, "status": "queued"}).deleted_count
+
+    def _acquire_slot(self, user_id):
+        try:
+            self.slots.update_one(
+                {"_id": user_id, "running": {"$lt": self.jobs_per_user}},
+                {"$inc": {"running": 1}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False  # the user's counter exists and is at the limit
+
+    def _release_slot(self, user_id):
+        self.slots.update_one({"_id": user_id, "running": {"$gt": 0}}, {"$inc": {"running": -1}})
+
+    def claim(self, worker_id):
+        """Take the oldest runnable job whose user is under the concurrency limit, or None."""
+        now = datetime.utcnow()
+        skipped = []
+        for _ in range(CLAIM_SCAN):
+            job = self.collection.find_one(
+                {"status": "queued", "available_at": {"$lte": now}, "user_id": {"$nin": skipped}},
+                {"user_id": 1},
+                sort=[("available_at", 1)]
+            )
+            if not job:
+                return None
+            if not self._acquire_slot(job["user_id"]):
+                skipped.append(job["user_id"])
+                continue
+            claimed = self.collection.find_one_and_update(
+                {"_id": job["_id"], "status": "queued"},
+                {
+                    "$set": {
+                        "status": "running",
+                        "locked_by": worker_id,
+                        "locked_until": now + timedelta(seconds=LEASE_SECONDS),
+                        "started_at": now,
+                        "updated_at": now,
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                return_document=ReturnDocument.AFTER
+            )
+            if claimed:
+                return claimed
+            self._release_slot(job["user_id"])  # another worker got it first
+        return None
+
+    def report_progress(self, job, stage, progress):
+        """Record the current stage and extend the lease."""
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"_id": job["_id"], "locked_by": job["locked_by"]},
+            {"$set": {
+                "stage": stage,
+                "progress": progress,
+                "locked_until": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            }}
+        )
+
+    def complete(self, job, outcome):
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {"_id": job["_id"], "status": "running", "locked_by": job["locked_by"]},
+            {"$set": {
+                "status": "done",
+                "stage": "done",
+                "progress": 100,
+                "result": outcome,
+                "error": None,
+                "locked_until": None,
+                "finished_at": now,
+                "updated_at": now,
+            }}
+        )
+        if result.matched_count:
+            self._release_slot(job["user_id"])
+
+    def fail(self, job, error):
+        """
+        Requeue with backoff, or mark failed once attempts are used up. Returns the new
+        status, or None if the job is no longer held by this worker.
+        """
+        now = datetime.utcnow()
+        if job["attempts"] < job["max_attempts"]:
+            update = {
+                "status": "queued",
+                "available_at": now + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)),
+            }
+        else:
+            update = {"status": "failed", "finished_at": now}
+        update.update({"error": str(error)[:500], "locked_by": None, "locked_until": None, "updated_at": now})
+        result = self.collection.update_one(
+            {"_id": job["_id"], "status": "running", "locked_by": job["locked_by"]},
+            {"$set": update}
+        )
+        if not result.matched_count:
+            return None
+        self._release_slot(job["user_id"])
+        if update["status"] == "failed":
+            self.statements.update_one(
+                {"_id": job["statement_id"]},
+                {"$set": {"status": "failed", "error": update["error"], "updated_at": now}}
+            )
+        return update["status"]
+
+    def requeue_expired(self):
+        """Return jobs whose worker stopped renewing its lease to the queue. Returns jobs recovered."""
+        now = datetime.utcnow()
+        recovered = 0
+        for job in self.collection.find(
+            {"status": "running", "locked_until": {"$lt": now}},
+            {"user_id": 1, "statement_id": 1, "locked_by": 1, "attempts": 1, "max_attempts": 1}
+        ):
+            if self.fail(job, "Worker lease expired") is not None:
+                recovered += 1
+        return recovered
+
+    def reconcile_statements(self):
+        """
+        Mark statements failed whose job has failed but that are still queued or
+        processing (e.g. failed before fail() updated statements). Returns the count.
+        """
+        repaired = 0
+        for job in self.collection.find({"status": "failed"}, {"statement_id": 1, "error": 1}).batch_size(500):
+            result = self.statements.update_one(
+                {"_id": job["statement_id"], "status": {"$in": ["queued", "processing"]}},
+                {"$set": {"status": "failed", "error": job.get("error"), "updated_at": datetime.utcnow()}}
+            )
+            repaired += result.modified_count
+        return repaired
@@ -0,0 +1,146 @@
+"""
+Materialized friends timeline (fan-out-on-write).
+
+Each user has one timelines document holding references to the newest posts from
+the people they follow: {_id: owner_id, items: [{post_id, author_id, created_at}]}.
+create_post pushes a reference to every follower in one unordered bulk write, and
+$push/$sort/$slice keeps each timeline capped at TIMELINE_MAX_ITEMS. Authors with
+more than FANOUT_MAX_FOLLOWERS followers are flagged fanout_on_read instead and
+their posts are pulled from the posts collection when a follower reads the feed.
+"""
+
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from models.post import FEED_SORT, LIST_PROJECTION, before_cursor_query, decode_cursor
+
+TIMELINE_MAX_ITEMS = 500
+FANOUT_MAX_FOLLOWERS = 5000
+BACKFILL_POSTS = 20
+FANOUT_VISIBILITY = ["public", "friends-only"]
+
+
+def _ref(post):
+    return {"post_id": post["_id"], "author_id": post["user_id"], "created_at": post["created_at"]}
+
+
+def _push_refs(refs):
+    return {
+        "$push": {"items": {
+            "$each": refs,
+            "$sort": {"created_at": -1, "post_id": -1},
+            "$slice": TIMELINE_MAX_ITEMS,
+        }},
+        "$set": {"updated_at": datetime.utcnow()},
+    }
+
+
+class Timeline:
+    def __init__(self, db):
+        self.collection = db.timelines
+        self.users = db.users
+        self.posts = db.posts
+
+    def _follower_ids(self, author_id, limit=None):
+        """Users who have author_id in their friends list (served by the users.friends index)."""
+        cursor = self.users.find({"friends": author_id}, {"_id": 1})
+        if limit:
+            cursor = cursor.limit(limit)
+        return [u["_id"] for u in cursor]
+
+    def fan_out(self, post):
+        """Push a new post to its author's and followers' timelines. Returns timelines written."""
+        if post.get("visibility") not in FANOUT_VISIBILITY:
+            return 0
+        author_id = post["user_id"]
+        followers = self._follower_ids(author_id, limit=FANOUT_MAX_FOLLOWERS + 1)
+        targets = [author_id]
+        if len(followers) > FANOUT_MAX_FOLLOWERS:
+            # Too many followers to write to: readers pull this author's posts instead
+            self.users.update_one({"_id": author_id}, {"$set": {"fanout_on_read": True}})
+        else:
+            targets.extend(followers)
+        update = _push_refs([_ref(post)])
+        self.collection.bulk_write(
+            [UpdateOne({"_id": owner_id}, update, upsert=True) for owner_id in targets],
+            ordered=False,
+        )
+        return len(targets)
+
+    def retract(self, author_id, post_id):
+        """Remove a deleted post from its author's and followers' timelines."""
+        if isinstance(author_id, str):
+            author_id = ObjectId(author_id)
+        if isinstance(post_id, str):
+            post_id = ObjectId(post_id)
+        targets = [author_id] + self._follower_ids(author_id)
+        self.collection.update_many(
+            {"_id": {"$in": targets}},
+            {"$pull": {"items": {"post_id": post_id}}}
+        )
+
+    def backfill(self, owner_id, author_id, limit=BACKFILL_POSTS):
+        """Seed owner's timeline with author's recent posts (after owner adds author as a friend)."""
+        if isinstance(owner_id, str):
+            owner_id = ObjectId(owner_id)
+        if isinstance(author_id, str):
+            author_id = ObjectId(author_id)
+        timeline = self.collection.find_one({"_id": owner_id}, {"items.post_id": 1}) or {}
+        present = {r["post_id"] for r in timeline.get("items") or []}
+        recent = [p for p in self.posts.find(
+            {"user_id": author_id, "visibility": {"$in": FANOUT_VISIBILITY}},
+            {"user_id": 1, "created_at": 1}
+        ).sort(FEED_SORT).limit(limit) if p["_id"] not in present]
+        if recent:
+            self.collection.update_one({"_id": owner_id}, _push_refs([_ref(p) for p in recent]), upsert=True)
+        return len(recent)
+
+    def rebuild(self, owner_id, friend_ids):
+        """Recompute a timeline from scratch from the owner's and friends' latest posts."""
+        authors = [owner_id] + list(friend_ids)
+        recent = list(self.posts.find(
+            {"user_id": {"$in": authors}, "visibility": {"$in": FANOUT_VISIBILITY}},
+            {"user_id": 1, "created_at": 1}
+        ).sort(FEED_SORT).limit(TIMELINE_MAX_ITEMS))
+        self.collection.replace_one(
+            {"_id": owner_id},
+            {"items": [_ref(p) for p in recent], "updated_at": datetime.utcnow()},
+            upsert=True,
+        )
+        return len(recent)
+
+    def get_feed(self, user_id, limit=50, before=None):
+        """
+        Friends feed: the owner's materialized timeline merged with posts from any
+        fan-out-on-read friends. Returns post documents in FEED_SORT order.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        timeline = self.collection.find_one({"_id": user_id}, {"items": 1}) or {}
+        refs = timeline.get("items") or []
+        if before:
+            created_at, post_id = decode_cursor(before)
+            refs = [r for r in refs if (r["created_at"], r["post_id"]) < (created_at, post_id)]
+        refs = refs[:limit]
+
+        # Fan-out-on-read for friends who are too widely followed to be pushed
+        viewer = self.users.find_one({"_id": user_id}, {"friends": 1}) or {}
+        pulled = []
+        if viewer.get("friends"):
+            pull_authors = [u["_id"] for u in self.users.find(
+                {"_id": {"$in": viewer["friends"]}, "fanout_on_read": True}, {"_id": 1}
+            )]
+            if pull_authors:
+                query = {"user_id": {"$in": pull_authors}, "visibility": {"$in": FANOUT_VISIBILITY}}
+                if before:
+                    query.update(before_cursor_query(before))
+                pulled = list(self.posts.find(query, LIST_PROJECTION).sort(FEED_SORT).limit(limit))
+
+        posts_by_id = {p["_id"]: p for p in pulled}
+        missing = [r["post_id"] for r in refs if r["post_id"] not in posts_by_id]
+        if missing:
+            for p in self.posts.find({"_id": {"$in": missing}}, LIST_PROJECTION):
+                posts_by_id[p["_id"]] = p
+        posts = sorted(posts_by_id.values(), key=lambda p: (p["created_at"], p["_id"]), reverse=True)
+        return posts[:limit]
@@ -1,15 +1,24 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+
+from utils.rank_index import rank_index
+from utils.user_cache import user_summaries
 
 class User:
     def __init__(self, db):
         self.collection = db.users
         self._create_indexes()
+        rank_index.attach(self.collection)
+        user_summaries.attach(self.collection)
 
     def _create_indexes(self):
         """Create indexes for better query performance"""
         self.collection.create_index("username", unique=True)
         self.collection.create_index("email", unique=True)
+        # Reverse friend lookups ("who follows X") for timeline fan-out
+        self.collection.create_index("friends")
+        self.collection.create_index([("game_points", -1)])
 
     def create_user(self, username, email, password_hash, name, country="USA", state="", tax_bracket=0):
         """Create a new user"""
@@ -35,6 +44,7 @@ class User:
             "updated_at": datetime.utcnow()
         }
         result = self.collection.insert_one(user)
+        rank_index.update(result.inserted_id, 0)
         return result.inserted_id
 
     def find_by_username(self, username):
@@ -58,13 +68,15 @@ class User:
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         update_data["updated_at"] = datetime.utcnow()
-        return self.collection.update_one(
+        result = self.collection.update_one(
             {"_id": user_id},
             {"$set": update_data}
         )
+        user_summaries.invalidate(user_id)
+        return result
 
     def update_game_stats(self, user_id, points=0, currency=0, streak=None):
-        """Update game statistics"""
+        """Update game statistics. Returns {_id, game_points} after the update (None if no such user)"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
 
@@ -82,7 +94,24 @@ class User:
             update["$set"]["current_streak"] = streak
             update["$set"]["last_activity_date"] = datetime.utcnow()
 
-        return self.collection.update_one({"_id": user_id}, update)
+        user = self.collection.find_one_and_update(
+            {"_id": user_id}, update,
+            projection={"game_points": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        user_summaries.invalidate(user_id)
+        if user:
+            rank_index.update(user_id, user.get("game_points", 0))
+        return user
+
+    def get_friend_ids(self, user_id):
+        """Friend ObjectIds only (projected; avoids loading the whole user document)"""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        user = self.collection.find_one({"_id": user_id}, {"friends": 1})
+        if user is None:
+            return None
+        return [ObjectId(f) if isinstance(f, str) else f for f in user.get("friends") or []]
 
     def add_friend(self, user_id, friend_id):
         """Add friend to user's friend list"""
@@ -96,9 +125,25 @@ class User:
             {"$addToSet": {"friends": friend_id}}
         )
 
-    def get_leaderboard(self, limit=100):
-        """Get top users by points"""
-        return list(self.collection.find(
-            {},
-            {"username": 1, "name": 1, "game_points": 1, "current_streak": 1}
-        ).sort("game_points", -1).limit(limit))
+    def get_rank(self, user_id, points=None):
+        """1-based rank by game_points (ties share a rank), from the in-memory rank index"""
+        return rank_index.rank(user_id, points)
+
+    def get_rank_position(self, user_id, points=None):
+        """0-based place in leaderboard order (ties ordered by user id), for paging around a user"""
+        return rank_index.position(user_id, points)
+
+    def count_ranked(self):
+        """Number of users on the global leaderboard"""
+        return len(rank_index)
+
+    def get_leaderboard(self, limit=100, offset=0):
+        """Get top users by points (ranked by the rank index, display fields from the summary cache)"""
+        ranked = rank_index.top(limit, offset)
+        summaries = user_summaries.get_many(uid for uid, _, _ in ranked)
+        leaderboard = []
+        for uid, points, rank in ranked:
+            summary = summaries.get(ObjectId(uid))
+            if summary:
+                leaderboard.append({**summary, "game_points": points, "rank": rank})
+        return leaderboard
@@ -12,6 +12,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from config.database import db_instance
+from utils.rank_index import rank_index
+from utils.user_cache import user_summaries
 from bson import ObjectId
 
 
@@ -135,7 +137,7 @@ class Scoreboard:
             # users collection (so app /api/me and frontend see same game_points / game_currency)
             try:
                 uid = ObjectId(user_id) if isinstance(user_id, str) and len(user_id) == 24 else user_id
-                db['users'].update_one(
+                result = db['users'].update_one(
                     {'_id': uid},
                     {
                         '$set': {
@@ -146,6 +148,9 @@ class Scoreboard:
                         }
                     }
                 )
+                if result.matched_count:
+                    rank_index.update(uid, points)
+                    user_summaries.invalidate(uid)
             except Exception:
                 pass  # user_id may not be a valid ObjectId if pts used elsewhere
         except Exception as e:
@@ -0,0 +1,81 @@
+"""
+Keyword categorizer compiled into a single regular expression.
+
+All keywords of a {category: [keywords]} map are merged into one prefix-factored
+pattern (a trie written as a regex, so each position costs one branch per
+character instead of one test per keyword), wrapped in a lookahead so every
+position of the text is tried in one scan, overlapping matches included. Priority
+is the map's order: the first category that has any keyword in the text wins,
+exactly like checking categories one by one. categorize_many() categorizes each
+distinct description once.
+"""
+
+import re
+
+
+def _trie_pattern(words):
+    """Regex source matching any of words, factored by common prefixes (longest match first)."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end of a word
+
+    def build(node):
+        ends = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            # The word can stop here; the continuation is optional and greedy so longer words win
+            body = ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return build(trie)
+
+
+class KeywordCategorizer:
+    def __init__(self, keyword_map, default="other"):
+        self.default = default
+        self.categories = list(keyword_map)
+        priority = {}
+        for i, category in enumerate(self.categories):
+            for k in keyword_map[category]:
+                if k:
+                    priority.setdefault(k.lower(), i)
+        # Keywords matching at one position are all prefixes of the longest one there, so
+        # rank each keyword by the best category among its keyword prefixes
+        self._rank = {
+            k: min(p for prefix, p in priority.items() if k.startswith(prefix))
+            for k in priority
+        }
+        self._pattern = re.compile(f"(?=({_trie_pattern(priority)}))") if priority else None
+
+    def _best_index(self, text):
+        best = None
+        for m in self._pattern.finditer(text):
+            i = self._rank[m.group(1)]
+            if best is None or i < best:
+                best = i
+                if best == 0:
+                    break
+        return best
+
+    def categorize(self, description):
+        """Category for one description (case-insensitive substring match), or the default."""
+        if not description or self._pattern is None:
+            return self.default
+        best = self._best_index(description.lower())
+        return self.default if best is None else self.categories[best]
+
+    def categorize_many(self, descriptions):
+        """Categories for a sequence of descriptions, in order."""
+        memo = {}
+        out = []
+        for d in descriptions:
+            if d not in memo:
+                memo[d] = self.categorize(d)
+            out.append(memo[d])
+        return out
@@ -0,0 +1,70 @@
+"""
+Cache of rendered global-leaderboard pages.
+
+Pages are keyed by (offset, limit) and built from the rank index, so "top N",
+"page k" and "ranks around me" all share one mechanism. A cached page is reused
+until it is older than TTL_SECONDS or the rank index version changes (every points
+write goes through the index, so that is the write-through invalidation). Each page
+carries an ETag (hash of its rows) and Last-Modified so clients can revalidate.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from utils.rank_index import rank_index
+
+TTL_SECONDS = 30
+MAX_PAGE_SIZE = 100
+MAX_CACHED_PAGES = 256
+
+
+class LeaderboardCache:
+    def __init__(self, ttl_seconds=TTL_SECONDS, max_pages=MAX_CACHED_PAGES, index=rank_index):
+        self.ttl_seconds = ttl_seconds
+        self.max_pages = max_pages
+        self.index = index
+        self._pages = OrderedDict()  # (offset, limit) -> page dict
+        self._lock = threading.Lock()
+
+    def get(self, offset, limit, load_rows):
+        """
+        Rows for ranks offset+1 .. offset+limit plus validators.
+        load_rows(offset, limit) is called on a miss and must return JSON-serializable rows.
+        Returns {"rows", "etag", "last_modified"}.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        key = (offset, limit)
+        self.index.refresh()
+        version = self.index.version
+        with self._lock:
+            page = self._pages.get(key)
+            if page and page["version"] == version and time.monotonic() - page["built_at"] < self.ttl_seconds:
+                self._pages.move_to_end(key)
+                return page
+
+        rows = load_rows(offset, limit)
+        etag = hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+        last_modified = datetime.utcnow().replace(microsecond=0)
+        if page and page["etag"] == etag:
+            last_modified = page["last_modified"]  # same content: keep the original timestamp
+        page = {"rows": rows, "etag": etag, "last_modified": last_modified,
+                "version": version, "built_at": time.monotonic()}
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+# Global leaderboard cache instance (one per process)
+leaderboard_cache = LeaderboardCache()
@@ -0,0 +1,126 @@
+"""
+Shared plumbing for Gemini calls made while processing statements.
+
+call_gemini() makes one generate_content call with a per-call timeout and retries,
+taking a token from a process-wide token bucket first so concurrent batches stay
+inside the Gemini quota (GEMINI_REQUESTS_PER_MINUTE). run_concurrently() fans work
+out over one bounded thread pool (LLM_MAX_CONCURRENCY) and keeps whatever
+succeeded: a failed or timed-out item yields None instead of aborting the rest.
+Each item's timeout runs from when it starts, not counting time queued behind other
+work or waiting for the rate limiter, so a busy process does not time items out
+before they ran.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+import google.generativeai as genai
+
+MODEL_NAME = "gemini-pro"
+REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 60))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 10))
+TIMEOUT_SECONDS = 30
+RETRIES = 2
+RETRY_BACKOFF_SECONDS = 1
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per `per` seconds on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate, per=60.0, capacity=None):
+        self.rate = rate / per
+        self.capacity = capacity or max(1, min(rate, MAX_CONCURRENCY))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Global Gemini rate limiter and executor (one per process)
+gemini_rate_limiter = TokenBucket(REQUESTS_PER_MINUTE)
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="llm")
+_item_clock = threading.local()  # start time of the run_concurrently item on this thread
+
+
+def _acquire_token():
+    """Take a rate limiter token; the wait does not count against the current item's timeout."""
+    clock = getattr(_item_clock, "started", None)
+    if clock is None:
+        gemini_rate_limiter.acquire()
+        return
+    started, clock[0] = clock[0], None  # paused: run_concurrently treats it as not started
+    waited = time.monotonic()
+    gemini_rate_limiter.acquire()
+    clock[0] = started + time.monotonic() - waited
+
+
+def call_gemini(prompt, parse=None, timeout=TIMEOUT_SECONDS, retries=RETRIES):
+    """
+    Response text for one prompt, or parse(text) if given (a parse error is retried too).
+    Rate limited; retried with backoff; raises the last error.
+    """
+    last_error = None
+    for attempt in range(retries + 1):
+        _acquire_token()
+        try:
+            model = genai.GenerativeModel(MODEL_NAME)
+            response = model.generate_content(prompt, request_options={"timeout": timeout})
+            return parse(response.text) if parse else response.text
+        except Exception as e:
+            last_error = e
+            if attempt < retries:
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+    raise last_error
+
+
+def run_concurrently(fn, items, timeout=TIMEOUT_SECONDS * (RETRIES + 1) + 10):
+    """
+    [fn(item)] in order, run on the shared executor; None where fn raised or ran for
+    more than timeout seconds after it started (failures are logged).
+    """
+    clocks = [[None] for _ in items]
+
+    def run(clock, item):
+        clock[0] = time.monotonic()
+        _item_clock.started = clock
+        try:
+            return fn(item)
+        finally:
+            _item_clock.started = None
+
+    futures = [_executor.submit(run, clock, item) for clock, item in zip(clocks, items)]
+    results = []
+    for i, (f, clock) in enumerate(zip(futures, clocks)):
+        result = None
+        while True:
+            started = clock[0]
+            try:
+                # Not started yet (queued): check back later, its clock has not begun
+                result = f.result(timeout=1.0 if started is None else max(0, started + timeout - time.monotonic()))
+                break
+            except FuturesTimeout as e:
+                if f.done():  # fn itself raised a TimeoutError
+                    print(f"LLM item {i + 1}/{len(items)} failed: {e}")
+                    break
+                if clock[0] is not None and time.monotonic() >= clock[0] + timeout:
+                    print(f"LLM item {i + 1}/{len(items)} timed out after {timeout}s")
+                    break
+            except Exception as e:
+                print(f"LLM item {i + 1}/{len(items)} failed: {e}")
+                break
+        results.append(result)
+    return results
@@ -0,0 +1,195 @@
+"""
+Shared merchant -> category memo, so each merchant goes to Gemini once.
+
+Descriptions are reduced to a normalized merchant key ("POS DEBIT STARBUCKS #1234"
+-> "starbucks"). Answers from Gemini are stored in the merchant_categories
+collection, shared by all users, with an in-process LRU on top. A user's manual
+correction is kept per user (merchant_corrections) and applied to that user's
+statements only; once PROMOTE_USERS users agree on a merchant's category it is
+promoted to the shared memo, so one bad correction cannot relabel a merchant for
+everyone. Each shared entry expires after MAX_TTL_DAYS scaled by its confidence
+(promoted corrections live longest, "other" answers are retried soonest); a TTL
+index removes them. Gemini never overwrites a promoted correction.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config.database import db_instance
+
+MAX_ENTRIES = 20000
+LRU_TTL_SECONDS = 600
+MAX_TTL_DAYS = 365
+PROMOTE_USERS = 3
+MAX_KEY_TOKENS = 2  # merchant name without the city/state most statements append
+CONFIDENCE = {"user": 1.0, "gemini": 0.7, "gemini_other": 0.3}
+NOISE_TOKENS = {
+    "pos", "debit", "credit", "card", "purchase", "ach", "online", "recurring", "auth",
+    "txn", "ref", "inc", "llc", "co", "the", "www", "com", "visa", "mastercard", "checkcard",
+}
+_NON_LETTERS = re.compile(r"[^a-z&' ]+")
+
+
+def merchant_key(description):
+    """Normalized merchant key: lowercase letters only, noise words dropped, first few tokens."""
+    words = _NON_LETTERS.sub(" ", (description or "").lower()).split()
+    return " ".join([w for w in words if len(w) > 1 and w not in NOISE_TOKENS][:MAX_KEY_TOKENS])
+
+
+class MerchantCategoryMemo:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=LRU_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, category)
+        self._collection = None
+        self._indexed = False
+        self._corrections_indexed = False
+        self._lock = threading.Lock()
+
+    def attach(self, collection):
+        """Use this collection (defaults to db_instance.db.merchant_categories); corrections go next to it."""
+        self._collection = collection
+        self._indexed = False
+        self._corrections_indexed = False
+
+    def _memo(self):
+        collection = self._collection if self._collection is not None else db_instance.db["merchant_categories"]
+        if not self._indexed:
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+        return collection
+
+    def _corrections(self):
+        db = self._collection.database if self._collection is not None else db_instance.db
+        collection = db["merchant_corrections"]
+        if not self._corrections_indexed:
+            collection.create_index([("user_id", 1), ("key", 1)], unique=True)
+            collection.create_index([("key", 1), ("category", 1)])
+            self._corrections_indexed = True
+        return collection
+
+    def _remember(self, found):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, category in found.items():
+                self._entries[key] = (expires_at, category)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        """{key: category} for the known keys; unknown keys are omitted."""
+        wanted = {k for k in keys if k}
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in wanted:
+                entry = self._entries.get(key)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+            self.lru_hits += len(found)
+        missing = [k for k in wanted if k not in found]
+        if missing:
+            loaded = {
+                d["_id"]: d["category"]
+                for d in self._memo().find(
+                    {"_id": {"$in": missing}, "expires_at": {"$gt": datetime.utcnow()}},
+                    {"category": 1}
+                )
+            }
+            self._remember(loaded)
+            found.update(loaded)
+            with self._lock:
+                self.db_hits += len(loaded)
+                self.misses += len(missing) - len(loaded)
+        return found
+
+    def learn(self, answers, source="gemini"):
+        """Store {key: category} answers. Gemini answers never replace a promoted user correction."""
+        answers = {k: c for k, c in answers.items() if k and c}
+        if not answers:
+            return 0
+        now = datetime.utcnow()
+        ops = []
+        for key, category in answers.items():
+            confidence = CONFIDENCE["gemini_other" if source == "gemini" and category == "other" else source]
+            query = {"_id": key}
+            if source != "user":
+                query["source"] = {"$ne": "user"}
+            ops.append(UpdateOne(query, {
+                "$set": {
+                    "category": category,
+                    "source": source,
+                    "confidence": confidence,
+                    "updated_at": now,
+                    "expires_at": now + timedelta(days=MAX_TTL_DAYS * confidence),
+                },
+                "$setOnInsert": {"created_at": now},
+            }, upsert=True))
+        try:
+            self._memo().bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate key = a user correction already holds that key; anything else is real
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        with self._lock:
+            for key in answers:
+                self._entries.pop(key, None)
+        return len(ops)
+
+    def correct(self, user_id, key, category):
+        """
+        Record one user's correction for a merchant. Returns True if it was promoted to
+        the shared memo (PROMOTE_USERS users now agree on this category).
+        """
+        if not key or not category:
+            return False
+        corrections = self._corrections()
+        corrections.update_one(
+            {"user_id": user_id, "key": key},
+            {"$set": {"category": category, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        if corrections.count_documents({"key": key, "category": category}, limit=PROMOTE_USERS) < PROMOTE_USERS:
+            return False
+        self.learn({key: category}, source="user")
+        self._memo().update_one({"_id": key}, {"$set": {"promoted_at": datetime.utcnow()}})
+        return True
+
+    def corrections(self, user_id, keys):
+        """{key: category} of this user's own corrections among keys."""
+        wanted = list({k for k in keys if k})
+        if not wanted:
+            return {}
+        return {
+            d["key"]: d["category"]
+            for d in self._corrections().find({"user_id": user_id, "key": {"$in": wanted}}, {"key": 1, "category": 1})
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.lru_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "lru_hits": self.lru_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.lru_hits + self.db_hits) / total, 3) if total else 0.0,
+        }
+
+
+# Global merchant category memo instance (one per process)
+merchant_memo = MerchantCategoryMemo()
@@ -0,0 +1,98 @@
+"""
+Parser profiles for known statement layouts.
+
+A statement's layout fingerprint comes from its first page: the labels and x-positions
+of the transaction table's column header row, plus the page size. A profile stores,
+for one fingerprint, the column geometry and the extraction strategy that worked,
+so the next statement from the same bank skips the extract-everything cascade.
+Profiles are learned from uploads the cascade handled confidently. They are stored
+in the parser_profiles collection, shared by all users, with an in-process cache on
+top. A profile that fails MAX_FAILURES times in a row is dropped.
+"""
+
+import threading
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from config.database import db_instance
+
+MAX_FAILURES = 3
+
+
+class ParserProfileRegistry:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._profiles = {}  # fingerprint -> profile
+        self._collection = None
+        self._lock = threading.Lock()
+
+    def attach(self, collection):
+        """Use this collection (defaults to db_instance.db.parser_profiles)."""
+        self._collection = collection
+        with self._lock:
+            self._profiles.clear()
+
+    def _registry(self):
+        return self._collection if self._collection is not None else db_instance.db["parser_profiles"]
+
+    def get(self, fingerprint):
+        """The profile for this layout fingerprint, or None."""
+        with self._lock:
+            profile = self._profiles.get(fingerprint)
+        if profile is None:
+            # Unknown layouts are not cached: another worker may learn them meanwhile
+            profile = self._registry().find_one({"_id": fingerprint})
+        with self._lock:
+            if profile:
+                self._profiles[fingerprint] = profile
+                self.hits += 1
+            else:
+                self.misses += 1
+        return profile
+
+    def learn(self, fingerprint, profile):
+        """Store (or replace) the profile for a fingerprint."""
+        now = datetime.utcnow()
+        doc = dict(profile, _id=fingerprint, uses=0, failures=0, created_at=now, last_used_at=now)
+        self._registry().replace_one({"_id": fingerprint}, doc, upsert=True)
+        with self._lock:
+            self._profiles[fingerprint] = doc
+
+    def record(self, fingerprint, ok):
+        """Count a use of the profile; MAX_FAILURES failures in a row drop it."""
+        collection = self._registry()
+        if ok:
+            collection.update_one(
+                {"_id": fingerprint},
+                {"$inc": {"uses": 1}, "$set": {"failures": 0, "last_used_at": datetime.utcnow()}}
+            )
+            return
+        profile = collection.find_one_and_update(
+            {"_id": fingerprint},
+            {"$inc": {"failures": 1}},
+            {"failures": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if profile and profile["failures"] >= MAX_FAILURES:
+            collection.delete_one({"_id": fingerprint, "failures": {"$gte": MAX_FAILURES}})
+            with self._lock:
+                self._profiles.pop(fingerprint, None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "cached": len(self._profiles),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Global parser profile registry instance (one per process)
+parser_profiles = ParserProfileRegistry()
@@ -0,0 +1,100 @@
+"""
+Per-page PDF extraction (text, sparse-page word lines, tables) and the process pool
+that spreads pages over CPUs.
+
+This module only imports pdfplumber, so spawned pool workers start without the
+app, Gemini or a MongoDB client. The pool is one per process, started with
+start_page_pool() by the standalone statement worker before it connects to
+MongoDB or starts threads; every job in that process shares it. Processes that
+never start it (the API, whose in-process workers run alongside request threads)
+extract pages sequentially.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pdfplumber
+    HAS_PDF = True
+except ImportError:
+    HAS_PDF = False
+
+PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", os.cpu_count() or 1))
+SPARSE_PAGE_CHARS = 100
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def words_to_text(words):
+    """Group words into lines by vertical position (for pages where extract_text is sparse)."""
+    by_y = {}
+    for w in words:
+        y = int(w.get("top", 0) // 5) * 5
+        by_y.setdefault(y, []).append(w.get("text", ""))
+    return "\n".join(" ".join(by_y[k]) for k in sorted(by_y.keys()))
+
+
+def extract_page(page):
+    """Text, sparse-page word lines and tables from one parsed page, then free its caches."""
+    try:
+        try:
+            text = page.extract_text(layout=True) or ""
+        except Exception:
+            text = page.extract_text() or ""
+        plain = (page.extract_text() or "") if len(text.strip()) < 50 else text
+        words_text = ""
+        if len(text.strip()) < SPARSE_PAGE_CHARS:
+            words_text = words_to_text(page.extract_words())
+        tables = []
+        try:
+            for t in page.find_tables():
+                extracted = t.extract()
+                if extracted:
+                    tables.append(extracted)
+        except Exception:
+            pass
+        try:
+            for tb in page.extract_tables(table_settings={"vertical_strategy": "text", "horizontal_strategy": "text"}) or []:
+                if tb and len(tb) > 1 and tb not in tables:
+                    tables.append(tb)
+        except Exception:
+            pass
+        return {"text": text, "plain_text": plain, "words_text": words_text, "tables": tables}
+    finally:
+        page.close()
+
+
+def extract_page_range(file_path, start, stop):
+    """extract_page for pages start..stop-1, opening the document once (pool task)."""
+    with pdfplumber.open(file_path) as pdf:
+        return [extract_page(pdf.pages[i]) for i in range(start, stop)]
+
+
+def start_page_pool(workers=PAGE_WORKERS):
+    """
+    Start this process's page pool (spawned workers, so it is safe with threads and
+    MongoDB clients). Returns the pool size; 0 if workers <= 1.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None and workers > 1:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_size = workers
+        return _pool_size
+
+
+def stop_page_pool():
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool, _pool_size = None, 0
+
+
+def page_pool():
+    """(pool, size) if start_page_pool() ran in this process, else (None, 0)."""
+    return _pool, _pool_size
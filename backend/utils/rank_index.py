@@ -0,0 +1,137 @@
+"""
+In-memory rank index over users.game_points.
+
+Every user's points are kept in one SortedList of (-points, user_id), so "what is my
+rank" is a binary search, a points change is an O(log n) remove + add, and
+"top N" / "page k" are slices, instead of a count or sort over the users
+collection per request. Point changes made through User and pts.Scoreboard are
+applied immediately; the whole index is rebuilt from MongoDB (one projected scan)
+every REFRESH_SECONDS so writes from other workers show up with bounded
+staleness. One thread rebuilds at a time: the others keep reading the current
+index meanwhile (or wait, if there is none yet), and changes applied during the
+scan are replayed on top of it.
+"""
+
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+from config.database import db_instance
+
+REFRESH_SECONDS = 60
+
+
+def _key(user_id):
+    return str(user_id)
+
+
+class RankIndex:
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.version = 0  # bumped on every change; lets caches built on top detect staleness
+        self._entries = SortedList()  # (-points, user_id); rank 1 first
+        self._points = {}  # user_id -> points
+        self._built_at = None
+        self._pending = None  # user_id -> points changed while a rebuild scans
+        self._refreshing = False
+        self._collection = None
+        self._lock = threading.RLock()
+        self._rebuilt = threading.Condition(self._lock)
+
+    def attach(self, collection):
+        """Use this users collection (defaults to db_instance.db.users, as pts does)."""
+        self._collection = collection
+
+    def _users(self):
+        return self._collection if self._collection is not None else db_instance.db["users"]
+
+    def _fresh(self):
+        return self._built_at is not None and time.monotonic() - self._built_at < self.refresh_seconds
+
+    def refresh(self, force=False):
+        """
+        Rebuild from MongoDB if the index is older than refresh_seconds (or force). If
+        another thread is already rebuilding, return at once when there is an index to
+        read, else wait for that rebuild.
+        """
+        with self._lock:
+            while True:
+                if not force and self._fresh():
+                    return
+                if not self._refreshing:
+                    break
+                if not force and self._built_at is not None:
+                    return
+                self._rebuilt.wait()
+            self._refreshing = True
+            self._pending = {}
+        try:
+            points = {
+                _key(u["_id"]): u.get("game_points") or 0
+                for u in self._users().find({}, {"game_points": 1})
+            }
+            with self._lock:
+                points.update(self._pending)
+                if points != self._points:
+                    self.version += 1
+                    self._entries = SortedList((-p, uid) for uid, p in points.items())
+                    self._points = points
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._pending = None
+                self._rebuilt.notify_all()
+
+    def _remove(self, uid):
+        old = self._points.pop(uid, None)
+        if old is not None:
+            self._entries.discard((-old, uid))
+
+    def update(self, user_id, points):
+        """Record a user's new point total (write-through from every points change)."""
+        uid = _key(user_id)
+        points = points or 0
+        with self._lock:
+            if self._points.get(uid) == points:
+                return
+            self._remove(uid)
+            self._points[uid] = points
+            self._entries.add((-points, uid))
+            if self._pending is not None:
+                self._pending[uid] = points
+            self.version += 1
+
+    def rank(self, user_id, points=None):
+        """1 + number of users with strictly more points. Pass points when the caller has a fresher value."""
+        self.refresh()
+        with self._lock:
+            if points is None:
+                points = self._points.get(_key(user_id), 0)
+            return self._entries.bisect_left((-(points or 0), "")) + 1
+
+    def position(self, user_id, points=None):
+        """0-based place of the user in leaderboard order (ties ordered by user id)."""
+        self.refresh()
+        with self._lock:
+            if points is None:
+                points = self._points.get(_key(user_id), 0)
+            return self._entries.bisect_left((-(points or 0), _key(user_id)))
+
+    def top(self, limit, offset=0):
+        """[(user_id, points, rank)] for positions offset+1 .. offset+limit; tied users share a rank."""
+        self.refresh()
+        with self._lock:
+            return [
+                (uid, -neg, self._entries.bisect_left((neg, "")) + 1)
+                for neg, uid in self._entries.islice(offset, offset + limit)
+            ]
+
+    def __len__(self):
+        self.refresh()
+        return len(self._entries)
+
+
+# Global rank index instance (one per process)
+rank_index = RankIndex()
@@ -0,0 +1,92 @@
+"""
+Cache of spending series (GET /api/bank-statements/series).
+
+Entries are keyed by (user, bucket, from, to, category) and tagged with the user's
+transactions version: a counter in the transaction_versions collection that
+BankStatement bumps whenever the user's transactions change (statement inserted or
+deleted, category corrected). A read costs one _id lookup of that counter; an entry
+built at an older version is rebuilt. Keeping the counter in the database means
+statements processed by a standalone worker invalidate this process's entries too.
+TTL_SECONDS bounds how long any entry lives.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+
+from config.database import db_instance
+
+TTL_SECONDS = 600
+MAX_ENTRIES = 2000
+
+
+def _oid(user_id):
+    return ObjectId(user_id) if isinstance(user_id, str) else user_id
+
+
+class SpendingSeriesCache:
+    def __init__(self, ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (user_id, bucket, from, to, category) -> (version, built_at, series)
+        self._collection = None
+        self._lock = threading.Lock()
+
+    def attach(self, collection):
+        """Use this collection for the version counters (defaults to db_instance.db.transaction_versions)."""
+        self._collection = collection
+        self.clear()
+
+    def _versions(self):
+        return self._collection if self._collection is not None else db_instance.db["transaction_versions"]
+
+    def version(self, user_id):
+        doc = self._versions().find_one({"_id": _oid(user_id)}, {"version": 1})
+        return doc["version"] if doc else 0
+
+    def bump(self, user_id):
+        """The user's transactions changed: retire their cached series in every process."""
+        user_id = _oid(user_id)
+        self._versions().update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def get(self, user_id, bucket, start, end, category, load):
+        """
+        (series, cached) for the key; load() builds the series on a miss and must return
+        JSON-serializable rows.
+        """
+        key = (_oid(user_id), bucket, start, end, category)
+        version = self.version(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2], True
+            self.misses += 1
+        series = load()
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), series)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return series, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+# Global spending series cache instance (one per process)
+series_cache = SpendingSeriesCache()
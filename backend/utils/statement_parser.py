@@ -6,9 +6,18 @@ have complex layout or multiple tables.
 import os
 import re
 import json
+import time
+import hashlib
+from bisect import bisect_left
 from datetime import datetime
 from dotenv import load_dotenv
 
+from utils.categorizer import KeywordCategorizer
+from utils.llm import RETRIES as LLM_RETRIES, call_gemini, run_concurrently
+from utils.merchant_memo import merchant_key, merchant_memo
+from utils.parser_profiles import parser_profiles
+from utils.pdf_pages import extract_page, extract_page_range, page_pool
+
 load_dotenv()
 
 try:
@@ -22,6 +31,11 @@ _api_key = os.getenv('GOOGLE_AI_API_KEY')
 if _api_key and _api_key.strip() and _api_key.strip() not in ('your_google_ai_api_key', 'your_google_ai_key'):
     genai.configure(api_key=_api_key.strip())
 
+CATEGORIZE_BATCH_SIZE = 60
+
+# Bump whenever extraction or categorization output changes; keys the parsed-results cache
+PARSER_VERSION = 1
+
 EXPENSE_CATEGORIES = [
     "food", "transport", "shopping", "entertainment", "bills", "health",
     "travel", "subscriptions", "transfer", "other"
@@ -40,6 +54,8 @@ CATEGORY_KEYWORDS = {
     "transfer": ["transfer", "zelle", "venmo", "paypal", "ach ", "wire", "payment to"],
 }
 
+_keyword_categorizer = KeywordCategorizer(CATEGORY_KEYWORDS)
+
 AMOUNT_PATTERN = re.compile(r"[-]?\$?\s*([\d,]+\.?\d*)")
 DATE_PATTERNS = [
     re.compile(r"(\d{1,2})[/\-](\d{1,2})[/\-](\d{2,4})"),
@@ -49,8 +65,16 @@ DATE_PATTERNS = [
 MONTHS = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
           "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
 
-# Minimum transactions to trust table-only result; below this we also run text + Gemini
+# Minimum transactions for a strategy to pass on score alone; below this (unless the
+# statement's balance reconciles) the cascade moves on to the next strategy
 MIN_TRANSACTIONS_TO_SKIP_FALLBACK = 15
+# Extraction cascade: a strategy's output is accepted once it scores at least this
+CONFIDENCE_THRESHOLD = 0.85
+STATEMENT_SPAN_DAYS = 45  # rows dated further than this from the median date are suspect
+OPENING_BALANCE_PATTERN = re.compile(r"(?:beginning|opening|starting|previous)\s+balance\W*?(-?\$?\s*[\d,]+\.\d{2})", re.I)
+CLOSING_BALANCE_PATTERN = re.compile(r"(?:ending|closing|new)\s+balance\W*?(-?\$?\s*[\d,]+\.\d{2})", re.I)
+TOTAL_DEPOSITS_PATTERN = re.compile(r"total\s+(?:deposits|credits)[^\d\n]*?(-?\$?\s*[\d,]+\.\d{2})", re.I)
+TOTAL_WITHDRAWALS_PATTERN = re.compile(r"total\s+(?:withdrawals|debits)[^\d\n]*?(-?\$?\s*[\d,]+\.\d{2})", re.I)
 
 
 def _parse_date_from_match(match, pattern_index=0):
@@ -75,64 +99,136 @@ def _parse_date_from_match(match, pattern_index=0):
     return None
 
 
-def extract_text_from_pdf(file_path, use_layout=True):
-    """Extract all text from every page. Try with layout first for better ordering."""
+# Per-statement date layout: inferred once from up to DATE_SAMPLE_SIZE dates in the document
+DATE_SAMPLE_SIZE = 200
+_YMD = re.compile(r"(\d{4})[/\-](\d{1,2})[/\-](\d{1,2})")
+_NUMERIC_DATE = re.compile(r"(?<![\d/\-])(\d{1,2})[/\-](\d{1,2})[/\-](\d{2,4})(?!\d)")
+_DAY_MONTH_NAME = DATE_PATTERNS[2]
+DATE_LAYOUT_PATTERNS = {"ymd": _YMD, "mdy": _NUMERIC_DATE, "dmy": _NUMERIC_DATE, "dmon": _DAY_MONTH_NAME}
+# Sampling pattern; ymd is tried first so "2024-03-14" is not read as "24-03-14"
+_ANY_DATE = re.compile(
+    f"(?P<ymd>{_YMD.pattern})|(?P<numeric>{_NUMERIC_DATE.pattern})|(?P<dmon>(?i:{_DAY_MONTH_NAME.pattern}))"
+)
+_FAMILY_PATTERNS = {"ymd": _YMD, "numeric": _NUMERIC_DATE, "dmon": _DAY_MONTH_NAME}
+
+
+def _year(y):
+    y = int(y)
+    return y if y >= 100 else 2000 + y
+
+
+def _date_for_layout(layout, groups):
+    try:
+        if layout == "ymd":
+            return datetime(int(groups[0]), int(groups[1]), int(groups[2]))
+        if layout == "mdy":
+            return datetime(_year(groups[2]), int(groups[0]), int(groups[1]))
+        if layout == "dmy":
+            return datetime(_year(groups[2]), int(groups[1]), int(groups[0]))
+        if layout == "dmon":
+            return datetime(_year(groups[2]), MONTHS.get(groups[1][:3].lower(), 1), int(groups[0]))
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+class DateParser:
+    """Dates in one statement's layout; each distinct date string is parsed once."""
+
+    def __init__(self, layout):
+        self.layout = layout
+        self._pattern = DATE_LAYOUT_PATTERNS[layout]
+        self._memo = {}
+
+    def parse(self, text):
+        m = self._pattern.search(text or "")
+        if not m:
+            return None
+        key = m.group(0)
+        if key not in self._memo:
+            self._memo[key] = _date_for_layout(self.layout, m.groups())
+        return self._memo[key]
+
+
+def infer_date_format(text, sample_size=DATE_SAMPLE_SIZE):
+    """
+    DateParser for the layout most of the statement's dates use, or None if it has no dates.
+    Numeric d/m vs m/d is decided by which reading keeps more dates valid, then by a
+    clearly shorter span (statements cover about a month), else month-first.
+    """
+    samples = {"ymd": [], "numeric": [], "dmon": []}
+    taken = 0
+    for line in (text or "").splitlines():
+        m = _ANY_DATE.search(line)  # the first date on a line is the one a row is dated by
+        if not m:
+            continue
+        family = m.lastgroup
+        samples[family].append(_FAMILY_PATTERNS[family].match(m.group(family)).groups())
+        taken += 1
+        if taken >= sample_size:
+            break
+    family = max(samples, key=lambda k: len(samples[k]))
+    if not samples[family]:
+        return None
+    if family != "numeric":
+        return DateParser(family)
+
+    def reading(layout):
+        dates = [d for d in (_date_for_layout(layout, g) for g in samples["numeric"]) if d]
+        return len(dates), ((max(dates) - min(dates)).days if dates else 0)
+
+    (mdy_valid, mdy_span), (dmy_valid, dmy_span) = reading("mdy"), reading("dmy")
+    day_first = dmy_valid > mdy_valid or (dmy_valid == mdy_valid and dmy_span + 7 < mdy_span)
+    return DateParser("dmy" if day_first else "mdy")
+
+
+# Pages are spread over the page pool (utils/pdf_pages.py) for documents with at least this many pages
+PARALLEL_MIN_PAGES = 4
+
+
+def extract_pages(file_path, workers=None):
+    """
+    Single extraction pass over the document: [{"text", "plain_text", "words_text", "tables"}]
+    per page, in page order. With the process's page pool started (standalone worker)
+    and enough pages, contiguous page ranges are spread over it; otherwise pages are
+    extracted here, opening the PDF once. workers=1 forces sequential extraction.
+    """
     if not HAS_PDF:
         raise ImportError("Install pdfplumber: pip install pdfplumber")
-    text_parts = []
+    pool, pool_size = page_pool()
+    workers = pool_size if workers is None else min(workers, pool_size)
     with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            try:
-                if use_layout:
-                    t = page.extract_text(layout=True)
-                else:
-                    t = page.extract_text()
-            except Exception:
-                t = page.extract_text()
-            if t:
-                text_parts.append(t)
-            # Also try extracting by words and grouping by line (y) for messy PDFs
-            if not t or len(t.strip()) < 100:
-                words = page.extract_words()
-                if words:
-                    by_y = {}
-                    for w in words:
-                        y = int(w.get("top", 0) // 5) * 5
-                        by_y.setdefault(y, []).append(w.get("text", ""))
-                    lines = [" ".join(by_y[k]) for k in sorted(by_y.keys())]
-                    text_parts.append("\n".join(lines))
-    return "\n".join(text_parts)
+        page_count = len(pdf.pages)
+        if pool is None or workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+            return [extract_page(page) for page in pdf.pages]
+
+    step = max(1, -(-page_count // (workers * 2)))
+    futures = [pool.submit(extract_page_range, file_path, i, min(i + step, page_count))
+               for i in range(0, page_count, step)]
+    return [page for f in futures for page in f.result()]
+
+
+def _join_page_text(pages, use_layout=True):
+    parts = []
+    for p in pages:
+        t = p["text"] if use_layout else p["plain_text"]
+        if t:
+            parts.append(t)
+        if p["words_text"]:
+            parts.append(p["words_text"])
+    return "\n".join(parts)
+
+
+def extract_text_from_pdf(file_path, use_layout=True):
+    """Extract all text from every page. Try with layout first for better ordering."""
+    return _join_page_text(extract_pages(file_path), use_layout=use_layout)
 
 
 def extract_tables_from_pdf(file_path):
     """Extract tables with multiple strategies to get more rows."""
     if not HAS_PDF:
         return []
-    all_tables = []
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            # Default extraction
-            tables = page.extract_tables()
-            if tables:
-                all_tables.extend(tables)
-            # Try with explicit table detection (find_tables then extract)
-            try:
-                found = page.find_tables()
-                for t in found:
-                    extracted = t.extract()
-                    if extracted and len(extracted) > 1:
-                        all_tables.append(extracted)
-            except Exception:
-                pass
-            # Try vertical_strategy="text" for lines that look like text
-            try:
-                tables2 = page.extract_tables(table_settings={"vertical_strategy": "text", "horizontal_strategy": "text"})
-                for tb in (tables2 or []):
-                    if tb and len(tb) > 1 and tb not in all_tables:
-                        all_tables.append(tb)
-            except Exception:
-                pass
-    return all_tables
+    return [t for p in extract_pages(file_path) for t in p["tables"]]
 
 
 def _parse_amount_cell(cell):
@@ -162,10 +258,12 @@ def _find_amount_column_index(row):
     return -1
 
 
-def _parse_date_cell(cell):
+def _parse_date_cell(cell, date_parser=None):
     if cell is None:
         return None
     s = str(cell).strip()
+    if date_parser:
+        return date_parser.parse(s)
     for i, pat in enumerate(DATE_PATTERNS):
         m = pat.search(s)
         if m:
@@ -173,8 +271,14 @@ def _parse_date_cell(cell):
     return None
 
 
-def transactions_from_tables(tables):
+def _table_text(tables):
+    return "\n".join(" ".join(str(c) for c in row if c) for table in tables for row in table if row)
+
+
+def transactions_from_tables(tables, date_parser=None):
+    """Rows with an amount from every table; dates read with date_parser (inferred from the tables if None)."""
     transactions = []
+    date_parser = date_parser or infer_date_format(_table_text(tables))
     for table in tables:
         if not table or len(table) < 2:
             continue
@@ -203,7 +307,7 @@ def transactions_from_tables(tables):
                 amount_val = -amount_val
             date_val = None
             if date_col >= 0 and date_col < len(row):
-                date_val = _parse_date_cell(row[date_col])
+                date_val = _parse_date_cell(row[date_col], date_parser)
             desc = ""
             if desc_col >= 0 and desc_col < len(row):
                 desc = str(row[desc_col] or "").strip()[:200]
@@ -214,9 +318,10 @@ def transactions_from_tables(tables):
     return transactions
 
 
-def parse_transactions_from_text(text):
-    """Parse every line that looks like it has a date and an amount."""
+def parse_transactions_from_text(text, date_parser=None):
+    """Parse every line that looks like it has a date and an amount (dates as in transactions_from_tables)."""
     transactions = []
+    date_parser = date_parser or infer_date_format(text)
     lines = [l.strip() for l in text.splitlines() if l.strip()]
     for line in lines:
         amounts = AMOUNT_PATTERN.findall(line)
@@ -237,11 +342,14 @@ def parse_transactions_from_text(text):
         else:
             amount_val = -abs(amount_val)
         date_val = None
-        for i, pat in enumerate(DATE_PATTERNS):
-            m = pat.search(line)
-            if m:
-                date_val = _parse_date_from_match(m, i)
-                break
+        if date_parser:
+            date_val = date_parser.parse(line)
+        else:
+            for i, pat in enumerate(DATE_PATTERNS):
+                m = pat.search(line)
+                if m:
+                    date_val = _parse_date_from_match(m, i)
+                    break
         desc = line
         for am in amounts:
             desc = re.sub(re.escape(am), "", desc)
@@ -272,81 +380,461 @@ def merge_and_dedupe(transaction_lists):
     return list(seen.values())
 
 
-def extract_transactions_with_gemini(raw_text):
-    """Use Gemini to extract ALL transactions from full statement text."""
-    if not raw_text or len(raw_text) < 50:
-        return []
-    # Use more of the document (up to 80k chars) and ask for completeness
-    text_slice = raw_text[:80000]
+# Layout profiles (utils/parser_profiles.py): column header labels -> roles, first match wins
+COLUMN_ROLES = [
+    ("date", ("date",)),
+    ("withdrawal", ("withdrawal", "debit")),
+    ("deposit", ("deposit", "credit")),
+    ("amount", ("amount",)),
+    ("balance", ("balance",)),
+    ("description", ("desc", "particular", "detail", "memo", "narration", "transaction", "payee")),
+]
+NUMERIC_ROLES = {"withdrawal", "deposit", "amount", "balance"}
+AMOUNT_WORD = re.compile(r"^[-+(]?\$?[\d,]*\d\.\d{2}\)?(?:-|CR|DR)?$", re.I)
+HEADER_WORD_GAP = 6  # points; words closer than this belong to one column label
+FINGERPRINT_GRID = 10  # points; label positions are compared on this grid
+
+
+def _word_lines(words):
+    """Words grouped into lines by vertical position, each line sorted left to right."""
+    by_y = {}
+    for w in words:
+        by_y.setdefault(int(w.get("top", 0) // 3), []).append(w)
+    return [sorted(by_y[k], key=lambda w: w["x0"]) for k in sorted(by_y)]
+
+
+def _column_role(label):
+    label = label.lower()
+    for role, keywords in COLUMN_ROLES:
+        if any(k in label for k in keywords):
+            return role
+    return None
+
+
+def _header_columns(words, page_width):
+    """Columns [{"role", "label", "label_x0", "x0", "x1"}] of the first line that looks like a transaction table header."""
+    for line in _word_lines(words):
+        labels = []
+        for w in line:
+            if labels and w["x0"] - labels[-1]["label_x1"] < HEADER_WORD_GAP:
+                labels[-1]["label"] += " " + w["text"]
+                labels[-1]["label_x1"] = w["x1"]
+            else:
+                labels.append({"label": w["text"], "label_x0": w["x0"], "label_x1": w["x1"]})
+        roles = [_column_role(l["label"]) for l in labels]
+        if len(labels) < 3 or "date" not in roles or not {"amount", "withdrawal", "deposit"} & set(roles):
+            continue
+        columns = []
+        for i, (label, role) in enumerate(zip(labels, roles)):
+            columns.append({
+                "role": role,
+                "label": label["label"],
+                "label_x0": round(label["label_x0"], 1),
+                # Column edges halfway between labels: right-aligned amounts start left of their label
+                "x0": 0 if i == 0 else round((labels[i - 1]["label_x1"] + label["label_x0"]) / 2, 1),
+                "x1": page_width if i == len(labels) - 1 else round((label["label_x1"] + labels[i + 1]["label_x0"]) / 2, 1),
+            })
+        return columns
+    return None
+
+
+def layout_fingerprint(page):
+    """
+    (fingerprint, columns, words) for a statement's first page. The fingerprint hashes the
+    page size and the table header's labels and positions; None if no header row is found.
+    """
+    words = page.extract_words()
+    columns = _header_columns(words, float(page.width))
+    if not columns:
+        return None, None, words
+    key = f"{round(page.width)}x{round(page.height)}|" + "|".join(
+        f"{c['label'].lower()}@{int(c['label_x0'] // FINGERPRINT_GRID)}" for c in columns
+    )
+    return hashlib.sha1(key.encode()).hexdigest()[:20], columns, words
+
+
+def _row_cells(line, columns):
+    edges = [c["x1"] for c in columns]
+    text_column = next((i for i, c in enumerate(columns) if c["role"] == "description"), None)
+    cells = [[] for _ in columns]
+    for w in line:
+        i = min(bisect_left(edges, (w["x0"] + w["x1"]) / 2), len(columns) - 1)
+        if columns[i]["role"] in NUMERIC_ROLES and text_column is not None and not AMOUNT_WORD.match(w["text"]):
+            i = text_column  # long descriptions spill under the amount headers
+        cells[i].append(w["text"])
+    return [" ".join(c) for c in cells]
+
+
+def _transaction_from_cells(cells, columns, date_parser):
+    by_role = {}
+    for cell, column in zip(cells, columns):
+        if column["role"] and cell:
+            by_role.setdefault(column["role"], cell)
+    date_val = date_parser.parse(by_role.get("date", "")) if date_parser else _parse_date_cell(by_role.get("date"))
+    if not date_val:
+        return None  # headers, totals and wrapped description lines
+    if "amount" in by_role:
+        amount, is_debit = _parse_amount_cell(by_role["amount"])
+        amount = -amount if amount and is_debit else amount
+    else:
+        withdrawal, _ = _parse_amount_cell(by_role.get("withdrawal"))
+        deposit, _ = _parse_amount_cell(by_role.get("deposit"))
+        amount = (deposit or 0) - (withdrawal or 0) if withdrawal or deposit else None
+    if not amount:
+        return None
+    description = by_role.get("description") or " ".join(
+        c for c, col in zip(cells, columns) if c and col["role"] is None
+    )
+    return {"date": date_val, "description": description.strip()[:200] or "Transaction", "amount": amount}
+
+
+def extract_with_profile(pdf, profile, first_page_words=None):
+    """
+    Single-strategy extraction for a known layout: (transactions, text). "columns" profiles
+    read one words pass per page into the stored column geometry; "text" profiles run the
+    line parser on the page text only (no table finding).
+    """
+    if profile["strategy"] == "text":
+        text = "\n".join((page.extract_text(layout=True) or "") for page in pdf.pages)
+        return parse_transactions_from_text(text), text
+    columns = profile["columns"]
+    lines = []
+    for i, page in enumerate(pdf.pages):
+        words = first_page_words if i == 0 and first_page_words is not None else page.extract_words()
+        lines.extend(_word_lines(words))
+        page.close()
+    text = "\n".join(" ".join(w["text"] for w in line) for line in lines)
+    date_parser = infer_date_format(text)  # per statement: one bank may change its date format
+    transactions = []
+    for line in lines:
+        t = _transaction_from_cells(_row_cells(line, columns), columns, date_parser)
+        if t:
+            transactions.append(t)
+    return transactions, text
+
+
+def _profile_call(fn, *args):
+    """Registry calls are best effort: without the database, every layout is unknown."""
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = """You are extracting every single transaction from a bank statement. Do not skip any.
+        return fn(*args)
+    except Exception:
+        return None
+
+
+GEMINI_CHUNK_CHARS = 12000
+GEMINI_CHUNK_OVERLAP_LINES = 6
+GEMINI_EXTRACT_TIMEOUT_SECONDS = 60
+_SECTION_BREAK = re.compile(r"\n\s*\n")
+_EXTRACT_PROMPT = """You are extracting every single transaction from a bank statement. Do not skip any.
 For each transaction return: date (YYYY-MM-DD if visible, else null), description (short, what the transaction is), amount (number: negative for withdrawals/debits/payments/outgoing, positive for deposits/credits/incoming).
 Include every transaction you can find in the text. Return ONLY a valid JSON array of objects with keys: date, description, amount. No markdown, no code block wrapper.
 Example: [{"date":"2024-01-15","description":"AMAZON","amount":-45.99},{"date":"2024-01-16","description":"SALARY","amount":3000}]"""
-        prompt += "\n\nBank statement text:\n" + text_slice
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        # Strip markdown/code blocks
-        for start in ["```json", "```"]:
-            if start in text:
-                text = text.split(start)[1].split("```")[0].strip()
-        arr = json.loads(text)
-        out = []
-        for o in arr:
-            amt = o.get("amount", 0)
-            if not isinstance(amt, (int, float)):
-                try:
-                    amt = float(str(amt).replace(",", "").replace("$", "").replace(" ", ""))
-                except ValueError:
-                    continue
-            date_val = None
-            d = o.get("date")
-            if d:
-                try:
-                    if isinstance(d, str) and len(d) >= 10:
-                        date_val = datetime.strptime(d[:10], "%Y-%m-%d")
-                    elif isinstance(d, str) and re.match(r"\d{1,2}/\d{1,2}/\d{2,4}", d):
-                        parts = re.findall(r"\d+", d)
-                        if len(parts) >= 3:
-                            day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-                            if year < 100:
-                                year += 2000
-                            date_val = datetime(year, month, day)
-                except Exception:
-                    pass
-            out.append({
-                "date": date_val,
-                "description": str(o.get("description", ""))[:200],
-                "amount": amt,
-            })
-        return out
-    except Exception:
+_CONTEXT_NOTE = """
+The text before the line "--- CONTINUED ---" is context repeated from the previous part; only extract transactions that appear after that line."""
+
+
+def _split_long(text, max_chars):
+    """Pieces of at most max_chars, split on section breaks, then on lines."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces = []
+    for section in _SECTION_BREAK.split(text):
+        units = [section] if len(section) <= max_chars else section.splitlines()
+        for unit in units:
+            unit = unit[:max_chars]
+            if pieces and len(pieces[-1]) + len(unit) + 1 <= max_chars:
+                pieces[-1] += "\n" + unit
+            else:
+                pieces.append(unit)
+    return pieces
+
+
+def chunk_statement_text(page_texts, max_chars=GEMINI_CHUNK_CHARS, overlap_lines=GEMINI_CHUNK_OVERLAP_LINES):
+    """
+    Split the statement into [{"text", "overlap"}] chunks of about max_chars. Whole pages are
+    packed together; a page that does not fit is split on section, then line, boundaries.
+    Each chunk after the first repeats the previous chunk's last overlap_lines lines as
+    "overlap", so a transaction cut by a boundary is seen whole by one of the two chunks.
+    """
+    bodies = []
+    for page in page_texts:
+        for piece in _split_long((page or "").strip(), max_chars):
+            if not piece:
+                continue
+            if bodies and len(bodies[-1]) + len(piece) + 1 <= max_chars:
+                bodies[-1] += "\n" + piece
+            else:
+                bodies.append(piece)
+    chunks = []
+    for i, body in enumerate(bodies):
+        overlap = "\n".join(bodies[i - 1].splitlines()[-overlap_lines:]) if i and overlap_lines else ""
+        chunks.append({"text": body, "overlap": overlap})
+    return chunks
+
+
+def _gemini_transaction(o):
+    amt = o.get("amount", 0)
+    if not isinstance(amt, (int, float)):
+        try:
+            amt = float(str(amt).replace(",", "").replace("$", "").replace(" ", ""))
+        except ValueError:
+            return None
+    date_val = None
+    d = o.get("date")
+    if d:
+        try:
+            if isinstance(d, str) and len(d) >= 10:
+                date_val = datetime.strptime(d[:10], "%Y-%m-%d")
+            elif isinstance(d, str) and re.match(r"\d{1,2}/\d{1,2}/\d{2,4}", d):
+                parts = re.findall(r"\d+", d)
+                if len(parts) >= 3:
+                    day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
+                    if year < 100:
+                        year += 2000
+                    date_val = datetime(year, month, day)
+        except Exception:
+            pass
+    return {
+        "date": date_val,
+        "description": str(o.get("description", ""))[:200],
+        "amount": amt,
+    }
+
+
+def _parse_transaction_array(text):
+    text = text.strip()
+    # Strip markdown/code blocks
+    for start in ["```json", "```"]:
+        if start in text:
+            text = text.split(start)[1].split("```")[0].strip()
+    arr = json.loads(text)
+    return [t for t in (_gemini_transaction(o) for o in arr if isinstance(o, dict)) if t]
+
+
+def _amount_in_text(amount, text):
+    a = abs(float(amount or 0))
+    return f"{a:.2f}" in text or f"{a:,.2f}" in text
+
+
+def stitch_chunk_transactions(chunks, results):
+    """
+    Concatenate per-chunk transactions in chunk order. A transaction equal to one of the
+    previous chunk's and whose amount appears in this chunk's overlap text is the same row
+    seen twice and is dropped, once per previous occurrence; repeated identical rows that
+    are not on a boundary are kept.
+    """
+    out = []
+    previous = []
+    for chunk, transactions in zip(chunks, results):
+        transactions = transactions or []
+        seen_before = {}
+        for t in previous:
+            k = _transaction_key(t)
+            seen_before[k] = seen_before.get(k, 0) + 1
+        for t in transactions:
+            k = _transaction_key(t)
+            if seen_before.get(k) and chunk["overlap"] and _amount_in_text(t.get("amount"), chunk["overlap"]):
+                seen_before[k] -= 1
+                continue
+            out.append(t)
+        previous = transactions
+    return out
+
+
+def extract_transactions_with_gemini(raw_text, page_texts=None, failures=None):
+    """
+    Use Gemini to extract ALL transactions from the statement text. The text (per page when
+    page_texts is given) is split into overlapping chunks that are extracted concurrently and
+    stitched back together; a chunk that fails loses only its own rows. Pass a list as
+    failures to get the indices of those chunks (the result is then incomplete).
+    """
+    if not raw_text or len(raw_text) < 50:
         return []
+    chunks = chunk_statement_text(page_texts if page_texts is not None else [raw_text])
 
+    def extract_chunk(chunk):
+        prompt = _EXTRACT_PROMPT
+        if chunk["overlap"]:
+            prompt += _CONTEXT_NOTE + "\n\nBank statement text:\n" + chunk["overlap"] + "\n--- CONTINUED ---\n" + chunk["text"]
+        else:
+            prompt += "\n\nBank statement text:\n" + chunk["text"]
+        return call_gemini(prompt, parse=_parse_transaction_array, timeout=GEMINI_EXTRACT_TIMEOUT_SECONDS)
 
-def parse_and_extract_transactions(file_path):
+    results = run_concurrently(extract_chunk, chunks, timeout=GEMINI_EXTRACT_TIMEOUT_SECONDS * (LLM_RETRIES + 1) + 10)
+    if failures is not None:
+        failures.extend(i for i, r in enumerate(results) if r is None)
+    return stitch_chunk_transactions(chunks, results)
+
+
+def _summary_amount(pattern, text):
+    m = pattern.search(text or "")
+    if not m:
+        return None
+    try:
+        return float(re.sub(r"[^\d.\-]", "", m.group(1)))
+    except ValueError:
+        return None
+
+
+def _balance_check(transactions, text):
+    """
+    Compare transactions with the statement's own summary lines: opening + net = closing,
+    and deposit/withdrawal totals. True/False, or None when the statement has no summary.
+    """
+    tolerance = 0.01
+    checks = []
+    opening = _summary_amount(OPENING_BALANCE_PATTERN, text)
+    closing = _summary_amount(CLOSING_BALANCE_PATTERN, text)
+    net = sum(float(t.get("amount") or 0) for t in transactions)
+    if opening is not None and closing is not None:
+        checks.append(abs(opening + net - closing) <= tolerance)
+    deposits = _summary_amount(TOTAL_DEPOSITS_PATTERN, text)
+    if deposits is not None:
+        checks.append(abs(sum(float(t["amount"]) for t in transactions if float(t.get("amount") or 0) > 0) - abs(deposits)) <= tolerance)
+    withdrawals = _summary_amount(TOTAL_WITHDRAWALS_PATTERN, text)
+    if withdrawals is not None:
+        checks.append(abs(sum(-float(t["amount"]) for t in transactions if float(t.get("amount") or 0) < 0) - abs(withdrawals)) <= tolerance)
+    return all(checks) if checks else None
+
+
+def score_transactions(transactions, text=""):
+    """
+    Confidence that an extractor found the statement's transactions:
+    date coverage, row consistency (dated within the statement period, real description)
+    and the balance check. "confident" means the cascade can stop here.
+    """
+    n = len(transactions)
+    if not n:
+        return {"count": 0, "date_coverage": 0.0, "row_consistency": 0.0, "balance_ok": None, "score": 0.0, "confident": False}
+    dates = sorted(t["date"] for t in transactions if t.get("date"))
+    date_coverage = len(dates) / n
+    consistent = 0
+    if dates:
+        median = dates[len(dates) // 2]
+        for t in transactions:
+            if not t.get("date") or abs((t["date"] - median).days) > STATEMENT_SPAN_DAYS:
+                continue
+            if (t.get("description") or "Transaction") == "Transaction":
+                continue
+            consistent += 1
+    row_consistency = consistent / n
+    balance_ok = _balance_check(transactions, text)
+    balance_score = {True: 1.0, None: 0.5, False: 0.0}[balance_ok]
+    score = round(0.4 * date_coverage + 0.4 * row_consistency + 0.2 * balance_score, 3)
+    confident = balance_ok is not False and (
+        (balance_ok and date_coverage >= 0.9)
+        or (n >= MIN_TRANSACTIONS_TO_SKIP_FALLBACK and score >= CONFIDENCE_THRESHOLD)
+    )
+    return {
+        "count": n,
+        "date_coverage": round(date_coverage, 3),
+        "row_consistency": round(row_consistency, 3),
+        "balance_ok": balance_ok,
+        "score": score,
+        "confident": confident,
+    }
+
+
+def extract_transactions_with_report(file_path):
     """
-    Extract transactions using ALL methods, then merge and dedupe to get the most complete list.
+    Strategy cascade: tables, then the line parser, then both merged, then Gemini; stop at the
+    first output that scores as confident. If none does, merge everything as before.
+    A statement whose layout has a parser profile goes through that profile's single
+    strategy first (path "profile"); new layouts are learned on the way.
+    Returns (transactions, report) where report has the chosen path and per-strategy timings.
+    report["partial"] is True when the chosen transactions include Gemini output with failed
+    chunks, i.e. rows are missing; the caller decides whether to retry.
     """
-    # 1) Get full text (layout + word-fallback for sparse pages)
-    full_text = extract_text_from_pdf(file_path, use_layout=True)
+    report = {"path": None, "strategies": [], "partial": False}
+    started = time.perf_counter()
+
+    def run(name, fn):
+        t0 = time.perf_counter()
+        result = fn()
+        entry = {"name": name, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+        report["strategies"].append(entry)
+        return result, entry
+
+    def finish(path, transactions):
+        report["path"] = path
+        report["confident"] = path != "merged"
+        report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return transactions, report
+
+    # Known layout: one words pass with the stored column geometry instead of the cascade.
+    # A new layout with a recognisable header tries its own geometry first and is learned.
+    fingerprint = profile = None
+    if HAS_PDF:
+        with pdfplumber.open(file_path) as pdf:
+            if pdf.pages:
+                (fingerprint, columns, words), _ = run("fingerprint", lambda: layout_fingerprint(pdf.pages[0]))
+            if fingerprint:
+                profile = _profile_call(parser_profiles.get, fingerprint)
+                if profile and profile.get("parser_version") != PARSER_VERSION:
+                    profile = None
+                candidate = profile or {"strategy": "columns", "columns": columns}
+                if candidate["strategy"] != "cascade":
+                    (from_profile, profile_text), entry = run("profile", lambda: extract_with_profile(pdf, candidate, words))
+                    entry.update(score_transactions(from_profile, profile_text))
+                    if profile:
+                        _profile_call(parser_profiles.record, fingerprint, entry["confident"])
+                    if entry["confident"]:
+                        if not profile:
+                            _profile_call(parser_profiles.learn, fingerprint, dict(candidate, parser_version=PARSER_VERSION))
+                        report["profile"] = fingerprint
+                        return finish("profile", from_profile)
+    report["profile"] = None
+
+    def finish_and_learn(path, transactions):
+        if fingerprint and not profile:
+            # The cascade's verdict becomes the layout's strategy ("cascade" = keep using it)
+            _profile_call(parser_profiles.learn, fingerprint, {
+                "strategy": "text" if path == "text" else "cascade",
+                "parser_version": PARSER_VERSION,
+            })
+        return finish(path, transactions)
+
+    # One pass over the PDF gives text, sparse-page word lines and tables for every page
+    pages, _ = run("pdf", lambda: extract_pages(file_path))
+    full_text = _join_page_text(pages, use_layout=True)
     if len(full_text.strip()) < 50:
-        full_text = extract_text_from_pdf(file_path, use_layout=False)
+        full_text = _join_page_text(pages, use_layout=False)
+
+    # One date layout for the whole statement, shared by the table and line parsers
+    date_parser = infer_date_format(full_text)
+    report["date_format"] = date_parser.layout if date_parser else None
 
-    # 2) Tables
-    tables = extract_tables_from_pdf(file_path)
-    from_tables = transactions_from_tables(tables)
+    def attempt(name, fn):
+        transactions, entry = run(name, fn)
+        entry.update(score_transactions(transactions, full_text))
+        return transactions, entry["confident"]
 
-    # 3) Line-by-line from text
-    from_text = parse_transactions_from_text(full_text)
+    # 1) Tables
+    from_tables, ok = attempt("tables", lambda: transactions_from_tables([t for p in pages for t in p["tables"]], date_parser))
+    if ok:
+        return finish_and_learn("tables", from_tables)
 
-    # 4) Gemini on full text (always run if we have text, to catch what tables/lines missed)
+    # 2) Line-by-line from text
+    from_text, ok = attempt("text", lambda: parse_transactions_from_text(full_text, date_parser))
+    if ok:
+        return finish_and_learn("text", from_text)
+    combined, ok = attempt("tables+text", lambda: merge_and_dedupe([from_tables, from_text]))
+    if ok:
+        return finish_and_learn("tables+text", combined)
+
+    # 3) Gemini on full text, only when the local parsers were not convincing
     from_gemini = []
     if full_text.strip():
-        from_gemini = extract_transactions_with_gemini(full_text)
+        page_texts = [_join_page_text([p], use_layout=True) or _join_page_text([p], use_layout=False) for p in pages]
+        failed_chunks = []
+        from_gemini, ok = attempt("gemini", lambda: extract_transactions_with_gemini(full_text, page_texts, failed_chunks))
+        if failed_chunks:
+            report["strategies"][-1]["failed_chunks"] = len(failed_chunks)
+            report["partial"] = True  # the gemini and merged paths both carry its rows
+        if ok:
+            return finish_and_learn("gemini", from_gemini)
 
-    # 5) Merge and dedupe; take the largest / merged set
+    # 4) Nothing was confident: merge and dedupe; take the largest / merged set
     merged = merge_and_dedupe([from_tables, from_text, from_gemini])
 
     # If we still have very few, prefer Gemini if it found more (often best for messy PDFs)
@@ -357,50 +845,102 @@ def parse_and_extract_transactions(file_path):
     elif len(merged) < len(from_text) and len(from_text) > len(from_tables) and len(from_text) > len(from_gemini):
         merged = from_text
 
-    return merged
+    return finish_and_learn("merged", merged)
+
+
+def parse_and_extract_transactions(file_path):
+    """
+    Extract transactions with the confidence cascade (see extract_transactions_with_report).
+    """
+    return extract_transactions_with_report(file_path)[0]
 
 
 def _category_from_description(description):
     """Apply keyword rules so we don't lump everything into 'other'."""
-    if not description:
-        return "other"
-    d = description.lower()
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for kw in keywords:
-            if kw in d:
-                return category
-    return "other"
+    return _keyword_categorizer.categorize(description)
+
+
+def categorize_many(descriptions):
+    """Keyword categories for many descriptions at once (each distinct description is matched once)."""
+    return _keyword_categorizer.categorize_many(descriptions)
+
+
+def _apply_ai_category(transaction, category):
+    # Only override the keyword category when the model/memo has something more specific
+    if category in EXPENSE_CATEGORIES and category != "other":
+        transaction["category"] = category
+
+
+def _parse_category_array(text):
+    text = text.strip()
+    if "```" in text:
+        text = text.split("```")[1].replace("json", "").strip()
+    return json.loads(text)
 
 
 def categorize_transactions_with_ai(transactions):
     if not transactions:
         return []
     # Keyword-based first so we never end up with everything as "other"
-    for t in transactions:
-        t["category"] = _category_from_description(t.get("description", ""))
-    # Optionally refine with Gemini: only override when Gemini returns a non-other category
+    for t, category in zip(transactions, categorize_many([t.get("description", "") for t in transactions])):
+        t["category"] = category
+
+    # Merchants answered before (by Gemini or a promoted user correction) come from the shared memo
+    keys = [merchant_key(t.get("description", "")) for t in transactions]
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        batch_size = 60
-        for start in range(0, len(transactions), batch_size):
-            batch = transactions[start:start + batch_size]
-            lines = [f"{i+1}. {t.get('description', '')} | {t.get('amount', 0)}" for i, t in enumerate(batch)]
-            prompt = f"""Assign each line to one category. Categories: {', '.join(EXPENSE_CATEGORIES)}.
+        known = merchant_memo.get_many(keys)
+    except Exception:
+        known = {}
+    unseen = {}  # merchant key -> one transaction to show the model
+    for t, key in zip(transactions, keys):
+        if key in known:
+            _apply_ai_category(t, known[key])
+        elif key and key not in unseen:
+            unseen[key] = t
+    if not unseen:
+        return transactions
+
+    # Optionally refine with Gemini: only merchants the memo has never seen, once each.
+    # Batches run concurrently (rate limited); a failed batch only loses its own answers.
+    def categorize_batch(batch):
+        lines = [f"{i+1}. {t.get('description', '')} | {t.get('amount', 0)}" for i, (_, t) in enumerate(batch)]
+        prompt = f"""Assign each line to one category. Categories: {', '.join(EXPENSE_CATEGORIES)}.
 Return a JSON array of category strings in the same order. Be specific (use food, transport, shopping, bills, etc.), avoid "other" when possible.
 Lines:
 """ + "\n".join(lines)
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            if "```" in text:
-                text = text.split("```")[1].replace("json", "").strip()
-            arr = json.loads(text)
-            for i, t in enumerate(batch):
-                if i < len(arr) and isinstance(arr[i], str):
-                    gemini_cat = arr[i].lower()
-                    if gemini_cat in EXPENSE_CATEGORIES and gemini_cat != "other":
-                        t["category"] = gemini_cat
+        arr = call_gemini(prompt, parse=_parse_category_array)
+        return {
+            key: arr[i].lower()
+            for i, (key, _) in enumerate(batch)
+            if i < len(arr) and isinstance(arr[i], str) and arr[i].lower() in EXPENSE_CATEGORIES
+        }
+
+    pending = list(unseen.items())
+    batches = [pending[start:start + CATEGORIZE_BATCH_SIZE] for start in range(0, len(pending), CATEGORIZE_BATCH_SIZE)]
+    answers = {}
+    for batch_answers in run_concurrently(categorize_batch, batches):
+        answers.update(batch_answers or {})
+    if answers:
+        try:
+            merchant_memo.learn(answers, source="gemini")
+        except Exception:
+            pass
+        for t, key in zip(transactions, keys):
+            if key in answers:
+                _apply_ai_category(t, answers[key])
+    return transactions
+
+
+def apply_user_corrections(transactions, user_id):
+    """Apply the user's own category corrections (merchant memo) on top of shared categories."""
+    try:
+        fixes = merchant_memo.corrections(user_id, [merchant_key(t.get("description", "")) for t in transactions])
     except Exception:
-        pass
+        return transactions
+    for t in transactions:
+        category = fixes.get(merchant_key(t.get("description", "")))
+        if category:
+            t["category"] = category
     return transactions
 
 
@@ -460,6 +1000,38 @@ def _fallback_suggestions(target_amount, current_amount, days=180, remaining=Non
     }
 
 
+CUT_TIPS = {
+    "food": "Cut one takeout or coffee run per week to hit your goal faster.",
+    "subscriptions": "Review subscriptions you don't use; cancel one to save monthly.",
+    "transport": "Try walking or transit once a week instead of rideshare.",
+    "shopping": "Wait 48 hours before non-essential purchases.",
+    "entertainment": "Swap one paid outing a week for a free one.",
+}
+
+
+def suggest_daily_from_spending(by_category, target_amount, target_date=None, current_amount=0):
+    """
+    Daily savings suggestion without AI from {category: total spent}: the goal's daily
+    amount plus a tip for the biggest discretionary category.
+    """
+    remaining = max(0, float(target_amount) - float(current_amount))
+    days = 180
+    if target_date:
+        try:
+            if isinstance(target_date, str):
+                target_date = datetime.fromisoformat(target_date.replace("Z", "+00:00"))
+            days = max(30, (target_date.replace(tzinfo=None) - datetime.utcnow()).days)
+        except Exception:
+            pass
+    suggestion = _fallback_suggestions(target_amount, current_amount, days, remaining)
+    cut_candidates = [(c, t) for c, t in by_category.items() if c not in ("bills", "transfer", "other") and t > 0]
+    if cut_candidates:
+        top_cut_category = max(cut_candidates, key=lambda x: x[1])[0]
+        suggestion["top_cut_category"] = top_cut_category
+        suggestion["tip"] = CUT_TIPS.get(top_cut_category, f"Set a weekly cap on {top_cut_category} spending.")
+    return suggestion
+
+
 def generate_quests_from_spending(spending_by_category, goal_name=None):
     # Build "don't spend on X" quests from top categories
     quests = []
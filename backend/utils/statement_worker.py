@@ -0,0 +1,183 @@
+"""
+Background processing for uploaded bank statements.
+
+The upload endpoint only saves the PDF and enqueues a statement_jobs entry;
+StatementWorkerPool threads claim jobs and run the pipeline (parse, categorize,
+store transactions, recalculate goal levels), reporting progress on the job so
+GET /api/bank-statements/<id>/status can show it. Run in-process by the API server
+started with python app.py (STATEMENT_WORKERS threads, 0 to disable; importing app
+does not start them) or standalone with scripts/run_statement_worker.py.
+"""
+
+import os
+import socket
+import threading
+import time
+
+from data.mock_statement_v4 import get_mock_transactions_for_upload
+from models.bank_statement import BankStatement
+from models.goal import Goal
+from models.statement_cache import StatementCache
+from models.statement_job import StatementJob
+from models.user import User
+from utils.ai_calculator import calculate_levels_with_ai
+from utils.statement_parser import (
+    PARSER_VERSION,
+    extract_transactions_with_report,
+    categorize_transactions_with_ai,
+    apply_user_corrections,
+)
+
+WORKERS = int(os.getenv("STATEMENT_WORKERS", 2))
+POLL_SECONDS = 2
+EXPIRED_SWEEP_SECONDS = 60
+
+
+def recalculate_goal_levels(user_id, bank_statement_model, goal_model, user_model):
+    """Recalculate daily amount and levels for active goals using the user's trailing monthly cash flow."""
+    monthly_income, avg_expenses = bank_statement_model.cash_flow.goal_inputs(user_id)
+    user = user_model.find_by_id(user_id)
+    active_goals = goal_model.get_user_goals(user_id, status="active")
+    for goal in active_goals:
+        ai_result = calculate_levels_with_ai(
+            {
+                "target_amount": goal["target_amount"],
+                "current_amount": goal.get("current_amount", 0),
+                "category": goal.get("goal_category", "other"),
+                "target_date": goal.get("target_date"),
+            },
+            {
+                "monthly_income": monthly_income,
+                "avg_expenses": avg_expenses,
+                "current_streak": user.get("current_streak", 0),
+                "from_bank_statement": True,
+            },
+        )
+        goal_model.set_level_system(
+            goal["_id"],
+            ai_result["total_levels"],
+            ai_result["level_thresholds"],
+            ai_result["daily_target"],
+        )
+
+
+class StatementWorkerPool:
+    def __init__(self, db, workers=WORKERS, poll_seconds=POLL_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.jobs = StatementJob(db)
+        self.cache = StatementCache(db)
+        self.bank_statements = BankStatement(db)
+        self.goals = Goal(db)
+        self.users = User(db)
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._last_sweep = 0.0
+        self._name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self):
+        """Start the worker threads (no-op if already running or workers is 0)."""
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, args=(f"{self._name}:{i}",), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers now instead of at the next poll (called after enqueue)."""
+        self._wake.set()
+
+    def _run(self, worker_id):
+        while not self._stop.is_set():
+            if time.monotonic() - self._last_sweep > EXPIRED_SWEEP_SECONDS:
+                self._last_sweep = time.monotonic()
+                self.jobs.requeue_expired()
+            job = self.jobs.claim(worker_id)
+            if job is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            self.process(job)
+
+    def process(self, job):
+        """Run one claimed job to completion, retry or failure."""
+        statement_id = job["statement_id"]
+        self.bank_statements.set_status(statement_id, "processing")
+        try:
+            outcome = self.run_pipeline(job)
+        except Exception as e:
+            self.jobs.fail(job, e)  # marks the statement failed once attempts are used up
+            return
+        self.bank_statements.set_status(statement_id, "processed")
+        self.jobs.complete(job, outcome)
+
+    def run_pipeline(self, job):
+        def report(stage, progress):
+            self.jobs.report_progress(job, stage, progress)
+
+        last_attempt = job["attempts"] >= job["max_attempts"]
+        sha256 = job.get("sha256")
+        use_mock = False
+        partial = False
+        cached = self.cache.get(sha256, PARSER_VERSION) if sha256 else None
+        if cached:
+            # Same file parsed before: reuse its categorized transactions, no parsing or LLM calls
+            transactions = cached["transactions"]
+            self.bank_statements.set_extraction(job["statement_id"], {
+                "path": "cache",
+                "cached_path": (cached.get("extraction") or {}).get("path"),
+                "strategies": [],
+                "total_ms": 0,
+            })
+        else:
+            report("parsing", 10)
+            try:
+                transactions, extraction = extract_transactions_with_report(job["path"])
+                self.bank_statements.set_extraction(job["statement_id"], extraction)
+                partial = bool(extraction.get("partial"))
+                if partial and not last_attempt:
+                    # Some Gemini chunks failed: retry rather than save an incomplete set
+                    raise RuntimeError("Gemini extraction failed for part of the statement")
+                report("categorizing", 50)
+                transactions = categorize_transactions_with_ai(transactions)
+                if sha256 and not partial:
+                    self.cache.put(sha256, PARSER_VERSION, transactions, extraction)
+            except ImportError:
+                use_mock = True
+                transactions = get_mock_transactions_for_upload()
+            except Exception:
+                if not last_attempt:
+                    raise
+                use_mock = True
+                transactions = get_mock_transactions_for_upload()
+
+        if not use_mock:
+            # After the shared cache, which is not per user
+            transactions = apply_user_corrections(transactions, job["user_id"])
+
+        if not self.bank_statements.get_by_id(job["statement_id"]):
+            return {"transaction_count": 0, "used_mock": use_mock, "cancelled": True}  # deleted meanwhile
+        report("storing", 75)
+        count, duplicates = self.bank_statements.replace_transactions(
+            job["user_id"],
+            job["statement_id"],
+            [{"date": t.get("date"), "description": t.get("description", ""), "amount": t.get("amount", 0), "category": t.get("category", "other")} for t in transactions]
+        )
+
+        report("updating_goals", 90)
+        try:
+            recalculate_goal_levels(job["user_id"], self.bank_statements, self.goals, self.users)
+        except Exception:
+            pass
+        return {"transaction_count": count, "duplicate_count": duplicates, "used_mock": use_mock,
+                "cache_hit": bool(cached), "partial": partial and not use_mock}
@@ -0,0 +1,108 @@
+"""
+LRU cache of user display summaries (username, name, avatar initial, points, streak).
+
+Friends lists, nudges, feed authors, veto requests and leaderboards only need these
+few fields. get_many() serves them from memory and loads every miss with a single
+projected $in query, so resolving 500 users costs at most one round trip. User
+writes (update_user, update_game_stats, pts) invalidate the entry; TTL_SECONDS
+bounds staleness for writes made by other workers.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+
+from config.database import db_instance
+
+MAX_ENTRIES = 10000
+TTL_SECONDS = 60
+SUMMARY_PROJECTION = {"username": 1, "name": 1, "game_points": 1, "current_streak": 1}
+
+
+def _oid(user_id):
+    return ObjectId(user_id) if isinstance(user_id, str) else user_id
+
+
+def summarize(user):
+    """Summary dict for a user document (same field names as the users collection, plus avatar)."""
+    name = user.get("name") or ""
+    return {
+        "_id": user["_id"],
+        "username": user.get("username", ""),
+        "name": name,
+        "avatar": name[0].upper() if name else None,
+        "game_points": user.get("game_points", 0),
+        "current_streak": user.get("current_streak", 0),
+    }
+
+
+class UserSummaryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # ObjectId -> (expires_at, summary)
+        self._collection = None
+        self._lock = threading.Lock()
+
+    def attach(self, collection):
+        """Use this users collection (defaults to db_instance.db.users)."""
+        self._collection = collection
+
+    def _users(self):
+        return self._collection if self._collection is not None else db_instance.db["users"]
+
+    def get(self, user_id):
+        """Summary for one user, or None if the user does not exist."""
+        if not user_id:
+            return None
+        return self.get_many([user_id]).get(_oid(user_id))
+
+    def get_many(self, user_ids):
+        """{ObjectId: summary} for the given ids (str or ObjectId); unknown users are omitted."""
+        wanted = {_oid(uid) for uid in user_ids if uid}
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for oid in wanted:
+                entry = self._entries.get(oid)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(oid)
+                    found[oid] = entry[1]
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        missing = [oid for oid in wanted if oid not in found]
+        if missing:
+            loaded = [summarize(u) for u in self._users().find({"_id": {"$in": missing}}, SUMMARY_PROJECTION)]
+            self.put_many(loaded)
+            found.update((s["_id"], s) for s in loaded)
+        return found
+
+    def put_many(self, summaries):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for s in summaries:
+                self._entries[s["_id"]] = (expires_at, s)
+                self._entries.move_to_end(s["_id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(_oid(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+# Global user summary cache instance (one per process)
+user_summaries = UserSummaryCache()
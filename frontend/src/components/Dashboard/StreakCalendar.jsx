@@ -4,26 +4,39 @@ import { gamificationService } from '../../services/api';
 const MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'];
 const WEEKDAYS = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
 
+function daysFromBitmap(bitmap) {
+  const days = [];
+  for (let d = 1; d <= 31; d++) {
+    if (bitmap & (1 << (d - 1))) days.push(d);
+  }
+  return days;
+}
+
 export default function StreakCalendar({ compact = false }) {
-  const [daysAchieved, setDaysAchieved] = useState([]);
+  const [bitmaps, setBitmaps] = useState({});
   const [year, setYear] = useState(new Date().getFullYear());
   const [month, setMonth] = useState(new Date().getMonth() + 1);
   const [loading, setLoading] = useState(true);
 
+  // One request loads the whole year; switching months within it needs no refetch
   useEffect(() => {
     let cancelled = false;
     setLoading(true);
-    gamificationService.getStreakCalendar(year, month).then(({ data }) => {
+    gamificationService.getStreakCalendarRange(`${year}-01`, `${year}-12`).then(({ data }) => {
       if (!cancelled) {
-        setDaysAchieved(data.days || []);
+        const byMonth = {};
+        (data.months || []).forEach((m) => { byMonth[m.month] = m.bitmap; });
+        setBitmaps(byMonth);
       }
     }).catch(() => {
-      if (!cancelled) setDaysAchieved([]);
+      if (!cancelled) setBitmaps({});
     }).finally(() => {
       if (!cancelled) setLoading(false);
     });
     return () => { cancelled = true; };
-  }, [year, month]);
+  }, [year]);
+
+  const daysAchieved = daysFromBitmap(bitmaps[month] || 0);
 
   const firstDay = new Date(year, month - 1, 1).getDay();
   const daysInMonth = new Date(year, month, 0).getDate();
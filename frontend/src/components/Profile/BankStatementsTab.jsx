@@ -14,6 +14,10 @@ import {
 import { bankStatementService } from '../../services/api';
 import toast from 'react-hot-toast';
 
+const STATUS_POLL_MS = 1500;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const CHART_COLORS = ['#E0BBE4', '#FFD6E8', '#D1F2EB', '#FEF9E7', '#93C5FD', '#FDE68A', '#A7F3D0', '#FBCFE8'];
 
 function spendingToChartData(spendingByCategory) {
@@ -29,6 +33,7 @@ export default function BankStatementsTab() {
   const [analysis, setAnalysis] = useState(null);
   const [loading, setLoading] = useState(false);
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(null);
 
   const fetchStatements = async () => {
     try {
@@ -76,13 +81,31 @@ export default function BankStatementsTab() {
       const formData = new FormData();
       formData.append('file', file);
       const { data } = await bankStatementService.upload(formData);
-      toast.success(`Processed ${data.transactionCount} transactions`);
+      fetchStatements();
+      // Parsing runs in the background; poll until the worker finishes
+      let status = { status: data.status, progress: 0, stage: 'queued' };
+      while (status.status === 'queued' || status.status === 'processing') {
+        setProgress(status);
+        await sleep(STATUS_POLL_MS);
+        status = (await bankStatementService.status(data.statementId)).data;
+      }
+      if (status.status === 'failed') {
+        toast.error(status.error || 'Processing failed');
+      } else {
+        toast.success(
+          `Processed ${status.transactionCount} transactions`
+          + (status.duplicateCount ? ` (${status.duplicateCount} already imported)` : '')
+          + (status.usedSampleData ? ' (using sample data)' : '')
+          + (status.partial ? ' (some pages could not be read)' : '')
+        );
+      }
       fetchStatements();
       fetchAnalysis();
     } catch (err) {
       toast.error(err.response?.data?.error || 'Upload failed');
     } finally {
       setUploading(false);
+      setProgress(null);
       e.target.value = '';
     }
   };
@@ -106,7 +129,11 @@ export default function BankStatementsTab() {
             className="block w-full text-sm file:mr-4 file:py-2 file:px-4 file:rounded-full file:border-2 file:border-brand-black file:font-mono file:text-xs"
           />
         </label>
-        {uploading && <p className="text-xs text-gray-500 mt-2">Processing…</p>}
+        {uploading && (
+          <p className="text-xs text-gray-500 mt-2">
+            {progress ? `Processing… ${progress.stage} (${progress.progress}%)` : 'Uploading…'}
+          </p>
+        )}
       </div>
 
       {statements.length > 0 && (
@@ -116,7 +143,12 @@ export default function BankStatementsTab() {
             {statements.map((s) => (
               <li key={s._id} className="editorial-card p-3 flex justify-between items-center gap-2">
                 <span className="font-mono text-sm truncate flex-1 min-w-0">{s.filename}</span>
-                <span className="text-[10px] text-gray-500 shrink-0">{s.transaction_count} transactions</span>
+                <span className="text-[10px] text-gray-500 shrink-0">
+                  {s.status === 'queued' || s.status === 'processing'
+                    ? 'Processing…'
+                    : s.status === 'failed' ? 'Failed'
+                      : `${s.transaction_count} transactions` + (s.duplicate_count ? ` · ${s.duplicate_count} duplicates skipped` : '')}
+                </span>
                 <button
                   type="button"
                   onClick={() => handleDelete(s._id)}
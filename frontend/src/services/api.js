@@ -86,6 +86,8 @@ export const gamificationService = {
   getFriendsLeaderboard: (limit = 100) => api.get(`/gamification/leaderboard/friends?limit=${limit}`),
   placePopCityItem: (payload) => api.post('/gamification/pop-city-place', payload || {}),
   getStreakCalendar: (year, month) => api.get(`/gamification/streak-calendar?year=${year}&month=${month}`),
+  // from/to are "YYYY-MM"; returns { months: [{ year, month, bitmap }] } (bit d-1 = day d)
+  getStreakCalendarRange: (from, to) => api.get(`/gamification/streak-calendar?from=${from}&to=${to}`),
 };
 
 // ============================================================================
@@ -112,8 +114,13 @@ export const vetoService = {
 
 export const bankStatementService = {
   list: () => api.get('/bank-statements'),
+  // Returns 202 { statementId }; poll status() until status is 'processed' or 'failed'
   upload: (formData) => api.post('/bank-statements/upload', formData, { headers: { 'Content-Type': 'multipart/form-data' } }),
-  spendingAnalysis: () => api.get('/bank-statements/spending-analysis'),
+  status: (statementId) => api.get(`/bank-statements/${statementId}/status`),
+  spendingAnalysis: (params) => api.get('/bank-statements/spending-analysis', { params }),
+  spendingSeries: (params) => api.get('/bank-statements/series', { params }),
+  // Streams a file; pass { format: 'csv' | 'ndjson', from, to, category }
+  exportTransactions: (params) => api.get('/bank-statements/export', { params, responseType: 'blob' }),
   delete: (statementId) => api.delete(`/bank-statements/${statementId}`)
 };
 
@@ -122,7 +129,8 @@ export const bankStatementService = {
 // ============================================================================
 
 export const feedService = {
-  getFeed: (params = {}) => api.get('/feed', { params: { type: params.type || 'all', limit: params.limit ?? 50, skip: params.skip ?? 0 } }),
+  // Pass the previous response's nextCursor as `before` to load the next page
+  getFeed: (params = {}) => api.get('/feed', { params: { type: params.type || 'all', limit: params.limit ?? 50, before: params.before || undefined } }),
   createPost: (data) => api.post('/posts', data),
   getPost: (postId) => api.get(`/posts/${postId}`),
   likePost: (postId) => api.post(`/posts/${postId}/like`),
@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Benchmarks run the real Flask app against a throwaway database on the configured
+MONGODB_URI (BENCH_MONGODB_DATABASE, default "advisory_bench") and drop it when done.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+load_dotenv(os.path.join(os.path.dirname(__file__), "..", "backend", ".env"))
+
+BENCH_DATABASE = os.getenv("BENCH_MONGODB_DATABASE", "advisory_bench")
+
+
+class QueryCounter(monitoring.CommandListener):
+    """Records the name of every command sent to MongoDB while enabled."""
+
+    def __init__(self):
+        self.enabled = False
+        self.commands = []
+
+    def started(self, event):
+        if self.enabled:
+            self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    @contextmanager
+    def counting(self):
+        self.commands = []
+        self.enabled = True
+        try:
+            yield self
+        finally:
+            self.enabled = False
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+
+# Must be registered before the app creates its MongoClient
+query_counter = QueryCounter()
+monitoring.register(query_counter)
+
+
+def load_app():
+    """Import backend/app.py bound to the benchmark database."""
+    if BENCH_DATABASE == os.getenv("MONGODB_DATABASE", "samplebudgeting"):
+        raise SystemExit("BENCH_MONGODB_DATABASE must not be the app database (it is dropped afterwards)")
+    os.environ["MONGODB_DATABASE"] = BENCH_DATABASE
+    import app as app_module
+    return app_module
+
+
+def drop_bench_database(app_module):
+    app_module.db.client.drop_database(BENCH_DATABASE)
+
+
+def auth_headers(user_id):
+    from utils.auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'user_id': str(user_id)})}"}
+
+
+@contextmanager
+def timed(results, key):
+    """Store elapsed milliseconds in results[key]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        results[key] = round((time.perf_counter() - start) * 1000, 2)
@@ -0,0 +1,88 @@
+"""
+Benchmark: MongoDB queries per feed page as the number of comments grows.
+
+Seeds 50 posts whose comments come from a pool of distinct users, then renders
+GET /api/feed and counts the commands the request sends. The count should stay
+flat no matter how many comments each post has.
+
+Run: python scripts/bench_feed_queries.py
+"""
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from bench_common import auth_headers, drop_bench_database, load_app, query_counter, timed
+
+POSTS_PER_PAGE = 50
+AUTHORS = 10
+COMMENTERS = 100
+COMMENTS_PER_POST = [0, 5, 20, 50]
+
+
+def seed(app_module, comments_per_post):
+    from models.post import RECENT_COMMENTS
+    db = app_module.db
+    db.users.delete_many({})
+    db.posts.delete_many({})
+    db.post_comments.delete_many({})
+    users = [
+        {"username": f"bench{i}", "email": f"bench{i}@example.com", "name": f"Bench {i}", "game_points": 0}
+        for i in range(AUTHORS + COMMENTERS)
+    ]
+    user_ids = db.users.insert_many(users).inserted_ids
+    authors, commenters = user_ids[:AUTHORS], user_ids[AUTHORS:]
+    now = datetime.utcnow()
+    posts = []
+    comments = []
+    for i in range(POSTS_PER_PAGE):
+        created = now - timedelta(minutes=i)
+        post_id = ObjectId()
+        post_comments = [
+            {"_id": ObjectId(), "post_id": post_id, "user_id": commenters[(i + j) % COMMENTERS],
+             "text": f"Comment {j}", "created_at": created}
+            for j in range(comments_per_post)
+        ]
+        comments.extend(post_comments)
+        posts.append({
+            "_id": post_id,
+            "user_id": authors[i % AUTHORS],
+            "content": f"Post {i}",
+            "type": "update",
+            "visibility": "public",
+            "metadata": {},
+            "like_count": 0,
+            "comment_count": comments_per_post,
+            "recent_comments": [
+                {k: c[k] for k in ("_id", "user_id", "text", "created_at")}
+                for c in post_comments[-RECENT_COMMENTS:]
+            ],
+            "created_at": created,
+            "updated_at": created,
+        })
+    db.posts.insert_many(posts)
+    if comments:
+        db.post_comments.insert_many(comments)
+    return authors[0]
+
+
+def main():
+    app_module = load_app()
+    client = app_module.app.test_client()
+    try:
+        print(f"{'comments/post':>14} {'posts':>6} {'queries':>8} {'ms':>9}")
+        for comments_per_post in COMMENTS_PER_POST:
+            viewer = seed(app_module, comments_per_post)
+            headers = auth_headers(viewer)
+            results = {}
+            with query_counter.counting(), timed(results, "ms"):
+                resp = client.get(f"/api/feed?limit={POSTS_PER_PAGE}", headers=headers)
+            assert resp.status_code == 200, resp.get_json()
+            posts = resp.get_json()["posts"]
+            print(f"{comments_per_post:>14} {len(posts):>6} {query_counter.count:>8} {results['ms']:>9}")
+    finally:
+        drop_bench_database(app_module)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: likes and feed reads on posts with 10k likes each.
+
+Seeds a page of posts that each have LIKES_PER_POST likes in post_likes, then
+measures like/unlike toggles, a feed page, and the BSON size of one post as
+stored now versus with the old embedded `likes` array.
+
+Run: python scripts/bench_post_likes.py
+"""
+
+from datetime import datetime, timedelta
+
+import bson
+
+from bench_common import auth_headers, drop_bench_database, load_app, query_counter, timed
+
+LIKES_PER_POST = 10_000
+POSTS = 20
+TOGGLES = 100
+
+
+def seed(app_module):
+    db = app_module.db
+    likers = db.users.insert_many([
+        {"username": f"liker{i}", "email": f"liker{i}@example.com", "name": f"Liker {i}", "game_points": 0}
+        for i in range(LIKES_PER_POST)
+    ]).inserted_ids
+    viewer = likers[0]
+    now = datetime.utcnow()
+    post_ids = db.posts.insert_many([
+        {
+            "user_id": likers[i], "content": f"Post {i}", "type": "update", "visibility": "public",
+            "metadata": {}, "like_count": LIKES_PER_POST, "comment_count": 0, "recent_comments": [],
+            "created_at": now - timedelta(minutes=i), "updated_at": now,
+        }
+        for i in range(POSTS)
+    ]).inserted_ids
+    for post_id in post_ids:
+        db.post_likes.insert_many(
+            [{"post_id": post_id, "user_id": uid, "created_at": now} for uid in likers],
+            ordered=False,
+        )
+    return viewer, post_ids, likers
+
+
+def main():
+    app_module = load_app()
+    client = app_module.app.test_client()
+    try:
+        viewer, post_ids, likers = seed(app_module)
+        headers = auth_headers(viewer)
+        results = {}
+
+        stored = app_module.db.posts.find_one({"_id": post_ids[0]})
+        legacy = dict(stored, likes=likers)
+        print(f"post document: {len(bson.encode(stored)):,} bytes now, "
+              f"{len(bson.encode(legacy)):,} bytes with an embedded likes array")
+
+        with query_counter.counting(), timed(results, "feed"):
+            resp = client.get(f"/api/feed?limit={POSTS}", headers=headers)
+        assert resp.status_code == 200
+        print(f"feed page ({POSTS} posts x {LIKES_PER_POST:,} likes): {results['feed']} ms, "
+              f"{len(resp.data):,} response bytes, {query_counter.count} queries")
+
+        with timed(results, "toggle"):
+            for _ in range(TOGGLES):
+                resp = client.post(f"/api/posts/{post_ids[1]}/like", headers=auth_headers(likers[-1]))
+        print(f"like/unlike toggle: {results['toggle'] / TOGGLES:.2f} ms avg over {TOGGLES}, "
+              f"final like_count {resp.get_json()['like_count']:,}")
+    finally:
+        drop_bench_database(app_module)
+
+
+if __name__ == "__main__":
+    main()
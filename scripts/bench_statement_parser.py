@@ -0,0 +1,177 @@
+"""
+Benchmark: statement parsing stages on a synthetic PDF corpus.
+
+Generates statements with scripts/statement_corpus.py for every combination of
+--pages, --layouts and --date-formats, then runs each stage of statement_parser on
+them: the PDF pass (extract_pages), text join, table parse, line parse, merge,
+categorization (Gemini replaced by a stub that sleeps --llm-latency seconds per
+call) and the full extraction cascade. Reports wall time and peak Python memory
+(tracemalloc, this process only; a second untimed run) per stage, and recall /
+precision of the extracted rows against ground truth, matched on (date, |amount|).
+--json writes the results for comparing runs before and after a parser change.
+No database needed: the merchant memo is unavailable, so every merchant goes to
+the stub.
+
+Run: python scripts/bench_statement_parser.py [--pages 3,10] [--layouts grid,plain,split] [--date-formats mdy,dmy,iso,dmon]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from statement_corpus import DATE_FORMATS, LAYOUTS, make_statement
+
+import utils.llm as llm
+from utils import statement_parser as sp
+from utils.pdf_pages import PAGE_WORKERS, start_page_pool, stop_page_pool
+
+STAGES = ["pdf", "text", "tables", "lines", "merge", "categorize", "cascade"]
+RECALL_STAGES = ["tables", "lines", "merge", "cascade"]
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel: fixed latency, well-formed answers."""
+    latency = 0.2
+    calls = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, **kwargs):
+        StubModel.calls += 1
+        time.sleep(StubModel.latency)
+        if "Lines:\n" in prompt:
+            lines = [l for l in prompt.split("Lines:\n", 1)[1].splitlines() if l.strip()]
+            text = json.dumps(["other"] * len(lines))
+        else:
+            text = "[]"  # extraction prompts: the local parsers are what is being measured
+        return type("Response", (), {"text": text})()
+
+
+def measure(fn, memory):
+    """(result, ms, peak KiB or None)."""
+    start = time.perf_counter()
+    result = fn()
+    ms = (time.perf_counter() - start) * 1000
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result, ms, peak
+
+
+def _key(t):
+    date = t.get("date")
+    return (date.date() if hasattr(date, "date") else None, round(abs(float(t.get("amount") or 0)), 2))
+
+
+def recall_precision(found, truth):
+    expected = Counter(_key(t) for t in truth)
+    got = Counter(_key(t) for t in found if t.get("date"))
+    matched = sum((expected & got).values())
+    return matched / max(1, len(truth)), matched / max(1, len(found))
+
+
+def run_document(path, truth, workers, memory):
+    results = {}
+
+    def stage(name, fn):
+        result, ms, peak = measure(fn, memory)
+        results[name] = {"ms": round(ms, 1), "peak_kib": round(peak) if peak is not None else None}
+        return result
+
+    pages = stage("pdf", lambda: sp.extract_pages(path, workers=workers))
+    text = stage("text", lambda: sp._join_page_text(pages))
+    from_tables = stage("tables", lambda: sp.transactions_from_tables([t for p in pages for t in p["tables"]]))
+    from_lines = stage("lines", lambda: sp.parse_transactions_from_text(text))
+    merged = stage("merge", lambda: sp.merge_and_dedupe([from_tables, from_lines]))
+    stage("categorize", lambda: sp.categorize_transactions_with_ai([dict(t) for t in merged]))
+    cascade, report = stage("cascade", lambda: sp.extract_transactions_with_report(path))
+
+    for name, found in (("tables", from_tables), ("lines", from_lines), ("merge", merged), ("cascade", cascade)):
+        recall, precision = recall_precision(found, truth)
+        results[name].update({"rows": len(found), "recall": round(recall, 3), "precision": round(precision, 3)})
+    results["cascade"]["path"] = report["path"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", default="3,10", help="comma-separated page counts")
+    parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    parser.add_argument("--date-formats", default=",".join(DATE_FORMATS))
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=18)
+    parser.add_argument("--workers", type=int, default=None, help="page pool processes (default PDF_PAGE_WORKERS; 1 = sequential)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub seconds per Gemini call")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--keep", help="write the generated PDFs to this folder")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    start_page_pool(args.workers or PAGE_WORKERS)
+    StubModel.latency = args.llm_latency
+    llm.genai.GenerativeModel = StubModel
+    llm.gemini_rate_limiter = llm.TokenBucket(10 ** 9)  # measure the parser, not the Gemini quota
+    out_dir = args.keep or tempfile.mkdtemp(prefix="statement_bench_")
+    os.makedirs(out_dir, exist_ok=True)
+
+    documents = []
+    for pages in [int(p) for p in args.pages.split(",")]:
+        for layout in args.layouts.split(","):
+            for date_format in args.date_formats.split(","):
+                pdf, truth = make_statement(pages, layout, date_format, args.noise, args.seed)
+                path = os.path.join(out_dir, f"statement_{layout}_{date_format}_{pages}p.pdf")
+                with open(path, "wb") as f:
+                    f.write(pdf)
+                documents.append((f"{layout}/{date_format}/{pages}p", path, truth))
+
+    print(f"{len(documents)} statements, noise {args.noise}, stub LLM {args.llm_latency}s/call")
+    print(f"{'statement':<20}" + "".join(f"{s:>11}" for s in STAGES) + "".join(f"{'R ' + s:>10}" for s in RECALL_STAGES) + "  path")
+    all_results = {}
+    totals = Counter()
+    peaks = Counter()
+    try:
+        for name, path, truth in documents:
+            StubModel.calls = 0
+            r = run_document(path, truth, args.workers, not args.no_memory)
+            r["llm_calls"] = StubModel.calls
+            r["truth_rows"] = len(truth)
+            all_results[name] = r
+            for s in STAGES:
+                totals[s] += r[s]["ms"]
+                peaks[s] = max(peaks[s], r[s]["peak_kib"] or 0)
+            print(f"{name:<20}" + "".join(f"{r[s]['ms']:>9.1f}ms" for s in STAGES)
+                  + "".join(f"{r[s]['recall']:>10.2f}" for s in RECALL_STAGES) + f"  {r['cascade']['path']}")
+    finally:
+        if not args.keep:
+            for _, path, _ in documents:
+                if os.path.exists(path):
+                    os.remove(path)
+            os.rmdir(out_dir)
+        stop_page_pool()
+
+    print(f"{'total':<20}" + "".join(f"{totals[s]:>9.1f}ms" for s in STAGES))
+    if not args.no_memory:
+        print(f"{'peak KiB':<20}" + "".join(f"{peaks[s]:>11,}" for s in STAGES))
+    for s in RECALL_STAGES:
+        recall = sum(r[s]["recall"] for r in all_results.values()) / len(all_results)
+        precision = sum(r[s]["precision"] for r in all_results.values()) / len(all_results)
+        print(f"{s:<10} mean recall {recall:.3f}  mean precision {precision:.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "documents": all_results}, f, indent=2)
+        print(f"results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
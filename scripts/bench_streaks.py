@@ -0,0 +1,95 @@
+"""
+Benchmark: streak reads for users with 5 years of daily entries.
+
+Seeds USERS users with YEARS of daily_flow entries each, then compares the old
+full-history scan against the stored streak state, and times appending today's
+entry, a back-dated edit that breaks the run, and a bulk reconciliation.
+
+Run: python scripts/bench_streaks.py
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from bench_common import auth_headers, drop_bench_database, load_app, query_counter, timed
+
+USERS = 20
+YEARS = 5
+READS = 50
+
+
+def seed(app_module):
+    db = app_module.db
+    user_ids = db.users.insert_many([
+        {"username": f"saver{i}", "email": f"saver{i}@example.com", "name": f"Saver {i}", "game_points": 0}
+        for i in range(USERS)
+    ]).inserted_ids
+    rng = random.Random(8)
+    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365 * YEARS)
+    days = 365 * YEARS
+    for uid in user_ids:
+        entries = []
+        for d in range(days):
+            income = 3000.0
+            expenses = 3000.0 + rng.choice([100, 200, 500]) if rng.random() < 0.02 else 2500.0
+            entries.append({"user_id": uid, "date": start + timedelta(days=d), "income": income,
+                            "expenses": expenses, "net": income - expenses})
+        db.daily_flow.insert_many(entries)
+    return user_ids, start + timedelta(days=days)
+
+
+def full_scan_streak(flow, user_id):
+    """The previous calculate_streak: load and walk every entry."""
+    streak = 0
+    for e in flow.get_user_entries(user_id):
+        streak = streak + 1 if flow._net_for_entry(e) >= 0 else 0
+    return streak
+
+
+def main():
+    app_module = load_app()
+    client = app_module.app.test_client()
+    flow = app_module.daily_flow_model
+    try:
+        user_ids, today = seed(app_module)
+        results = {}
+        print(f"{USERS} users x {365 * YEARS:,} daily entries")
+
+        with timed(results, "reconcile_cold"):
+            report = flow.reconcile_streaks()
+        print(f"reconciliation (initial build): {results['reconcile_cold']} ms, {report}")
+
+        uid = user_ids[0]
+        with timed(results, "full_scan"):
+            for _ in range(READS):
+                expected = full_scan_streak(flow, uid)
+        with query_counter.counting(), timed(results, "stored"):
+            for _ in range(READS):
+                streak = flow.calculate_streak(uid)
+        assert streak == expected, (streak, expected)
+        print(f"streak read: {results['full_scan'] / READS:.2f} ms full scan vs "
+              f"{results['stored'] / READS:.3f} ms stored ({query_counter.count // READS} query per read)")
+
+        with query_counter.counting(), timed(results, "stats"):
+            resp = client.get("/api/gamification/stats", headers=auth_headers(uid))
+        assert resp.status_code == 200
+        print(f"/api/gamification/stats: {results['stats']} ms, {query_counter.count} queries")
+
+        with query_counter.counting(), timed(results, "append"):
+            flow.add_entry(uid, today, 3000, 2500)
+        print(f"append today's entry: {results['append']} ms, {query_counter.count} queries")
+
+        with query_counter.counting(), timed(results, "backdated"):
+            flow.add_entry(uid, today - timedelta(days=3), 1000, 2500)
+        print(f"back-dated edit breaking the run: {results['backdated']} ms, {query_counter.count} queries")
+        assert flow.calculate_streak(uid) == full_scan_streak(flow, uid)
+
+        with timed(results, "reconcile"):
+            report = flow.reconcile_streaks()
+        print(f"reconciliation (no drift expected): {results['reconcile']} ms, {report}")
+    finally:
+        drop_bench_database(app_module)
+
+
+if __name__ == "__main__":
+    main()
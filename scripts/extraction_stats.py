@@ -0,0 +1,40 @@
+"""
+How often each statement extraction path is taken, and how long it takes.
+
+Paths: profile (a known layout's single strategy was enough), tables / text /
+tables+text (local parsers were confident), gemini (needed the LLM), merged (nothing
+was confident; everything ran and was merged). Also lists the learned layout profiles.
+
+Run: python scripts/extraction_stats.py [days]
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from config.database import db_instance
+from models.bank_statement import BankStatement
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    db = db_instance.connect()
+    rows = BankStatement(db).get_extraction_stats(days=days)
+    total = sum(r["count"] for r in rows)
+    print(f"{total} statements" + (f" in the last {days} days" if days else ""))
+    for r in rows:
+        print(f"  {r['_id']:<12} {r['count']:>6}  {100 * r['count'] / total:5.1f}%  "
+              f"avg {r['avg_ms'] or 0:8.0f} ms  max {r['max_ms'] or 0:8.0f} ms")
+    profiles = list(db.parser_profiles.aggregate([
+        {"$group": {"_id": "$strategy", "layouts": {"$sum": 1}, "uses": {"$sum": "$uses"}}},
+        {"$sort": {"layouts": -1}},
+    ]))
+    print(f"{sum(p['layouts'] for p in profiles)} layout profiles")
+    for p in profiles:
+        print(f"  {p['_id']:<12} {p['layouts']:>6} layouts  {p['uses']:>8} uses")
+    db_instance.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Drop merchant memo entries written by a single user's correction.
+
+Before per-user corrections, one user's manual category change was stored in the
+shared merchant_categories memo and applied to every user. Those entries
+(source "user") are removed so the merchant is answered by Gemini again; users'
+own corrections are kept per user from now on and only promoted to the shared memo
+once PROMOTE_USERS users agree. Safe to re-run.
+
+Run: python scripts/migrate_merchant_corrections.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from config.database import db_instance
+
+
+def main():
+    db = db_instance.connect()
+    removed = db.merchant_categories.delete_many({"source": "user", "promoted_at": {"$exists": False}}).deleted_count
+    print(f"Removed {removed} single-user corrections from the shared merchant memo")
+    db_instance.close()
+
+
+if __name__ == "__main__":
+    main()
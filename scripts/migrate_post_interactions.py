@@ -0,0 +1,80 @@
+"""
+Move likes and comments out of the embedded post arrays.
+
+For every post that still has a `likes` or `comments` array:
+  - likes    -> post_likes (one doc per user/post), like_count
+  - comments -> post_comments, comment_count, recent_comments (newest RECENT_COMMENTS)
+then the arrays are removed. Safe to re-run: likes and comments are upserted on
+their natural keys, so a post interrupted half-way is completed without duplicates.
+
+Run: python scripts/migrate_post_interactions.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from datetime import datetime
+from pymongo import UpdateOne
+
+from config.database import db_instance
+from models.post import Post, RECENT_COMMENTS
+
+
+def migrate_post(post_model, post):
+    post_id = post["_id"]
+    likes = post.get("likes") or []
+    comments = post.get("comments") or []
+
+    if likes:
+        post_model.likes.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "post_id": post_id},
+                {"$setOnInsert": {"created_at": post.get("updated_at") or datetime.utcnow()}},
+                upsert=True,
+            )
+            for user_id in set(likes)
+        ], ordered=False)
+    if comments:
+        post_model.comments.bulk_write([
+            UpdateOne(
+                {"post_id": post_id, "user_id": c.get("user_id"), "created_at": c.get("created_at"), "text": c.get("text", "")},
+                {"$setOnInsert": {"migrated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            for c in comments
+        ], ordered=False)
+
+    recent = list(post_model.comments.find(
+        {"post_id": post_id}, {"user_id": 1, "text": 1, "created_at": 1}
+    ).sort([("created_at", -1), ("_id", -1)]).limit(RECENT_COMMENTS))
+    post_model.collection.update_one(
+        {"_id": post_id},
+        {
+            "$set": {
+                "like_count": post_model.likes.count_documents({"post_id": post_id}),
+                "comment_count": post_model.comments.count_documents({"post_id": post_id}),
+                "recent_comments": list(reversed(recent)),
+            },
+            "$unset": {"likes": "", "comments": ""},
+        }
+    )
+    return len(set(likes)), len(comments)
+
+
+def main():
+    db = db_instance.connect()
+    post_model = Post(db)
+    legacy = {"$or": [{"likes": {"$exists": True}}, {"comments": {"$exists": True}}]}
+    posts = likes = comments = 0
+    for post in post_model.collection.find(legacy, {"likes": 1, "comments": 1, "updated_at": 1}).batch_size(200):
+        n_likes, n_comments = migrate_post(post_model, post)
+        posts += 1
+        likes += n_likes
+        comments += n_comments
+    print(f"Migrated {posts} posts ({likes} likes, {comments} comments)")
+
+
+if __name__ == "__main__":
+    main()
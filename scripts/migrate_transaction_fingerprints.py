@@ -0,0 +1,68 @@
+"""
+Fingerprint existing transactions and fold duplicates from overlapping statements.
+
+Statements are processed oldest first. Each transaction without a fingerprint gets
+one (see models/bank_statement.transaction_fingerprints) and statement_ids; a row
+whose fingerprint the user already has is removed and its statement linked to the
+surviving row instead. Statement counts are updated to inserted / duplicate. Safe to
+re-run: fingerprinted rows are skipped.
+
+Run: python scripts/migrate_transaction_fingerprints.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from pymongo import UpdateOne
+
+from config.database import db_instance
+from models.bank_statement import BankStatement, transaction_fingerprints
+
+
+def migrate_statement(model, statement):
+    statement_id = statement["_id"]
+    rows = list(model.transactions.find(
+        {"statement_id": statement_id, "fingerprint": {"$exists": False}}
+    ).sort("_id", 1))
+    if not rows:
+        return 0, 0
+    fingerprints = transaction_fingerprints(rows)
+    existing = {
+        d["fingerprint"]: d["_id"]
+        for d in model.transactions.find(
+            {"user_id": statement["user_id"], "fingerprint": {"$in": fingerprints}}, {"fingerprint": 1}
+        )
+    }
+    ops = []
+    duplicate_ids = []
+    for row, fingerprint in zip(rows, fingerprints):
+        if fingerprint in existing:
+            ops.append(UpdateOne({"_id": existing[fingerprint]}, {"$addToSet": {"statement_ids": statement_id}}))
+            duplicate_ids.append(row["_id"])
+        else:
+            ops.append(UpdateOne({"_id": row["_id"]}, {"$set": {"fingerprint": fingerprint, "statement_ids": [statement_id]}}))
+            existing[fingerprint] = row["_id"]
+    model.transactions.bulk_write(ops)
+    if duplicate_ids:
+        model.transactions.delete_many({"_id": {"$in": duplicate_ids}})
+    kept = len(rows) - len(duplicate_ids)
+    model.update_transaction_count(statement_id, kept, len(duplicate_ids))
+    return kept, len(duplicate_ids)
+
+
+def main():
+    db = db_instance.connect()
+    model = BankStatement(db)
+    statements = kept = duplicates = 0
+    for statement in model.collection.find({}, {"user_id": 1}).sort("created_at", 1).batch_size(200):
+        n_kept, n_duplicates = migrate_statement(model, statement)
+        statements += 1
+        kept += n_kept
+        duplicates += n_duplicates
+    print(f"Checked {statements} statements: {kept} transactions fingerprinted, {duplicates} duplicates removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Rebuild every user's monthly spending rollups from the transactions collection.
+
+Rollups are kept up to date as statements are added and deleted, and users without
+any are rebuilt on first read; run this to backfill all users at once or to repair
+rollups after transactions were changed outside the app.
+
+Run: python scripts/rebuild_spending_rollups.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from config.database import db_instance
+from models.spending_rollup import SpendingRollup
+
+
+def main():
+    db = db_instance.connect()
+    rollups = SpendingRollup(db)
+    users = 0
+    docs = 0
+    for user_id in db.transactions.distinct("user_id"):
+        docs += rollups.rebuild(user_id)
+        users += 1
+    print(f"Rebuilt spending rollups for {users} users ({docs} month/category rollups)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Rebuild every user's materialized friends timeline from the posts collection.
+
+Run once after deploying the fan-out-on-write friends feed (existing posts were
+never pushed), or any time timelines need to be recomputed.
+
+Run: python scripts/rebuild_timelines.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from config.database import db_instance
+from models.timeline import Timeline
+
+
+def main():
+    db = db_instance.connect()
+    timeline = Timeline(db)
+    users = 0
+    refs = 0
+    for user in db.users.find({}, {"friends": 1}):
+        refs += timeline.rebuild(user["_id"], user.get("friends") or [])
+        users += 1
+    print(f"Rebuilt {users} timelines ({refs} post references)")
+
+
+if __name__ == "__main__":
+    main()
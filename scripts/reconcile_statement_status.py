@@ -0,0 +1,29 @@
+"""
+Mark bank statements failed whose processing job has failed for good.
+
+StatementJob.fail marks the statement failed when a job runs out of attempts
+(including a worker lease that expired on the last attempt); run this once to
+repair statements left "queued" / "processing" by jobs that failed before that.
+Safe to re-run.
+
+Run: python scripts/reconcile_statement_status.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from config.database import db_instance
+from models.statement_job import StatementJob
+
+
+def main():
+    db = db_instance.connect()
+    repaired = StatementJob(db).reconcile_statements()
+    print(f"Marked {repaired} statements failed")
+    db_instance.close()
+
+
+if __name__ == "__main__":
+    main()
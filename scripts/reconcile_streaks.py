@@ -0,0 +1,28 @@
+"""
+Recompute every user's stored streak state from daily_flow and repair drift.
+
+add_entry keeps users.streak_state up to date incrementally; run this nightly (or
+after bulk imports such as config/insertdb_flow.py, which writes daily_flow
+directly) to catch anything the incremental path missed.
+
+Run: python scripts/reconcile_streaks.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from config.database import db_instance
+from models.daily_flow import DailyFlow
+
+
+def main():
+    db = db_instance.connect()
+    result = DailyFlow(db).reconcile_streaks()
+    print(f"Checked {result['users']} users, repaired {result['drifted']} streaks")
+    db_instance.close()
+
+
+if __name__ == "__main__":
+    main()
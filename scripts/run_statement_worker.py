@@ -0,0 +1,42 @@
+"""
+Run bank statement processing workers outside the web process.
+
+Start the API with STATEMENT_WORKERS=0 and run this instead to keep PDF parsing
+and Gemini calls off the web workers. Any number of these can run against the
+same database; jobs are claimed atomically from the statement_jobs collection.
+The PDF page pool (PDF_PAGE_WORKERS processes, shared by all threads) is started
+first, before any MongoDB client or thread exists.
+
+Run: python scripts/run_statement_worker.py [threads]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from config.database import db_instance
+from utils.pdf_pages import start_page_pool, stop_page_pool
+from utils.statement_worker import StatementWorkerPool, WORKERS
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else max(WORKERS, 1)
+    page_workers = start_page_pool()
+    db = db_instance.connect()
+    pool = StatementWorkerPool(db, workers=threads)
+    pool.start()
+    print(f"Processing statements with {threads} worker threads, {page_workers} page processes (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print("Stopping workers...")
+        pool.stop()
+        stop_page_pool()
+        db_instance.close()
+
+
+if __name__ == "__main__":
+    main()
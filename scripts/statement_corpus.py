@@ -0,0 +1,204 @@
+"""
+Synthetic bank-statement PDF generator for the parser benchmarks.
+
+Writes plain PDF 1.4 files by hand (Helvetica text and ruled lines, no PDF library
+needed) together with the ground-truth transactions they contain. Knobs:
+
+  layout       "grid"  ruled table: Date | Description | Amount | Balance
+               "plain" the same columns as text only, no rules
+               "split" ruled table with separate Withdrawals / Deposits columns
+  date_format  "mdy" 03/14/2024, "dmy" 14/03/2024, "iso" 2024-03-14, "dmon" 14 Mar 2024
+  noise        distractor lines per transaction row (numbers, dates and amounts that
+               are not transactions); interleaved in "plain", below the table otherwise
+
+Run: python scripts/statement_corpus.py OUT_DIR [--pages 3] [--layout grid] [--date-format mdy] [--noise 0.1]
+"""
+
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+LAYOUTS = ("grid", "plain", "split")
+DATE_FORMATS = {"mdy": "%m/%d/%Y", "dmy": "%d/%m/%Y", "iso": "%Y-%m-%d", "dmon": "%d %b %Y"}
+ROWS_PER_PAGE = 34
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+FONT_SIZE = 9
+ROW_HEIGHT = 16
+TABLE_TOP = 680
+COLUMNS = {
+    "grid": [("Date", 40), ("Description", 120), ("Amount", 400), ("Balance", 490)],
+    "plain": [("Date", 40), ("Description", 120), ("Amount", 400), ("Balance", 490)],
+    "split": [("Date", 40), ("Description", 110), ("Withdrawals", 330), ("Deposits", 410), ("Balance", 490)],
+}
+TABLE_RIGHT = 572
+
+MERCHANTS = [
+    ("STARBUCKS STORE", -1, (3, 12)), ("UBER TRIP", -1, (8, 45)), ("AMAZON MKTP US", -1, (10, 180)),
+    ("SHELL OIL", -1, (25, 70)), ("NETFLIX.COM", -1, (15, 16)), ("WHOLE FOODS MKT", -1, (20, 160)),
+    ("CVS PHARMACY", -1, (5, 60)), ("COMCAST CABLE", -1, (80, 120)), ("ATM WITHDRAWAL", -1, (20, 200)),
+    ("TARGET", -1, (10, 150)), ("CHIPOTLE", -1, (9, 25)), ("SPOTIFY USA", -1, (10, 11)),
+    ("VENMO CASHOUT", 1, (20, 300)), ("PAYROLL DEPOSIT", 1, (1200, 2400)), ("ZELLE FROM J SMITH", 1, (15, 250)),
+]
+PREFIXES = ["", "", "POS DEBIT ", "CHECKCARD ", "ACH "]
+CITIES = ["", "", " SEATTLE WA", " AUSTIN TX", " #0421", " 800-555-0100"]
+DISTRACTORS = [
+    "Interest rate {rate}% APY effective {date}",
+    "Call 1-800-555-{n4} or visit us online. Member FDIC.",
+    "Daily ending balance on {date} was {amount}",
+    "Your overdraft limit is {amount}. Fees may apply.",
+    "Reference {n4}-{n4} Account ****{n4}",
+]
+
+
+def _money(value):
+    return f"{value:,.2f}"
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text(x, y, text, size=FONT_SIZE):
+    return f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({_escape(text)}) Tj ET"
+
+
+def _line(x1, y1, x2, y2):
+    return f"{x1:.1f} {y1:.1f} m {x2:.1f} {y2:.1f} l S"
+
+
+def write_pdf(page_streams):
+    """PDF bytes for a list of page content streams (one Helvetica font, US Letter pages)."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled once the page tree number is known
+    pages_obj = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    kids = []
+    for stream in page_streams:
+        data = stream.encode("latin-1")
+        contents = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        kids.append(add((
+            f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {contents} 0 R >>"
+        ).encode()))
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_obj} 0 R >>".encode()
+    objects[pages_obj - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>"
+    ).encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def make_transactions(count, rng, start):
+    """count ground-truth transactions in date order over about one month from start."""
+    transactions = []
+    for i in range(count):
+        name, sign, (low, high) = rng.choice(MERCHANTS)
+        description = rng.choice(PREFIXES) + name + rng.choice(CITIES)
+        date = start + timedelta(days=int(30 * i / max(1, count)))
+        transactions.append({"date": date, "description": description, "amount": sign * round(rng.uniform(low, high), 2)})
+    return transactions
+
+
+def _distractor(rng, fmt, start):
+    return rng.choice(DISTRACTORS).format(
+        rate=f"{rng.uniform(0.5, 5):.2f}",
+        date=(start + timedelta(days=rng.randrange(30))).strftime(fmt),
+        amount=_money(rng.uniform(100, 5000)),
+        n4=f"{rng.randrange(10000):04d}",
+    )
+
+
+def make_statement(pages=3, layout="grid", date_format="mdy", noise=0.1, seed=0, rows_per_page=ROWS_PER_PAGE):
+    """(pdf_bytes, ground_truth_transactions) for one synthetic statement."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"date_format must be one of {', '.join(DATE_FORMATS)}")
+    rng = random.Random(seed)
+    fmt = DATE_FORMATS[date_format]
+    start = datetime(2024, rng.randrange(1, 12), 1)
+    truth = make_transactions(pages * rows_per_page, rng, start)
+    opening = round(rng.uniform(500, 5000), 2)
+    closing = round(opening + sum(t["amount"] for t in truth), 2)
+    columns = COLUMNS[layout]
+    ruled = layout != "plain"
+
+    streams = []
+    balance = opening
+    for page_number in range(pages):
+        rows = truth[page_number * rows_per_page:(page_number + 1) * rows_per_page]
+        ops = ["0.5 w", _text(40, 750, "FIRST SYNTHETIC BANK", 12),
+               _text(40, 735, f"Account ****{rng.randrange(10000):04d}    Page {page_number + 1} of {pages}")]
+        if page_number == 0:
+            ops.append(_text(40, 710, f"Opening Balance {_money(opening)}"))
+        lines = [[name for name, _ in columns]]
+        for t in rows:
+            balance = round(balance + t["amount"], 2)
+            date = t["date"].strftime(fmt)
+            if layout == "split":
+                withdrawal = _money(-t["amount"]) if t["amount"] < 0 else ""
+                deposit = _money(t["amount"]) if t["amount"] > 0 else ""
+                lines.append([date, t["description"], withdrawal, deposit, _money(balance)])
+            else:
+                lines.append([date, t["description"], _money(t["amount"]), _money(balance)])
+            if not ruled:
+                while rng.random() < noise and len(lines) < rows_per_page + 5:
+                    lines.append([_distractor(rng, fmt, start)])
+        y = TABLE_TOP
+        for cells in lines:
+            for (_, x), cell in zip(columns, cells):
+                ops.append(_text(x + 3, y - ROW_HEIGHT + 5, cell))
+            y -= ROW_HEIGHT
+        if ruled:
+            left = columns[0][1]
+            for i in range(len(lines) + 1):
+                ops.append(_line(left, TABLE_TOP - i * ROW_HEIGHT, TABLE_RIGHT, TABLE_TOP - i * ROW_HEIGHT))
+            for x in [x for _, x in columns] + [TABLE_RIGHT]:
+                ops.append(_line(x, TABLE_TOP, x, y))
+            for _ in range(round(noise * len(rows))):
+                y -= ROW_HEIGHT
+                if y < 60:
+                    break
+                ops.append(_text(40, y, _distractor(rng, fmt, start)))
+        if page_number == pages - 1:
+            ops.append(_text(40, max(y - 2 * ROW_HEIGHT, 30), f"Closing Balance {_money(closing)}"))
+        streams.append("\n".join(ops))
+    return write_pdf(streams), truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic bank statement PDF.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--layout", choices=LAYOUTS, default="grid")
+    parser.add_argument("--date-format", choices=sorted(DATE_FORMATS), default="mdy")
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    pdf, truth = make_statement(args.pages, args.layout, args.date_format, args.noise, args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+    path = os.path.join(args.out_dir, f"statement_{args.layout}_{args.date_format}_{args.pages}p_{args.seed}.pdf")
+    with open(path, "wb") as f:
+        f.write(pdf)
+    print(f"{path}: {len(truth)} transactions")
+
+
+if __name__ == "__main__":
+    main()